@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+
+"""Aggregate sample rate of a FlukeGroup by number of simulated meters."""
+
+from fluke_28x_multimeter import Fluke287
+from fluke_28x_multimeter.fleet import FlukeGroup
+from fluke_28x_multimeter.simulator import SimulatedFluke287
+
+
+def bench_group(meters, samples, command_latency=0.005):
+    group = FlukeGroup({
+        f"meter{i}": Fluke287(io=SimulatedFluke287(
+            seed=i, command_latency=command_latency, byte_latency=1e-5))
+        for i in range(meters)})
+    for _ in group.poll("QM", 0, count=samples):
+        pass
+    return group.stats()
+
+
+def main(counts=(1, 2, 4, 8, 16), samples=100):
+    results = {}
+    for meters in counts:
+        stats = bench_group(meters, samples)
+        latency = [d.p50 for d in stats["devices"].values()]
+        results[meters] = stats["rate"]
+        print(f"{meters:3d} meters {stats['rate']:10.0f} samples/s "
+              f"(p50 latency {max(latency) * 1e3:.1f} ms, "
+              f"{stats['rate'] / results[counts[0]] / meters:.0%} "
+              f"scaling)")
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+
+"""Compares the generator based QDDA parser with QDDA.parse_frame."""
+
+import timeit
+
+from fluke_28x_multimeter.query import QDDA, ENCODING
+from fluke_28x_multimeter.simulator import (QDDA_RESPONSES,
+                                            QDDA_MIN_MAX_RESPONSES)
+
+FRAMES = QDDA_RESPONSES + QDDA_MIN_MAX_RESPONSES
+
+
+def legacy_parse_response(response, encoding=ENCODING):
+    """ QDDA.parse_response before the converters were precompiled """
+    def parse_settings(ivalues, iconverters):
+        for (name, formatter), item in zip(iconverters, ivalues):
+            yield (name, formatter(item))
+
+            if name == 'numberOfModes':
+                n, c = next(iconverters)
+                if item == "0":
+                    yield ('measurementMode', [])
+                elif item == "2":
+                    yield ('measurementMode',
+                           [c(next(ivalues)), c((next(ivalues)))])
+                else:
+                    yield ('measurementMode', [c(next(ivalues))])
+
+    def parse_values(ivalues, iconverters):
+        for (name, formatter), item in zip(iconverters, ivalues):
+            yield (name, formatter(item))
+
+    line_splitted = response.decode(encoding).split(',')
+
+    ivalues = iter(line_splitted)
+    settings = [(name, value) for name, value in
+                parse_settings(ivalues, iter(QDDA.settings_properties))]
+    values = [[(name, value) for name, value in
+               parse_values(ivalues, iter(QDDA.values_properties))]
+              for _ in range(settings[-1][1])]
+
+    return [dict(settings + value) for value in values]
+
+
+def main(number=2000, repeat=5):
+    for frame in FRAMES:
+        legacy = legacy_parse_response(frame)
+        current = QDDA.parse_response(frame)
+        assert [list(d.items()) for d in legacy] == \
+            [list(d.items()) for d in current], frame
+
+    results = {}
+    for name, func in [
+            ("legacy", legacy_parse_response),
+            ("parse_response", QDDA.parse_response),
+            ("compact", lambda f: QDDA.parse_response(f, compact=True))]:
+        best = min(timeit.repeat(lambda: [func(f) for f in FRAMES],
+                                 number=number, repeat=repeat))
+        results[name] = best
+        frames = number * len(FRAMES)
+        print(f"{name:15s} {frames / best:10.0f} frames/s "
+              f"{results['legacy'] / best:5.1f}x")
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+"""Compares byte-at-a-time receive() with the buffered FrameReader."""
+
+import timeit
+
+from fluke_28x_multimeter.query import receive, FrameReader
+
+QDDA_RESPONSE = (
+    b"0\rV_AC,NONE,AUTO,VAC,5,0,OFF,1507815846.491,1,MIN_MAX_AVG,5,LIVE,"
+    b"0.0789,VAC,0,4,5,NORMAL,NONE,1507815852.225,PRIMARY,0.0789,VAC,0,4,5,"
+    b"NORMAL,NONE,1507815852.225,MINIMUM,0.0784,VAC,0,4,5,NORMAL,NONE,"
+    b"1507815850.213,MAXIMUM,0.0832,VAC,0,4,5,NORMAL,NONE,1507815848.201,"
+    b"AVERAGE,0.0802,VAC,0,4,5,NORMAL,NONE,1507815852.225\r")
+
+
+class BufferedIO(object):
+    """ in-memory serial port replacement exposing read and in_waiting """
+
+    def __init__(self, data):
+        self._data = data
+        self._pos = 0
+
+    @property
+    def in_waiting(self):
+        return len(self._data) - self._pos
+
+    def read(self, size=1):
+        ret = self._data[self._pos:self._pos + size]
+        self._pos += len(ret)
+        return ret
+
+
+def bench_receive(frames):
+    io = BufferedIO(QDDA_RESPONSE * frames)
+    for _ in range(frames):
+        receive(io)
+        receive(io)
+
+
+def bench_frame_reader(frames):
+    reader = FrameReader(BufferedIO(QDDA_RESPONSE * frames))
+    for _ in range(frames):
+        reader.read_frame()
+        reader.read_frame()
+
+
+def main(frames=1000, repeat=5):
+    results = {}
+    for name, func in [("receive", bench_receive),
+                       ("FrameReader", bench_frame_reader)]:
+        best = min(timeit.repeat(lambda: func(frames), number=1,
+                                 repeat=repeat))
+        results[name] = best
+        print(f"{name:12s} {frames / best:10.0f} responses/s "
+              f"({best / frames * 1e6:.1f} us/response)")
+    print(f"speedup      {results['receive'] / results['FrameReader']:.1f}x")
+    return results
+
+
+if __name__ == "__main__":
+    main()
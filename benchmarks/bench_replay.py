@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+
+"""
+Replays a wire capture and reports per query timings, e.g. of traffic
+recorded in the field with ``fluke --capture traffic.cap serve``::
+
+    python -m benchmarks.bench_replay traffic.cap [speed]
+
+Without a capture, one is recorded from the simulator first.
+"""
+
+import os
+import sys
+import tempfile
+
+from fluke_28x_multimeter import Fluke287, TERMINATOR
+from fluke_28x_multimeter.capture import ReplayIO, read_capture, TX
+from fluke_28x_multimeter.simulator import SimulatedFluke287
+from fluke_28x_multimeter.cli import _print_metrics
+
+
+def query_of(request):
+    """ :return: (query, args) sent as request """
+    for query in Fluke287.queries.values():
+        fmt = query.request_format
+        prefix = fmt.split(b"%")[0]
+        if b"%" not in fmt and request == fmt:
+            return query, ()
+        if b"%" in fmt and request.startswith(prefix):
+            arg = request[len(prefix):]
+            return query, (int(arg) if b"%d" in fmt else arg.decode(),)
+    raise ValueError(f"Unknown request {request!r}")
+
+
+def requests(path):
+    """ :return: list of lists of (query, args) written at once """
+    return [[query_of(r) for r in record.data.split(TERMINATOR) if r]
+            for record in read_capture(path) if record.direction == TX]
+
+
+def record(path, count=200):
+    fluke = Fluke287(io=SimulatedFluke287(seed=0))
+    fluke.start_capture(path)
+    for _ in range(count):
+        fluke.execute("QDDA")
+        fluke.execute("QM")
+    fluke.execute_many(["QM", "QDDA", "ID"])
+    fluke.stop_capture()
+
+
+def replay(path, speed=None):
+    """ :return: metrics.Metrics of the replayed requests """
+    fluke = Fluke287(io=ReplayIO(path, speed=speed))
+    metrics = fluke.enable_metrics()
+    for batch in requests(path):
+        if len(batch) == 1:
+            query, args = batch[0]
+            fluke.execute(query, *args)
+        else:
+            fluke.execute_many(batch)
+    return metrics
+
+
+def main(path=None, speed=None):
+    if path is None:
+        fd, path = tempfile.mkstemp(suffix=".cap")
+        os.close(fd)
+        record(path)
+    metrics = replay(path, None if speed is None else float(speed))
+    _print_metrics(metrics.snapshot())
+    return metrics
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
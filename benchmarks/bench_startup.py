@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+"""Cold start latency of the package import and of the fluke command."""
+
+import sys
+import time
+import statistics
+import subprocess
+from contextlib import contextmanager
+
+from fluke_28x_multimeter.simulator import SimulatedFluke287, PtyBridge
+
+CLI = [sys.executable, "-m", "fluke_28x_multimeter.cli"]
+
+COMMANDS = {
+    "python": [sys.executable, "-c", "pass"],
+    "import": [sys.executable, "-c", "import fluke_28x_multimeter"],
+    "help": CLI + ["--help"],
+    # {port} is replaced by the port of a simulated device
+    "value": CLI + ["--port", "{port}", "value"],
+}
+
+
+@contextmanager
+def simulated_port():
+    with PtyBridge(SimulatedFluke287()) as bridge:
+        yield bridge.port
+
+
+def measure(command, runs, port=None):
+    """ :return: seconds per run of a command in a new interpreter """
+    command = [arg.format(port=port) for arg in command]
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL,
+                       stderr=subprocess.DEVNULL)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def imported_modules(modules=("serial", "gevent", "zerorpc", "numpy",
+                              "pyarrow")):
+    """ :return: optional modules loaded by importing the cli """
+    source = ("import sys, fluke_28x_multimeter.cli; "
+              f"print(','.join(m for m in {modules!r} if m in sys.modules))")
+    output = subprocess.run([sys.executable, "-c", source], check=True,
+                            stdout=subprocess.PIPE, text=True).stdout
+    return [m for m in output.strip().split(",") if m]
+
+
+def main(runs=20):
+    results = {}
+    with simulated_port() as port:
+        for name, command in COMMANDS.items():
+            latencies = measure(command, runs, port)
+            results[name] = statistics.median(latencies)
+            print(f"{name:8s} {results[name] * 1e3:8.1f} ms")
+    print(f"loaded by the cli: {imported_modules() or 'none'}")
+    return results
+
+
+if __name__ == "__main__":
+    main()
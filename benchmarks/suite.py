@@ -0,0 +1,325 @@
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark suite with regression gating.
+
+Measures parse throughput, round trip latency against the simulated device
+and zerorpc stream throughput. Results are written as JSON and compared
+against a stored baseline; the run fails if a latency percentile grows or a
+throughput drops by more than the threshold::
+
+    python -m benchmarks.suite --save-baseline     # record baseline
+    python -m benchmarks.suite --threshold 0.25    # compare against it
+
+A missing baseline only skips the comparison without --threshold, with it
+the run fails.
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import statistics
+
+from fluke_28x_multimeter import Fluke287, QM, ID, QDDA
+from fluke_28x_multimeter.simulator import (SimulatedFluke287, ID_RESPONSE,
+                                            QM_RESPONSES, QDDA_RESPONSES,
+                                            QDDA_MIN_MAX_RESPONSES)
+
+BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+THRESHOLD = 0.2
+
+# metric name -> True if higher is better
+METRICS = {"throughput": True, "p50": False, "p99": False}
+
+BENCHMARKS = {}
+
+
+def benchmark(func):
+    BENCHMARKS[func.__name__] = func
+    return func
+
+
+def percentile(values, p):
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def summarize(latencies, operations=None, elapsed=None, unit="op"):
+    """
+    :param latencies: seconds per operation
+    :param operations: number of operations, default: len(latencies)
+    :param elapsed: total seconds, default: sum(latencies)
+    :return: result dict
+    """
+    operations = operations or len(latencies)
+    elapsed = elapsed or sum(latencies)
+    return dict(unit=unit,
+                operations=operations,
+                throughput=operations / elapsed,
+                p50=percentile(latencies, 50),
+                p99=percentile(latencies, 99),
+                mean=statistics.mean(latencies))
+
+
+def time_batches(func, frames, batches):
+    """ run func over frames batches times, returns per frame latencies """
+    timer = time.perf_counter
+    latencies = []
+    for _ in range(batches):
+        start = timer()
+        for frame in frames:
+            func(frame)
+        latencies.append((timer() - start) / len(frames))
+    return latencies
+
+
+@benchmark
+def parse_qm(scale):
+    return summarize(time_batches(QM.parse_response, QM_RESPONSES,
+                                  200 * scale), unit="frame")
+
+
+@benchmark
+def parse_id(scale):
+    return summarize(time_batches(ID.parse_response, [ID_RESPONSE],
+                                  1000 * scale), unit="frame")
+
+
+@benchmark
+def parse_qdda(scale):
+    frames = QDDA_RESPONSES + QDDA_MIN_MAX_RESPONSES
+    return summarize(time_batches(QDDA.parse_response, frames, 100 * scale),
+                     unit="frame")
+
+
+@benchmark
+def parse_qdda_compact(scale):
+    frames = QDDA_RESPONSES + QDDA_MIN_MAX_RESPONSES
+    return summarize(time_batches(QDDA.parse_frame, frames, 100 * scale),
+                     unit="frame")
+
+
+@benchmark
+def batch_qdda(scale):
+    try:
+        from fluke_28x_multimeter.batch import decode_qdda
+    except ImportError as e:
+        print(f"skipping batch_qdda: {e}", file=sys.stderr)
+        return None
+    frames = (QDDA_RESPONSES + QDDA_MIN_MAX_RESPONSES) * 100
+    latencies = time_batches(decode_qdda, [frames], 20 * scale)
+    return summarize([latency / len(frames) for latency in latencies],
+                     unit="frame")
+
+
+@benchmark
+def stream_writer(scale):
+    import io
+    from fluke_28x_multimeter.out import StreamWriter, fields
+    rows = [QDDA.parse_response(frame) for frame in QDDA_MIN_MAX_RESPONSES]
+    with StreamWriter(io.StringIO(), fields(QDDA)) as writer:
+        return summarize(time_batches(writer.write, rows, 200 * scale),
+                         unit="sample")
+
+
+@benchmark
+def frame_reader(scale):
+    from benchmarks.bench_receive import bench_frame_reader
+    frames = 100
+    latencies = time_batches(lambda _: bench_frame_reader(frames), [None],
+                             20 * scale)
+    return summarize([latency / frames for latency in latencies],
+                     unit="response")
+
+
+@benchmark
+def execute_roundtrip(scale):
+    fluke = Fluke287(io=SimulatedFluke287())
+    timer = time.perf_counter
+    latencies = []
+    for _ in range(500 * scale):
+        start = timer()
+        QDDA.execute(fluke)
+        latencies.append(timer() - start)
+    return summarize(latencies, unit="request")
+
+
+@benchmark
+def execute_metrics(scale):
+    """ execute_roundtrip with instrumentation enabled """
+    fluke = Fluke287(io=SimulatedFluke287())
+    fluke.enable_metrics()
+    timer = time.perf_counter
+    latencies = []
+    for _ in range(500 * scale):
+        start = timer()
+        QDDA.execute(fluke)
+        latencies.append(timer() - start)
+    return summarize(latencies, unit="request")
+
+
+@benchmark
+def execute_capture(scale):
+    """ execute_roundtrip recording the traffic with capture.CaptureIO """
+    fluke = Fluke287(io=SimulatedFluke287())
+    timer = time.perf_counter
+    latencies = []
+    with open(os.devnull, "wb") as out:
+        fluke.start_capture(out)
+        for _ in range(500 * scale):
+            start = timer()
+            QDDA.execute(fluke)
+            latencies.append(timer() - start)
+        fluke.stop_capture()
+    return summarize(latencies, unit="request")
+
+
+@benchmark
+def server_stream(scale):
+    try:
+        import zerorpc
+        from fluke_28x_multimeter.server import FlukeServer
+    except ImportError as e:
+        print(f"skipping server_stream: {e}", file=sys.stderr)
+        return None
+
+    endpoint = "ipc:///tmp/fluke-benchmark-{}".format(os.getpid())
+    server = FlukeServer(Fluke287(io=SimulatedFluke287()))
+    server.bind(endpoint)
+    import gevent
+    worker = gevent.spawn(server.worker.run)
+    client = zerorpc.Client(endpoint)
+    samples = 500 * scale
+    timer = time.perf_counter
+    latencies = []
+    elapsed = None
+    try:
+        start = last = timer()
+        for _ in client.startLoop("QDDA", 1e-9):
+            now = timer()
+            latencies.append(now - last)
+            last = now
+            if len(latencies) == samples:
+                elapsed = now - start
+                client.stopLoop("QDDA")
+    finally:
+        client.close()
+        server.close()
+        worker.kill()
+    if elapsed is None:
+        raise RuntimeError(f"server_stream ended after {len(latencies)} of "
+                           f"{samples} samples")
+    return summarize(latencies[:samples], elapsed=elapsed, unit="sample")
+
+
+@benchmark
+def cli_startup(scale):
+    from .bench_startup import COMMANDS, measure
+    return summarize(measure(COMMANDS["help"], 5 * scale), unit="start")
+
+
+def run(names=None, scale=1):
+    results = {}
+    for name, func in BENCHMARKS.items():
+        if names and name not in names:
+            continue
+        result = func(scale)
+        if result is not None:
+            results[name] = result
+    return dict(meta=dict(python=platform.python_version(),
+                          machine=platform.machine(),
+                          platform=platform.platform(),
+                          time=time.time()),
+                benchmarks=results)
+
+
+def compare(results, baseline, threshold=THRESHOLD):
+    """
+    compare results with a baseline
+    :return: list of regression messages, empty if there is none
+    """
+    regressions = []
+    for name, base in baseline["benchmarks"].items():
+        current = results["benchmarks"].get(name)
+        if current is None:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            old, new = base[metric], current[metric]
+            if higher_is_better:
+                change = (old - new) / old
+            else:
+                change = (new - old) / old
+            if change > threshold:
+                regressions.append(f"{name}.{metric}: {old:.6g} -> {new:.6g} "
+                                   f"({change:+.0%} worse)")
+    return regressions
+
+
+def report(results):
+    print(f"{'benchmark':20s} {'throughput':>18s} {'p50':>10s} {'p99':>10s}")
+    for name, r in results["benchmarks"].items():
+        throughput = f"{r['throughput']:.0f} {r['unit']}/s"
+        print(f"{name:20s} {throughput:>18s} "
+              f"{r['p50'] * 1e6:8.1f}us {r['p99'] * 1e6:8.1f}us")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("names", nargs="*",
+                        help="benchmarks to run, default: all of "
+                             + ", ".join(BENCHMARKS))
+    parser.add_argument("-o", "--output", help="write results as JSON")
+    parser.add_argument("-b", "--baseline", default=BASELINE,
+                        help="baseline JSON to compare with")
+    parser.add_argument("-t", "--threshold", type=float, default=None,
+                        help="allowed relative regression, default: 0.2, "
+                             "requires a baseline if given")
+    parser.add_argument("-s", "--scale", type=int, default=1,
+                        help="multiply the number of iterations")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="store results as new baseline")
+    args = parser.parse_args(argv)
+    for name in args.names:
+        if name not in BENCHMARKS:
+            parser.error(f"unknown benchmark {name}")
+
+    try:
+        results = run(args.names, args.scale)
+    except RuntimeError as e:
+        print(f"FAILED {e}", file=sys.stderr)
+        return 1
+    report(results)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"saved baseline to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        if args.threshold is not None:
+            print(f"no baseline at {args.baseline}, record one with "
+                  f"--save-baseline", file=sys.stderr)
+            return 1
+        print(f"no baseline at {args.baseline}, skipping comparison")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    threshold = THRESHOLD if args.threshold is None else args.threshold
+    regressions = compare(results, baseline, threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
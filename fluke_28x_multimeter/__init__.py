@@ -7,23 +7,55 @@ __email__ = 'moritz.federspiel@steadysense.at'
 __version__ = '0.1.0'
 
 from .query import *
+from .query import DeadlineExceeded
+import time
 import logging
+import threading
+from contextlib import contextmanager
 
 logger = logging.getLogger(__name__)
 
+# seconds without a received frame after which a meter is not alive
+ALIVE_TIMEOUT = 10.0
+
 class Fluke287(object):
     """
     Base object for communication with Fluke287 Multimeter
     """
-    queries = {q.__name__: q for q in [QM, QDDA, ID, PMM, PF1, HOLD]}
+    queries = {q.__name__: q for q in [QM, QDDA, QDDB, QEMAP, ID, QSLS,
+                                       QRSI, QMMSI, QPSI, QSMR, PMM, PF1,
+                                       HOLD]}
 
     def __init__(self, io=None, port=None):
+        # serializes requests of several threads, e.g. the cache poller
+        self._lock = threading.RLock()
+        self.cache = None
+        # metrics.Metrics, None while disabled
+        self.metrics = None
+        # timeouts.AdaptiveTimeouts, None uses TIMEOUT for every frame
+        self.timeouts = None
+        # query and stage being received and the absolute deadline of the
+        # current execute
+        self._query = None
+        self._stage = None
+        self._deadline = None
+        # a response may still arrive after a timeout
+        self._stale = False
+        self._identity = None
+        self._enum_maps = None
+        self.last_frame = None
+        # capture.CaptureIO wrapping the port while recording
+        self._capture = None
+        # callables receiving the error of a request that failed with a
+        # timeout or serial error, e.g. supervisor.Supervisor.failed
+        self.on_failure = []
         if io is None:
             if port is None:
                 port = self.find_serial()
             self.connect(port)
         else:
             self._io = io
+            self._reader = FrameReader(io)
         self.name = self.__class__.__name__
 
     @staticmethod
@@ -32,13 +64,49 @@ class Fluke287(object):
 
     def connect(self, port=None):
         self._io = connect(port)
+        if self._capture is not None:
+            # keep recording to the same sink after a reconnect
+            self._capture.io = self._io
+            self._io = self._capture
+        self._reader = FrameReader(self._io)
+        self._identity = None
+        self._enum_maps = None
+        self.last_frame = None
+        if self.metrics is not None:
+            self.metrics.reconnects += 1
         logger.info(f"Connected to {self._io}")
 
     def disconnect(self):
-        ret = disconnect(self._io)
-        logger.info("Disconnected from {self._io}")
+        self._identity = None
+        self._enum_maps = None
+        # close the port only, the capture continues after a reconnect
+        io = self._io if self._capture is None else self._capture.io
+        ret = disconnect(io)
+        logger.info(f"Disconnected from {io}")
         return ret
 
+    def start_capture(self, out):
+        """
+        record the raw traffic, see capture.CaptureIO, the capture is
+        flushed after every request and continues after reconnects
+        :param out: path or binary file
+        :return: CaptureIO
+        """
+        from .capture import CaptureIO
+        self.stop_capture()
+        with self._lock:
+            self._capture = self._io = CaptureIO(self._io, out)
+            self._reader = FrameReader(self._io)
+        return self._io
+
+    def stop_capture(self):
+        """ close the capture, the port stays open """
+        if self._capture is not None:
+            with self._lock:
+                self._io = self._capture.stop()
+                self._capture = None
+                self._reader = FrameReader(self._io)
+
     def send(self, request):
         """
 
@@ -47,8 +115,54 @@ class Fluke287(object):
         """
         return send(self._io, request)
 
-    def recv(self):
-        return receive(self._io)
+    def recv(self, size=None, timeout=None):
+        """
+        receive the next frame, bytes read ahead are kept for the next call
+        :param size: maximum frame size
+        :param timeout: seconds to wait for a frame, default: the timeout of
+        the query stage being received
+        :return: frame without terminator
+        """
+        return self._read(self._reader.read_frame, size, timeout)
+
+    def recv_exact(self, size, timeout=None):
+        """
+        receive exactly size bytes of a binary payload
+        :param size: number of bytes
+        :param timeout: seconds to wait for all bytes, default like recv
+        :return: bytes
+        """
+        return self._read(self._reader.read_exact, size, timeout)
+
+    def _read(self, read, size, timeout):
+        # the first frame of a response is the ack, the rest is payload
+        query, stage = self._query, self._stage
+        self._stage = "payload"
+        timeouts = self.timeouts if stage is not None else None
+        if timeout is None:
+            timeout = TIMEOUT if timeouts is None else \
+                timeouts.timeout(query, stage)
+        start = time.monotonic()
+        limited = False
+        if self._deadline is not None:
+            if start >= self._deadline:
+                raise DeadlineExceeded(f"Deadline of {query} exceeded")
+            limited = self._deadline - start < timeout
+            timeout = min(timeout, self._deadline - start)
+        try:
+            data = read(size, timeout)
+        except TimeoutError as e:
+            if limited:
+                # cut short by the caller, the meter may still answer
+                raise DeadlineExceeded(
+                    f"Deadline of {query} exceeded: {e}") from e
+            if timeouts is not None:
+                timeouts.timed_out(query, stage)
+            raise
+        self.last_frame = time.monotonic()
+        if timeouts is not None:
+            timeouts.observe(query, stage, self.last_frame - start)
+        return data
 
     @property
     def is_connected(self):
@@ -57,6 +171,32 @@ class Fluke287(object):
         """
         return self._io.is_open
 
+    def is_alive(self, timeout=ALIVE_TIMEOUT):
+        """
+        the port stays open if the cable is pulled from the meter, a meter
+        is alive if it sent a frame within timeout seconds
+        :param timeout: seconds
+        :return: True if alive else False
+        """
+        return self.is_connected and self.last_frame is not None and \
+            time.monotonic() - self.last_frame <= timeout
+
+    def heartbeat(self, idle=ALIVE_TIMEOUT / 2):
+        """
+        query the short identity if no frame was received for idle seconds,
+        does nothing while the meter is polled anyway
+        :param idle: seconds
+        :return: True if alive else False
+        """
+        if self.is_alive(idle):
+            return True
+        try:
+            self._identity = self.execute(ID)
+        except (TimeoutError, query.FlukeError, OSError) as e:
+            logger.warning(f"No heartbeat: {e}")
+            return False
+        return True
+
     @classmethod
     def find_query(cls, query):
         """
@@ -70,42 +210,196 @@ class Fluke287(object):
                 return q
         raise ValueError(f"Unknown Query {query}")
 
-    def execute(self, query, *args, **kwargs):
+    def execute(self, query, *args, deadline=None, max_age=None, **kwargs):
         """
         execute a query, args and kwargs are passed to query
         :param query: query name or class
         :param args: query arguments
+        :param deadline: seconds the whole request may take, including the
+        wait for other requests, raises DeadlineExceeded which is not passed
+        to on_failure
+        :param max_age: seconds a result of the cache is fresh enough,
+        default: no cache
         :param kwargs: query keyword arguments
         :return:
         """
-        logger.info(f"Executing {query}({args}, {kwargs})")
+        logger.info("Executing %s(%s, %s)", query, args, kwargs)
         q = self.find_query(query)
-        request = q.execute(self, *args, **kwargs)
+        if max_age is not None and self.cache is not None and not kwargs:
+            return self.cache.execute(q, *args, max_age=max_age)
+        try:
+            with self._request(deadline):
+                self._query, self._stage = q.__name__, "ack"
+                request = q.execute(self, *args, **kwargs)
+        except DeadlineExceeded:
+            raise
+        except (TimeoutError, OSError) as e:
+            self._failed(e)
+            raise
         return request.response.data
 
+    @contextmanager
+    def _request(self, deadline=None):
+        """ hold the lock and set the deadline of a request """
+        end = None if deadline is None else time.monotonic() + deadline
+        if not self._lock.acquire(timeout=-1 if end is None else deadline):
+            raise DeadlineExceeded(f"Deadline exceeded ({deadline}) waiting "
+                                   f"for other requests")
+        try:
+            if self._stale:
+                self._drain()
+            self._deadline = end
+            yield
+        except TimeoutError:
+            self._stale = True
+            raise
+        finally:
+            self._query = self._stage = self._deadline = None
+            if self._capture is not None:
+                self._capture.flush()
+            self._lock.release()
+
+    def _failed(self, error):
+        """ notify the on_failure callables of a lost connection """
+        for callback in self.on_failure:
+            callback(error)
+
+    def enable_cache(self, intervals=None, max_age=None):
+        """
+        serve id, values and value from a cache.QueryCache
+        :param intervals: dict of query name and seconds between background
+        polls
+        :param max_age: seconds a cached result is fresh enough
+        :return: QueryCache
+        """
+        from .cache import QueryCache
+        self.disable_cache()
+        self.cache = QueryCache(self, intervals, max_age).start()
+        return self.cache
+
+    def disable_cache(self):
+        if self.cache is not None:
+            self.cache.stop()
+            self.cache = None
+
+    def enable_metrics(self):
+        """
+        time the stages of every request and count bytes and errors
+        :return: metrics.Metrics
+        """
+        if self.metrics is None:
+            from .metrics import Metrics
+            self.metrics = Metrics()
+        return self.metrics
+
+    def disable_metrics(self):
+        self.metrics = None
+
+    def _drain(self):
+        """ drop bytes of responses which arrived after their timeout """
+        self._reader.reset()
+        reset_input_buffer = getattr(self._io, "reset_input_buffer", None)
+        if reset_input_buffer is not None:
+            reset_input_buffer()
+        self._stale = False
+
+    def enable_adaptive_timeouts(self, **kwargs):
+        """
+        wait for the ack and payload of a query as long as its observed
+        latency suggests instead of TIMEOUT
+        :param kwargs: settings of timeouts.AdaptiveTimeouts
+        :return: AdaptiveTimeouts
+        """
+        from .timeouts import AdaptiveTimeouts
+        self.timeouts = AdaptiveTimeouts(**kwargs)
+        return self.timeouts
+
+    def disable_adaptive_timeouts(self):
+        self.timeouts = None
+
+    def _execute_cached(self, query):
+        if self.cache is None:
+            return self.execute(query)
+        return self.cache.execute(query)
+
+    def execute_many(self, queries, deadline=None):
+        """
+        execute several queries pipelined: all requests are written at once
+        and the responses are read in order afterwards. A query failing with
+        a FlukeError does not affect the others, its response data is the
+        error instead.
+        :param queries: list of query names or classes, or (query, args)
+        tuples
+        :param deadline: seconds all requests may take
+        :return: list of request objects in the order of queries
+        """
+        logger.info("Executing pipelined %s", queries)
+        pending = []
+        for item in queries:
+            q, args = item if isinstance(item, tuple) else (item, ())
+            q = self.find_query(q)
+            pending.append((q, args, q.build_request(q.request_format, *args)))
+
+        try:
+            with self._request(deadline):
+                return self._execute_pending(pending)
+        except DeadlineExceeded:
+            raise
+        except (TimeoutError, OSError) as e:
+            self._failed(e)
+            raise
+
+    def _execute_pending(self, pending):
+        self.send(b"".join(request.payload for _, _, request in pending))
+
+        requests = []
+        try:
+            for q, args, request in pending:
+                self._query, self._stage = q.__name__, "ack"
+                try:
+                    requests.append(q.read_response(self, request, *args))
+                except query.FlukeError as e:
+                    requests.append(request._replace(response=query.Response(
+                        RESPONSE_CODE(e.code), e, None)))
+        except Exception:
+            # responses of the remaining queries would be taken as answers
+            # to the next request
+            self._reader.reset()
+            raise
+        return requests
+
     def restart(self):
         """ press restart button on display """
         return self.execute(PF1)
 
     def min_max(self):
         """ set display to MinMax mode """
-        request = self.execute(QDDA)
+        request, = self.execute_many([QDDA])
 
         # restart recording if recording is stopped
-        if type(request) == query.FlukeError and request.code == RESPONSE_CODE.ERROR_EXECUTION:
-            self.restart()
-            request = self.execute(QDDA)
+        error = request.response.data
+        if isinstance(error, query.FlukeError) and \
+                error.code == RESPONSE_CODE.ERROR_EXECUTION:
+            _, request = self.execute_many([PF1, QDDA])
 
         # turn off hold mode
-        if "HOLD" in request[1]['measurementMode']:
-            self.hold_off()
-            request = self.execute(QDDA)
+        data = self._data(request)
+        if "HOLD" in data[1]['measurementMode']:
+            _, request = self.execute_many([HOLD, QDDA])
+            data = self._data(request)
 
         # change measurement mode to MinMax if measurement Mode is None
-        if not request[1]['measurementMode']:
+        if not data[1]['measurementMode']:
             self.execute(PMM)
         return True
 
+    @staticmethod
+    def _data(request):
+        """ response data of a pipelined request, raises its FlukeError """
+        data = request.response.data
+        if isinstance(data, query.FlukeError):
+            raise data
+        return data
 
     def hold_off(self):
         """ verify that hold button is not pressed"""
@@ -114,28 +408,59 @@ class Fluke287(object):
             self.execute(HOLD)
         return True
 
+    @property
+    def identity(self):
+        """ identification dict, queried once per connection """
+        if self._identity is None:
+            self._identity = self.execute(ID)
+        return self._identity
+
+    @property
+    def enum_maps(self):
+        """ enum maps used by QDDB, queried once per connection """
+        if self._enum_maps is None:
+            requests = self.execute_many([(QEMAP, (name,))
+                                          for name in QEMAP.maps])
+            self._enum_maps = {name: self._data(request) for name, request
+                               in zip(QEMAP.maps, requests)}
+        return self._enum_maps
+
     @property
     def status(self):
+        device = self.identity if self.is_connected else {}
+        last_frame = self.last_frame
         return dict(
             name=self.__class__.__name__,
-            device=self.id if self.is_connected else {},
+            device=device,
             queries=list(self.queries.keys()),
             connection=settings(self._io),
-            connected=self.is_connected
+            connected=self.is_connected,
+            alive=self.is_alive(),
+            lastFrameAge=None if last_frame is None else
+            time.monotonic() - last_frame
         )
 
     @property
     def id(self):
         """ return identification dict """
-        return self.execute(ID)
+        return self._execute_cached(ID)
 
     @property
     def values(self):
         """ returns all displayed data"""
-        return self.execute(QDDA)
+        return self._execute_cached(QDDA)
 
+    @property
+    def values_binary(self):
+        """ returns all displayed data, read as QDDB display dump """
+        return self.execute(QDDB, maps=self.enum_maps)
+
+    @property
+    def memory_counts(self):
+        """ returns the number of stored items by kind """
+        return self.execute(QSLS)
 
     @property
     def value(self):
         """ returns primary value, unit and mode """
-        return self.execute(QM)
+        return self._execute_cached(QM)
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+"""Fixed rate acquisition against absolute deadlines."""
+
+import time
+import logging
+from collections import namedtuple
+
+__all__ = ["Sample", "poll", "acquire", "SKIP", "CATCH_UP"]
+
+logger = logging.getLogger(__name__)
+
+# overrun policies: skip missed deadlines or poll back to back until the
+# schedule is caught up
+SKIP = "skip"
+CATCH_UP = "catch-up"
+
+Sample = namedtuple("Sample", ["index", "target", "time", "jitter",
+                               "duration", "skipped", "data"])
+Sample.__doc__ = """
+One acquired sample: ``target`` is the scheduled monotonic time, ``time``
+the actual start of the poll, ``jitter`` the difference of both,
+``duration`` the time the poll took and ``skipped`` the number of deadlines
+dropped before this sample.
+"""
+
+
+def poll(func, interval, count=None, policy=SKIP, running=None,
+         clock=time.monotonic, sleep=time.sleep, start=None):
+    """
+    Calls func every interval seconds and yields a Sample per call.
+
+    Deadlines are absolute (start + n * interval) on a monotonic clock, so
+    the time of the poll and of the consumer does not accumulate as drift.
+    :param func: callable returning the sample data
+    :param interval: seconds between polls, 0 polls as fast as possible
+    :param count: number of samples, default: endless
+    :param policy: SKIP or CATCH_UP on overruns
+    :param running: callable, polling stops if it returns False
+    :param clock: monotonic clock
+    :param sleep: sleep function
+    :param start: clock time of the first deadline, default: now
+    :return: generator of Samples
+    """
+    if policy not in (SKIP, CATCH_UP):
+        raise ValueError(f"Unknown overrun policy {policy}")
+    start = clock() if start is None else start
+    deadline = 0
+    index = 0
+    skipped = 0
+    while count is None or index < count:
+        if running is not None and not running():
+            return
+        target = start + deadline * interval
+        now = clock()
+        if now < target:
+            sleep(target - now)
+            now = clock()
+        data = func()
+        duration = clock() - now
+        yield Sample(index, target, now, now - target, duration, skipped,
+                     data)
+        index += 1
+        deadline += 1
+        skipped = 0
+        if policy == SKIP and interval > 0:
+            missed = int((clock() - start) / interval) - deadline + 1
+            if missed > 0:
+                logger.debug(f"overrun, skipping {missed} deadlines")
+                deadline += missed
+                skipped = missed
+
+
+def acquire(fluke, query, interval, *args, count=None, policy=SKIP,
+            running=None, store=None, **kwargs):
+    """
+    Executes a query every interval seconds, see poll
+    :param fluke: Fluke287
+    :param query: query name or class
+    :param interval: seconds between polls
+    :param args: query arguments
+    :param store: store.SampleRing every QM or QDDA result is appended to
+    :param kwargs: query keyword arguments
+    :return: generator of Samples
+    """
+    def execute():
+        data = fluke.execute(query, *args, **kwargs)
+        if store is not None:
+            store.append_data(data)
+        return data
+
+    return poll(execute, interval, count=count, policy=policy,
+                running=running)
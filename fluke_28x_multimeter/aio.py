@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+
+"""asyncio client for Fluke 28x multimeters."""
+
+import asyncio
+import logging
+
+from . import Fluke287
+from .query import (TIMEOUT, BAUDRATE, TERMINATOR, find, FlukeError,
+                    RESPONSE_CODE)
+
+__all__ = ["AsyncFluke287", "FrameProtocol", "open_serial_connection"]
+
+logger = logging.getLogger(__name__)
+
+
+class FrameProtocol(asyncio.Protocol):
+    """
+    Splits the received byte stream on the terminator and queues the frames.
+    A lost connection is queued as exception.
+    """
+
+    def __init__(self, terminator=TERMINATOR):
+        self.terminator = terminator
+        self.frames = asyncio.Queue()
+        self.transport = None
+        self._buffer = bytearray()
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data):
+        buffer = self._buffer
+        buffer += data
+        lenterm = len(self.terminator)
+        while True:
+            index = buffer.find(self.terminator)
+            if index < 0:
+                break
+            self.frames.put_nowait(bytes(buffer[:index]))
+            del buffer[:index + lenterm]
+
+    def connection_lost(self, exc):
+        self.frames.put_nowait(exc or ConnectionError("Connection lost"))
+
+    def clear(self):
+        """ drop frames which were not requested, e.g. after a timeout """
+        while not self.frames.empty():
+            self.frames.get_nowait()
+
+
+class SerialTransport(asyncio.Transport):
+    """
+    Minimal transport for a non blocking pyserial port, the file descriptor
+    is watched by the event loop (posix only).
+    """
+
+    def __init__(self, loop, protocol, serial):
+        super(SerialTransport, self).__init__()
+        self._loop = loop
+        self._protocol = protocol
+        self._serial = serial
+        self._closing = False
+        loop.add_reader(serial.fileno(), self._read_ready)
+        loop.call_soon(protocol.connection_made, self)
+
+    @property
+    def serial(self):
+        return self._serial
+
+    def _read_ready(self):
+        try:
+            data = self._serial.read(self._serial.in_waiting or 1)
+        except Exception as e:
+            self._close(e)
+            return
+        if data:
+            self._protocol.data_received(data)
+
+    def write(self, data):
+        try:
+            self._serial.write(data)
+        except Exception as e:
+            self._close(e)
+            raise
+
+    def is_closing(self):
+        return self._closing
+
+    def close(self):
+        self._close(None)
+
+    def _close(self, exc):
+        if self._closing:
+            return
+        self._closing = True
+        self._loop.remove_reader(self._serial.fileno())
+        self._serial.close()
+        self._loop.call_soon(self._protocol.connection_lost, exc)
+
+
+async def open_serial_connection(port, protocol_factory=FrameProtocol,
+                                 baudrate=BAUDRATE):
+    """
+    Opens a serial port for the running event loop
+    :return: (transport, protocol)
+    """
+    from serial import Serial
+    loop = asyncio.get_running_loop()
+    serial = Serial(port=port, baudrate=baudrate, timeout=0)
+    protocol = protocol_factory()
+    transport = SerialTransport(loop, protocol, serial)
+    await asyncio.sleep(0)
+    return transport, protocol
+
+
+class AsyncFluke287(object):
+    """
+    asyncio version of Fluke287, reusing the request_format, properties and
+    parse_response of the Query classes. Requests on one meter are
+    serialized, many meters can be driven by one event loop.
+    """
+    queries = Fluke287.queries
+
+    def __init__(self, port=None, timeout=TIMEOUT):
+        self.port = port
+        self.timeout = timeout
+        self.name = self.__class__.__name__
+        self._transport = None
+        self._protocol = None
+        self._lock = asyncio.Lock()
+
+    async def __aenter__(self):
+        if not self.is_connected:
+            await self.connect()
+        return self
+
+    async def __aexit__(self, *args):
+        self.disconnect()
+
+    @property
+    def is_connected(self):
+        return self._transport is not None and \
+            not self._transport.is_closing()
+
+    async def connect(self, port=None):
+        self.port = port or self.port or find()
+        self._transport, self._protocol = await open_serial_connection(
+            self.port)
+        logger.info(f"Connected to {self.port}")
+
+    def disconnect(self):
+        if self._transport is not None:
+            self._transport.close()
+            logger.info(f"Disconnected from {self.port}")
+
+    def send(self, request):
+        logger.debug(f"-->{request}")
+        self._transport.write(request)
+
+    async def recv(self, timeout=None):
+        """
+        :param timeout: seconds, default: timeout of the client
+        :return: next frame without terminator
+        """
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            frame = await asyncio.wait_for(self._protocol.frames.get(),
+                                           timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"Timeout exceeded ({timeout})")
+        if isinstance(frame, Exception):
+            raise frame
+        logger.debug(f"<--{frame}")
+        return frame
+
+    find_query = classmethod(Fluke287.find_query.__func__)
+
+    async def execute_request(self, query, *args, timeout=None, **kwargs):
+        """
+        execute a query, args and kwargs are passed to query
+        :param query: query name or class
+        :param timeout: seconds per received frame
+        :return: request object
+        """
+        q = self.find_query(query)
+        if q.binary:
+            raise ValueError(f"{q.__name__} has a binary payload, which is "
+                             f"not supported by {self.name}")
+        async with self._lock:
+            self._protocol.clear()
+            request = q.build_request(q.request_format, *args, **kwargs)
+            self.send(request.payload)
+            ack = q.check_ack(request, await self.recv(timeout), *args,
+                              **kwargs)
+            payload = await self.recv(timeout) if q.properties else None
+        return q.build_response(request, ack, payload, *args, **kwargs)
+
+    async def execute(self, query, *args, timeout=None, **kwargs):
+        """ :return: response data of the query, see execute_request """
+        request = await self.execute_request(query, *args, timeout=timeout,
+                                             **kwargs)
+        return request.response.data
+
+    async def poll(self, query, interval, *args, count=None, **kwargs):
+        """
+        async generator executing a query every interval seconds against
+        absolute deadlines, missed deadlines are skipped
+        """
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        deadline = 0
+        index = 0
+        while count is None or index < count:
+            delay = start + deadline * interval - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            yield await self.execute(query, *args, **kwargs)
+            index += 1
+            deadline += 1
+            if interval > 0:
+                deadline = max(deadline,
+                               int((loop.time() - start) / interval) + 1)
+
+    async def restart(self):
+        """ press restart button on display """
+        return await self.execute("PF1")
+
+    async def hold_off(self):
+        """ verify that hold button is not pressed"""
+        data = await self.execute("QDDA")
+        if "HOLD" in data[1]['measurementMode']:
+            await self.execute("HOLD")
+        return True
+
+    async def min_max(self):
+        """ set display to MinMax mode """
+        try:
+            data = await self.execute("QDDA")
+        except FlukeError as e:
+            if e.code != RESPONSE_CODE.ERROR_EXECUTION:
+                raise
+            await self.restart()
+            data = await self.execute("QDDA")
+        if "HOLD" in data[1]['measurementMode']:
+            await self.execute("HOLD")
+            data = await self.execute("QDDA")
+        if not data[1]['measurementMode']:
+            await self.execute("PMM")
+        return True
+
+    async def id(self):
+        """ return identification dict """
+        return await self.execute("ID")
+
+    async def values(self):
+        """ returns all displayed data"""
+        return await self.execute("QDDA")
+
+    async def value(self):
+        """ returns primary value, unit and mode """
+        return await self.execute("QM")
@@ -0,0 +1,350 @@
+# -*- coding: utf-8 -*-
+
+"""
+Append-only binary sample archive.
+
+An archive file starts with a fixed size header holding the magic and the
+schema derived from the query properties, followed by fixed size little
+endian records::
+
+    record = acquisition time (double) + one field per schema entry
+
+Floats are stored as doubles, ints as int64 and strings as uint16 codes,
+so at most 65536 different strings per field. The strings are appended to
+a dictionary next to the archive (``.dict``) as json lines of field and
+string, in the order of their codes, before the first record using them.
+Every ``INDEX_INTERVAL`` records the writer appends (time, record number)
+to a sparse index next to the archive (``.idx``).
+The reader maps the file into memory and finds time ranges by binary search
+in the index and the records without reading the whole file.
+"""
+
+import os
+import ast
+import csv
+import json
+import mmap
+import time
+import struct
+from bisect import bisect_left
+
+from .out import _rows
+from .query import QM, QDDA
+
+__all__ = ["ArchiveWriter", "ArchiveReader", "schema", "from_csv"]
+
+MAGIC = b"FLKARCH1"
+VERSION = 2
+HEADER_SIZE = 16384
+# codes of the strings of a field are uint16
+MAX_LABELS = 1 << 16
+INDEX_INTERVAL = 1024
+INDEX_RECORD = struct.Struct("<dq")
+TIME_KEY = "time"
+
+# field kinds: struct format, convert from csv
+KINDS = {
+    "float": ("d", float),
+    "int": ("q", int),
+    "str": ("H", str),
+    "list": ("H", ast.literal_eval),
+}
+
+
+def schema(query):
+    """
+    :param query: QM or QDDA (class or name)
+    :return: list of (name, kind) tuples
+    """
+    name = getattr(query, "__name__", query)
+    if name == "QDDA":
+        properties = QDDA.settings_properties + QDDA.values_properties
+    elif name == "QM":
+        properties = QM.properties
+    else:
+        raise ValueError(f"Query {name} can not be archived")
+    fields = []
+    for field, convert in properties:
+        if field == "measurementMode":
+            kind = "list"
+        elif convert in (float, int):
+            kind = convert.__name__
+        else:
+            kind = "str"
+        fields.append((field, kind))
+    return fields
+
+
+class _Header(object):
+
+    def __init__(self, query, fields):
+        self.query = query
+        self.fields = [tuple(f) for f in fields]
+        self.dictionary = {name: [] for name, kind in self.fields
+                           if kind in ("str", "list")}
+        self.record = struct.Struct(
+            "<d" + "".join(KINDS[kind][0] for _, kind in self.fields))
+
+    def encode(self):
+        payload = json.dumps(dict(version=VERSION, query=self.query,
+                                  fields=self.fields)).encode()
+        if len(MAGIC) + 4 + len(payload) > HEADER_SIZE:
+            raise ValueError("Archive schema exceeds header size")
+        header = MAGIC + struct.pack("<I", len(payload)) + payload
+        return header + bytes(HEADER_SIZE - len(header))
+
+    @classmethod
+    def decode(cls, data):
+        if data[:len(MAGIC)] != MAGIC:
+            raise ValueError("Not a fluke archive")
+        length, = struct.unpack_from("<I", data, len(MAGIC))
+        start = len(MAGIC) + 4
+        header = json.loads(data[start:start + length].decode())
+        if header.get("version") != VERSION:
+            raise ValueError(f"Unsupported archive version "
+                             f"{header.get('version')}")
+        return cls(header["query"], header["fields"])
+
+    def read_dictionary(self, path):
+        """
+        :param path: dictionary of the archive
+        :return: bytes of the complete lines read
+        """
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return 0
+        # a partially written line is dropped
+        data = data[:data.rfind(b"\n") + 1]
+        for line in data.splitlines():
+            name, label = json.loads(line)
+            self.dictionary[name].append(label)
+        return len(data)
+
+
+class ArchiveWriter(object):
+    """
+    Appends query results to an archive, e.g. as ``store`` of
+    ``acquisition.acquire``. Existing archives are continued.
+    Raises ValueError if a field gets more than MAX_LABELS strings.
+    """
+
+    def __init__(self, path, query=None, index_interval=INDEX_INTERVAL):
+        self.path = path
+        self.index_interval = index_interval
+        if os.path.exists(path) and os.path.getsize(path) >= HEADER_SIZE:
+            with open(path, "rb") as f:
+                self.header = _Header.decode(f.read(HEADER_SIZE))
+            if query is not None and \
+                    getattr(query, "__name__", query) != self.header.query:
+                raise ValueError(f"{path} archives {self.header.query}")
+            size = os.path.getsize(path) - HEADER_SIZE
+            self.count = size // self.header.record.size
+            self._file = open(path, "r+b")
+            # drop a partially written record
+            self._file.truncate(HEADER_SIZE + self.count *
+                                self.header.record.size)
+            size = self.header.read_dictionary(path + ".dict")
+            self._dictionary = open(path + ".dict", "ab")
+            self._dictionary.truncate(size)
+        else:
+            name = getattr(query, "__name__", query)
+            self.header = _Header(name, schema(name))
+            self.count = 0
+            self._file = open(path, "w+b")
+            self._file.write(self.header.encode())
+            self._dictionary = open(path + ".dict", "wb")
+        self._file.seek(0, os.SEEK_END)
+        self._index = open(path + ".idx", "ab")
+        self._codes = {name: {label: code for code, label in
+                              enumerate(labels)}
+                       for name, labels in self.header.dictionary.items()}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _code(self, name, value):
+        codes = self._codes[name]
+        code = codes.get(value)
+        if code is None:
+            labels = self.header.dictionary[name]
+            if len(labels) >= MAX_LABELS:
+                raise ValueError(f"More than {MAX_LABELS} strings in "
+                                 f"{name}")
+            # stored before the first record using it
+            self._dictionary.write(json.dumps([name, value]).encode() +
+                                   b"\n")
+            self._dictionary.flush()
+            code = codes[value] = len(labels)
+            labels.append(value)
+        return code
+
+    def append(self, row, timestamp=None):
+        """
+        :param row: dict with the keys of the schema
+        :param timestamp: acquisition time, default: now
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        values = [timestamp]
+        for name, kind in self.header.fields:
+            value = row[name]
+            if kind == "list":
+                value = self._code(name, repr(list(value)))
+            elif kind == "str":
+                value = self._code(name, value)
+            values.append(value)
+        if self.count % self.index_interval == 0:
+            self._index.write(INDEX_RECORD.pack(timestamp, self.count))
+        self._file.write(self.header.record.pack(*values))
+        self.count += 1
+
+    def append_data(self, data, timestamp=None):
+        """ appends every row of a QM or QDDA result """
+        timestamp = time.time() if timestamp is None else timestamp
+        for row in _rows(data):
+            self.append(row, timestamp)
+
+    def flush(self):
+        self._file.flush()
+        self._index.flush()
+
+    def close(self):
+        self.flush()
+        self._file.close()
+        self._index.close()
+        self._dictionary.close()
+
+
+class _Times(object):
+    """ sequence of record times for bisect """
+
+    def __init__(self, reader):
+        self.reader = reader
+
+    def __len__(self):
+        return len(self.reader)
+
+    def __getitem__(self, i):
+        return self.reader.time(i)
+
+
+class ArchiveReader(object):
+    """ Memory mapped, random access reader of an archive """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        self._mmap = None
+        self.refresh()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return self.rows()
+
+    def refresh(self):
+        """ map records appended since opening """
+        if self._mmap is not None:
+            self._mmap.close()
+        self._mmap = mmap.mmap(self._file.fileno(), 0,
+                               access=mmap.ACCESS_READ)
+        self.header = _Header.decode(self._mmap[:HEADER_SIZE])
+        self.header.read_dictionary(self.path + ".dict")
+        self.fields = self.header.fields
+        self.count = (len(self._mmap) - HEADER_SIZE) // \
+            self.header.record.size
+        index = b""
+        if os.path.exists(self.path + ".idx"):
+            with open(self.path + ".idx", "rb") as f:
+                index = f.read()
+        index = index[:len(index) - len(index) % INDEX_RECORD.size]
+        entries = [e for e in INDEX_RECORD.iter_unpack(index)
+                   if e[1] < self.count]
+        self._index_times = [t for t, _ in entries]
+        self._index_records = [n for _, n in entries]
+
+    def close(self):
+        self._mmap.close()
+        self._file.close()
+
+    def time(self, i):
+        """ acquisition time of record i """
+        return struct.unpack_from(
+            "<d", self._mmap, HEADER_SIZE + i * self.header.record.size)[0]
+
+    def record(self, i, include_time=False):
+        """ :return: record i as dict """
+        if not 0 <= i < self.count:
+            raise IndexError(i)
+        values = self.header.record.unpack_from(
+            self._mmap, HEADER_SIZE + i * self.header.record.size)
+        dictionary = self.header.dictionary
+        row = {TIME_KEY: values[0]} if include_time else {}
+        for (name, kind), value in zip(self.fields, values[1:]):
+            if kind == "str":
+                value = dictionary[name][value]
+            elif kind == "list":
+                value = ast.literal_eval(dictionary[name][value])
+            row[name] = value
+        return row
+
+    def _bound(self, timestamp):
+        """ first record with a time >= timestamp """
+        i = bisect_left(self._index_times, timestamp)
+        lo = self._index_records[i - 1] if i > 0 else 0
+        hi = self._index_records[i] if i < len(self._index_records) \
+            else self.count
+        return bisect_left(_Times(self), timestamp, lo, hi)
+
+    def find(self, start=None, stop=None):
+        """
+        :param start: first time included
+        :param stop: times before stop are included
+        :return: range of record numbers
+        """
+        first = 0 if start is None else self._bound(start)
+        end = self.count if stop is None else self._bound(stop)
+        return range(first, max(first, end))
+
+    def rows(self, start=None, stop=None, include_time=False):
+        """ :return: iterator of records between start and stop as dicts """
+        for i in self.find(start, stop):
+            yield self.record(i, include_time)
+
+    def to_csv(self, out, start=None, stop=None, include_time=False,
+               head=True):
+        """ writes records in the format of out.write_csv """
+        from .out import write_csv
+        keys = [name for name, _ in self.fields]
+        if include_time:
+            keys.insert(0, TIME_KEY)
+        write_csv(list(self.rows(start, stop, include_time)), head=head,
+                  out=out, keys=keys)
+
+
+def from_csv(csv_path, archive_path, query):
+    """
+    Converts the csv output of a query into an archive. The acquisition
+    time is taken from a time column, the timeStamp or the row number.
+    :return: number of records
+    """
+    fields = schema(query)
+    with open(csv_path, newline="") as f, \
+            ArchiveWriter(archive_path, query) as writer:
+        for number, row in enumerate(csv.DictReader(f)):
+            converted = {name: KINDS[kind][1](row[name])
+                         for name, kind in fields}
+            timestamp = row.get(TIME_KEY) or row.get("timeStamp") or number
+            writer.append(converted, float(timestamp))
+        return writer.count
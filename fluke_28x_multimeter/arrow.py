@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+
+"""
+Columnar Arrow IPC and Parquet sink, requires pyarrow.
+
+Rows are collected per column and written as record batches of
+``batch_size`` rows, or of the rows collected in ``flush_interval``
+seconds, for Parquet every batch becomes one row group. Low
+cardinality strings (reading ids, units, states) are dictionary encoded;
+their dictionaries only grow, so IPC files carry deltas instead of a new
+dictionary per batch. The files load with ``pyarrow.ipc.open_file`` or
+``pyarrow.parquet.read_table`` and ``.to_pandas()`` without text parsing.
+"""
+
+import time
+
+import pyarrow as pa
+
+from .out import _rows, properties, TIME_KEY
+
+__all__ = ["ArrowWriter", "schema", "FORMATS"]
+
+FORMATS = ("arrow", "parquet")
+# rows per record batch and parquet row group
+BATCH_SIZE = 65536
+# dictionary encoded columns
+DICTIONARY = {"readingID", "baseUnit", "baseUnitReading", "readingState",
+              "unit", "state", "primaryFunction", "secondaryFunction"}
+
+
+def schema(query, timestamp=False):
+    """
+    :param query: query name or class
+    :param timestamp: add the acquisition time column
+    :return: pyarrow.Schema of the rows of a query result
+    """
+    columns = [pa.field(TIME_KEY, pa.float64())] if timestamp else []
+    for field, convert in properties(query):
+        if field == "measurementMode":
+            kind = pa.list_(pa.string())
+        elif convert is float:
+            kind = pa.float64()
+        elif convert is int:
+            kind = pa.int64()
+        elif field in DICTIONARY:
+            kind = pa.dictionary(pa.int32(), pa.string())
+        else:
+            kind = pa.string()
+        columns.append(pa.field(field, kind))
+    return pa.schema(columns)
+
+
+class ArrowWriter(object):
+    """
+    Writes query results as Arrow IPC file or Parquet, like
+    out.StreamWriter.
+    """
+
+    def __init__(self, out, query, fmt="arrow", timestamp=False,
+                 batch_size=BATCH_SIZE, flush_interval=None,
+                 clock=time.monotonic):
+        """
+        :param out: path or binary file
+        :param query: query name or class defining the schema
+        :param fmt: arrow or parquet
+        :param timestamp: rows contain the acquisition time column
+        :param batch_size: rows per record batch / row group
+        :param flush_interval: seconds after which the collected rows are
+        written as a smaller batch, default: only full batches
+        :param clock: monotonic clock
+        """
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown format {fmt}")
+        self.schema = schema(query, timestamp)
+        self.fmt = fmt
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.clock = clock
+        self.rows = 0
+        self.batches = 0
+        self._columns = {f.name: [] for f in self.schema}
+        # label -> code of the dictionary encoded columns
+        self._codes = {f.name: {} for f in self.schema
+                       if pa.types.is_dictionary(f.type)}
+        self._flushed = clock()
+        if fmt == "parquet":
+            import pyarrow.parquet as pq
+            self._writer = pq.ParquetWriter(out, self.schema)
+        else:
+            self._writer = pa.ipc.new_file(
+                out, self.schema,
+                options=pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def write(self, data):
+        """
+        :param data: dict, list of dicts or model objects
+        """
+        columns = self._columns
+        for row in _rows(data):
+            for name, values in columns.items():
+                values.append(row.get(name))
+            self.rows += 1
+        while len(columns[self.schema[0].name]) >= self.batch_size:
+            self._write_batch(self.batch_size)
+        if self.flush_interval is not None and \
+                self.clock() - self._flushed >= self.flush_interval:
+            self.flush()
+
+    def _array(self, field, values):
+        if not pa.types.is_dictionary(field.type):
+            return pa.array(values, type=field.type)
+        codes = self._codes[field.name]
+        indices = [None if v is None else codes.setdefault(v, len(codes))
+                   for v in values]
+        return pa.DictionaryArray.from_arrays(
+            pa.array(indices, type=pa.int32()),
+            pa.array(list(codes), type=pa.string()))
+
+    def _write_batch(self, size):
+        columns = self._columns
+        batch = pa.record_batch(
+            [self._array(field, columns[field.name][:size])
+             for field in self.schema], schema=self.schema)
+        self._writer.write_batch(batch)
+        self.batches += 1
+        for values in columns.values():
+            del values[:size]
+
+    def flush(self):
+        """ write the collected rows as record batch """
+        rows = len(self._columns[self.schema[0].name])
+        if rows:
+            self._write_batch(rows)
+        self._flushed = self.clock()
+
+    def close(self):
+        self.flush()
+        self._writer.close()
@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+
+"""
+Vectorized batch decoding of captured QDDA and QM payloads into NumPy
+structured arrays.
+
+All frames are joined into one buffer and tokenized in NumPy: fields are
+located by the offsets of the ``,`` and ``\r`` delimiters and gathered from
+a strided view of the buffer, numbers are converted column wise and frames
+with different numbers of modes or readings are located with index
+arithmetic instead of a Python loop per frame. String columns are returned
+as category codes, the labels are found in ``Batch.categories``. Overload
+values (``1e+38``, ``+9.99999999E+37``) are mapped to NaN. Requires numpy.
+"""
+
+import os
+from collections import namedtuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+__all__ = ["Batch", "decode_qdda", "decode_qm", "read_frames"]
+
+# values of the meter indicating an overload
+OVERLOAD = 9.9e37
+COMMA = ord(",")
+CR = ord("\r")
+
+QDDA_DTYPE = np.dtype([
+    ("frame", np.int64),
+    ("primaryFunction", np.int16),
+    ("readingID", np.int16),
+    ("readingValue", np.float64),
+    ("baseUnitReading", np.int16),
+    ("unitMultiplierRecording", np.int8),
+    ("decimalPlaces", np.int8),
+    ("displayDigits", np.int8),
+    ("readingState", np.int16),
+    ("readingAttribute", np.int16),
+    ("timeStamp", np.float64),
+])
+
+QM_DTYPE = np.dtype([
+    ("frame", np.int64),
+    ("value", np.float64),
+    ("unit", np.int16),
+    ("state", np.int16),
+    ("attribute", np.int16),
+])
+
+# QDDA layout: fields of the settings before measurementMode, fields per
+# reading
+SETTINGS_HEAD = 9
+READING_WIDTH = 9
+
+
+class Batch(namedtuple("Batch", ["data", "categories"])):
+    """
+    Decoded frames: ``data`` is a structured array with one row per reading,
+    ``categories`` maps every categorical column to its labels.
+    """
+    __slots__ = ()
+
+    def labels(self, column):
+        """ :return: array of labels of a categorical column """
+        return self.categories[column][self.data[column]]
+
+
+def read_frames(source):
+    """
+    Joins frames into one blob of terminated frames.
+    :param source: iterable of payloads, a blob of frames separated by \\r or
+    newlines, a binary file object or a path
+    :return: bytes
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            blob = f.read()
+    elif hasattr(source, "read"):
+        blob = source.read()
+    elif isinstance(source, (bytes, bytearray, memoryview)):
+        blob = bytes(source)
+    else:
+        blob = b"\r".join(source)
+    return blob.replace(b"\r\n", b"\r").replace(b"\n", b"\r").strip(b"\r")
+
+
+class _Tokens(object):
+    """
+    Tokens of joined frames, located by the offsets of the delimiters and
+    copied from the buffer only for the columns converted.
+    """
+
+    def __init__(self, source):
+        buffer = np.frombuffer(read_frames(source), dtype=np.uint8)
+        delimiters = np.flatnonzero((buffer == COMMA) | (buffer == CR))
+        self.starts = np.concatenate([[0], delimiters + 1])
+        self.ends = np.append(delimiters, len(buffer))
+        # token i + 1 follows delimiter i, frames start after a CR
+        self.frames = np.concatenate(
+            [[0], np.flatnonzero(buffer[delimiters] == CR) + 1])
+        if not len(buffer):
+            self.starts = self.ends = self.frames = \
+                np.empty(0, dtype=np.int64)
+        width = max(1, int((self.ends - self.starts).max(initial=0)))
+        padded = np.concatenate([buffer, np.zeros(width, dtype=np.uint8)])
+        # row i holds the bytes following offset i
+        self.windows = sliding_window_view(padded, width)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def chars(self, index):
+        """
+        :return: bytes of the tokens at index as rows padded with NULs,
+        lengths of the tokens
+        """
+        begin = self.starts[index]
+        length = self.ends[index] - begin
+        width = max(1, int(length.max(initial=0)))
+        chars = self.windows[begin, :width]
+        chars *= np.arange(width) < length[:, None]
+        return chars, length
+
+    def strings(self, index):
+        """ :return: fixed width bytes array of the tokens at index """
+        chars, _ = self.chars(index)
+        return chars.view(f"S{chars.shape[1]}").ravel()
+
+    def floats(self, index):
+        """ :return: float array, overload values are NaN """
+        values = self.strings(index).astype(np.float64)
+        values[np.abs(values) >= OVERLOAD] = np.nan
+        return values
+
+    def ints(self, index):
+        """ :return: int array of the decimal tokens at index """
+        chars, length = self.chars(index)
+        digits = chars.astype(np.int64) - ord("0")
+        negative = chars[:, 0] == ord("-")
+        digits[negative, 0] = 0
+        places = length[:, None] - 1 - np.arange(chars.shape[1])
+        valid = places >= 0
+        if np.any(valid & ((digits < 0) | (digits > 9))) or \
+                np.any(length <= negative):
+            raise ValueError("invalid integer")
+        values = (np.where(valid, digits, 0) *
+                  10 ** np.maximum(places, 0)).sum(axis=1)
+        values[negative] *= -1
+        return values
+
+    def categories(self, index, lower=False):
+        """ :return: sorted labels, codes of the tokens at index """
+        chars, _ = self.chars(index)
+        width = chars.shape[1]
+        if width <= 8:
+            # big endian integers sort like the bytes and faster
+            keys = np.zeros((len(chars), 8), dtype=np.uint8)
+            keys[:, :width] = chars
+            keys, codes = np.unique(keys.view(">u8").ravel(),
+                                    return_inverse=True)
+            labels = keys.view("S8")
+        else:
+            labels, codes = np.unique(chars.view(f"S{width}").ravel(),
+                                      return_inverse=True)
+        labels = labels.astype(str)
+        if lower:
+            labels = np.char.lower(labels)
+        return labels, codes
+
+
+def decode_qdda(source):
+    """
+    Decodes QDDA payloads, one row per reading.
+    :param source: see read_frames
+    :return: Batch
+    """
+    tokens = _Tokens(source)
+    starts = tokens.frames
+    try:
+        modes = tokens.ints(starts + SETTINGS_HEAD - 1)
+        counts = tokens.ints(starts + SETTINGS_HEAD + modes)
+    except (IndexError, ValueError) as e:
+        raise ValueError(f"Malformed QDDA frames: {e}")
+    ends = np.append(starts[1:], len(tokens))
+    first = starts + SETTINGS_HEAD + modes + 1
+    if np.any(first + counts * READING_WIDTH != ends):
+        bad = np.flatnonzero(first + counts * READING_WIDTH != ends)
+        raise ValueError(f"Malformed QDDA frames {bad.tolist()}")
+
+    frames = np.repeat(np.arange(len(starts)), counts)
+    ordinal = np.arange(len(frames)) - np.repeat(np.cumsum(counts) - counts,
+                                                 counts)
+    base = first[frames] + ordinal * READING_WIDTH
+
+    data = np.empty(len(frames), dtype=QDDA_DTYPE)
+    categories = {}
+    data["frame"] = frames
+    # the function is categorized once per frame
+    labels, codes = tokens.categories(starts)
+    categories["primaryFunction"] = labels
+    data["primaryFunction"] = codes[frames]
+    for column, offset in (("readingID", 0), ("baseUnitReading", 2),
+                           ("readingState", 6), ("readingAttribute", 7)):
+        categories[column], data[column] = tokens.categories(
+            base + offset, lower=column == "readingID")
+    try:
+        data["readingValue"] = tokens.floats(base + 1)
+        data["unitMultiplierRecording"] = tokens.ints(base + 3)
+        data["decimalPlaces"] = tokens.ints(base + 4)
+        data["displayDigits"] = tokens.ints(base + 5)
+        data["timeStamp"] = tokens.floats(base + 8)
+    except ValueError as e:
+        raise ValueError(f"Malformed QDDA frames: {e}")
+    return Batch(data, categories)
+
+
+def decode_qm(source):
+    """
+    Decodes QM payloads, one row per frame.
+    :param source: see read_frames
+    :return: Batch
+    """
+    tokens = _Tokens(source)
+    starts = tokens.frames
+    width = len(QM_DTYPE) - 1
+    if len(tokens) != len(starts) * width or \
+            np.any(np.diff(starts) != width):
+        raise ValueError("Malformed QM frames")
+
+    data = np.empty(len(starts), dtype=QM_DTYPE)
+    categories = {}
+    data["frame"] = np.arange(len(starts))
+    data["value"] = tokens.floats(starts)
+    for column, offset in (("unit", 1), ("state", 2), ("attribute", 3)):
+        categories[column], data[column] = tokens.categories(
+            starts + offset)
+    return Batch(data, categories)
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+
+"""Latest-value cache of query results."""
+
+import time
+import logging
+import threading
+from collections import namedtuple
+
+from .acquisition import poll
+
+__all__ = ["QueryCache", "Entry"]
+
+logger = logging.getLogger(__name__)
+
+Entry = namedtuple("Entry", ["time", "data"])
+Entry.__doc__ = """
+Cached query result and the monotonic time it was received. The data is
+shared by all callers and must not be modified.
+"""
+
+
+class _Flight(object):
+    """ request in progress, callers of the same query wait for it """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.data = None
+        self.error = None
+
+    def wait(self):
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.data
+
+
+class QueryCache(object):
+    """
+    Keeps the newest result of each query. Configured queries are polled in
+    the background; a result younger than max_age is returned without
+    serial io, otherwise concurrent callers of the same query share one
+    request.
+    """
+
+    def __init__(self, fluke, intervals=None, max_age=None):
+        """
+        :param fluke: Fluke287
+        :param intervals: dict of query name and seconds between background
+        polls
+        :param max_age: seconds a result is fresh, default: the poll interval
+        of the query or 0, which only coalesces concurrent callers
+        """
+        self.fluke = fluke
+        self.intervals = dict(intervals or {})
+        self.max_age = max_age
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._flights = {}
+        self._lock = threading.Lock()
+        self._running = False
+        self._threads = []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def start(self):
+        """ start a background poller per configured query """
+        self._running = True
+        for name, interval in self.intervals.items():
+            thread = threading.Thread(target=self._poll,
+                                      args=(name, interval),
+                                      name=f"QueryCache-{name}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self):
+        self._running = False
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def _poll(self, name, interval):
+        def fetch():
+            try:
+                return self._fetch((name, ()))
+            except Exception as e:
+                logger.error(f"Polling {name} failed: {e}")
+
+        for sample in poll(fetch, interval, running=lambda: self._running,
+                           sleep=self._sleep):
+            pass
+
+    def _sleep(self, seconds):
+        # wake up regularly to notice stop()
+        end = time.monotonic() + seconds
+        while self._running and time.monotonic() < end:
+            time.sleep(min(0.1, end - time.monotonic()))
+
+    def _fetch(self, key, count=False):
+        """ execute a query or wait for the same query in flight """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            if count:
+                if leader:
+                    self.misses += 1
+                else:
+                    self.coalesced += 1
+        if leader:
+            try:
+                name, args = key
+                flight.data = self.fluke.execute(name, *args)
+                self.entries[key] = Entry(time.monotonic(), flight.data)
+            except Exception as e:
+                flight.error = e
+            finally:
+                with self._lock:
+                    del self._flights[key]
+                flight.done.set()
+        return flight.wait()
+
+    def get(self, query, *args):
+        """ :return: cached Entry of a query or None """
+        return self.entries.get((getattr(query, "__name__", query), args))
+
+    def execute(self, query, *args, max_age=None):
+        """
+        :param query: query name or class
+        :param args: query arguments
+        :param max_age: seconds a cached result is fresh enough
+        :return: response data of the query
+        """
+        name = getattr(query, "__name__", query)
+        if max_age is None:
+            max_age = self.max_age if self.max_age is not None else \
+                self.intervals.get(name, 0.0)
+        key = (name, args)
+        entry = self.entries.get(key)
+        if entry is not None and time.monotonic() - entry.time <= max_age:
+            self.hits += 1
+            return entry.data
+        return self._fetch(key, count=True)
+
+    def stats(self):
+        """ :return: dict of hits, misses, coalesced callers and hit rate """
+        total = self.hits + self.misses + self.coalesced
+        return dict(hits=self.hits, misses=self.misses,
+                    coalesced=self.coalesced,
+                    hit_rate=self.hits / total if total else 0.0)
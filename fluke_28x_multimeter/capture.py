@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+
+"""
+Raw wire capture and replay.
+
+CaptureIO wraps the serial port and appends every written and read chunk
+to a capture file as a binary record: monotonic seconds since the start of
+the capture, direction and length packed as ``<dBI`` followed by the bytes.
+The file starts with MAGIC. ReplayIO plays a capture back as ``io`` of a
+Fluke287: every request must match the captured one and is answered with
+the captured bytes at their original delay divided by speed.
+"""
+
+import os
+import time
+import struct
+import threading
+from collections import namedtuple, deque
+
+from .query import TIMEOUT
+
+__all__ = ["CaptureIO", "ReplayIO", "Record", "read_capture", "TX", "RX"]
+
+MAGIC = b"FLUKECAP1\n"
+TX = 0
+RX = 1
+_record = struct.Struct("<dBI")
+
+Record = namedtuple("Record", ["time", "direction", "data"])
+Record.__doc__ = """
+Captured chunk: seconds since the start of the capture, TX for bytes
+written to the meter or RX for bytes read from it, and the bytes.
+"""
+
+
+def read_capture(path):
+    """
+    :param path: capture file
+    :return: generator of Records
+    """
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a capture file")
+        while True:
+            head = f.read(_record.size)
+            if len(head) < _record.size:
+                return
+            time_, direction, size = _record.unpack(head)
+            yield Record(time_, direction, f.read(size))
+
+
+class CaptureIO(object):
+    """
+    Serial port wrapper recording the raw traffic, other attributes are
+    passed through to the port.
+    """
+
+    def __init__(self, io, out, clock=time.monotonic):
+        """
+        :param io: pyserial like port
+        :param out: path or binary file
+        :param clock: monotonic clock
+        """
+        self.io = io
+        self.clock = clock
+        self.records = 0
+        self._close = isinstance(out, (str, os.PathLike))
+        self._out = open(out, "wb") if self._close else out
+        self._out.write(MAGIC)
+        self._start = clock()
+
+    def __getattr__(self, name):
+        return getattr(self.io, name)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.io!r})"
+
+    @property
+    def in_waiting(self):
+        # read by FrameReader before every read, avoid __getattr__
+        return self.io.in_waiting
+
+    def _record(self, direction, data):
+        self._out.write(_record.pack(self.clock() - self._start, direction,
+                                     len(data)) + data)
+        self.records += 1
+
+    def write(self, data):
+        self._record(TX, data)
+        return self.io.write(data)
+
+    def read(self, size=1):
+        data = self.io.read(size)
+        if data:
+            self._record(RX, data)
+        return data
+
+    def flush(self):
+        self._out.flush()
+
+    def stop(self):
+        """ :return: the wrapped port, which stays open """
+        if self._close:
+            self._out.close()
+        else:
+            self._out.flush()
+        return self.io
+
+    def close(self):
+        self.stop()
+        self.io.close()
+
+
+class ReplayIO(object):
+    """
+    pyserial like port answering requests from a capture.
+    """
+
+    def __init__(self, records, speed=1.0, timeout=TIMEOUT):
+        """
+        :param records: path of a capture file or iterable of Records
+        :param speed: time factor of the replay, None answers immediately
+        :param timeout: seconds read() waits for data like a serial port
+        """
+        if isinstance(records, (str, os.PathLike)):
+            self.port = os.fspath(records)
+            records = read_capture(records)
+        else:
+            self.port = "replay"
+        self.records = deque(records)
+        self.speed = speed
+        self.timeout = timeout
+        self.is_open = True
+        self.requests = 0
+        self._segments = deque()
+        self._condition = threading.Condition()
+        # answers captured before the first request
+        self._schedule(None, time.monotonic())
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(port={self.port!r})"
+
+    def _schedule(self, sent, now):
+        """ make the chunks read after a request readable on time """
+        records = self.records
+        while records and records[0].direction == RX:
+            record = records.popleft()
+            delay = 0.0 if sent is None or not self.speed else \
+                (record.time - sent) / self.speed
+            self._segments.append([now + delay, record.data])
+
+    def open(self):
+        self.is_open = True
+
+    def close(self):
+        self.is_open = False
+
+    def get_settings(self):
+        return dict(timeout=self.timeout)
+
+    def reset_input_buffer(self):
+        with self._condition:
+            self._segments.clear()
+
+    @property
+    def done(self):
+        """ True if all captured requests were replayed """
+        return not self.records
+
+    def write(self, data):
+        if not self.is_open:
+            raise OSError("Port is closed")
+        with self._condition:
+            now = time.monotonic()
+            if not self.records or self.records[0].data != data:
+                expected = self.records[0].data if self.records else None
+                raise ValueError(f"Request {data!r} does not match the "
+                                 f"capture, expected {expected!r}")
+            self.requests += 1
+            sent = self.records.popleft().time
+            self._schedule(sent, now)
+            self._condition.notify_all()
+        return len(data)
+
+    @property
+    def in_waiting(self):
+        with self._condition:
+            now = time.monotonic()
+            total = 0
+            for available, data in self._segments:
+                if available > now:
+                    break
+                total += len(data)
+            return total
+
+    def read(self, size=1):
+        if not self.is_open:
+            raise OSError("Port is closed")
+        deadline = None if self.timeout is None else \
+            time.monotonic() + self.timeout
+        buffer = bytearray()
+        with self._condition:
+            segments = self._segments
+            while True:
+                now = time.monotonic()
+                while segments and segments[0][0] <= now and \
+                        len(buffer) < size:
+                    segment = segments[0]
+                    take = segment[1][:size - len(buffer)]
+                    buffer += take
+                    if len(take) == len(segment[1]):
+                        segments.popleft()
+                    else:
+                        segment[1] = segment[1][len(take):]
+                if len(buffer) >= size or \
+                        (deadline is not None and now >= deadline):
+                    return bytes(buffer)
+                wait = segments[0][0] - now if segments else None
+                if deadline is not None:
+                    wait = deadline - now if wait is None else \
+                        min(wait, deadline - now)
+                self._condition.wait(wait)
@@ -4,23 +4,98 @@
 
 import sys
 import click
-import timeit
+import signal
 import logging
+from functools import update_wrapper
 from fluke_28x_multimeter import Fluke287
 from fluke_28x_multimeter.out import write_csv
 
 logger = logging.getLogger(__name__)
 
 
+class Connection(object):
+    """ opens the device on first use instead of on every invocation """
+
+    def __init__(self, port=None, capture=None, replay=None):
+        self.port = port
+        self.capture = capture
+        self.replay = replay
+        self._fluke = None
+
+    def get(self):
+        """ :return: connected Fluke287, exits if no device is found """
+        if self._fluke is None and self.replay is not None:
+            from fluke_28x_multimeter.capture import ReplayIO
+            self._fluke = Fluke287(io=ReplayIO(self.replay))
+        if self._fluke is None:
+            from serial import SerialException
+            try:
+                fluke = Fluke287(port=self.port)
+            except SerialException as e:
+                logger.debug(f"Opening {self.port} failed: {e}")
+                fluke = None
+            if fluke is None or not fluke.is_connected:
+                from serial.tools.list_ports import comports
+                click.secho(f"Device not found", fg="red")
+                click.echo("Available devices:")
+                for port in comports():
+                    click.echo(f"  * {port.device} - SN:{port.serial_number}")
+                sys.exit(1)
+            if self.capture is not None:
+                fluke.start_capture(self.capture)
+            self._fluke = fluke
+        return self._fluke
+
+    def close(self):
+        """ write the rest of the capture """
+        if self._fluke is not None:
+            self._fluke.stop_capture()
+
+
+def _terminate(signum, frame):
+    sys.exit(128 + signum)
+
+
+def exit_on_sigterm(f):
+    """
+    exit normally on SIGTERM while a long running command runs, so that
+    files and captures are closed, the previous handler is restored after
+    """
+    def new_func(*args, **kwargs):
+        previous = signal.signal(signal.SIGTERM, _terminate)
+        try:
+            return f(*args, **kwargs)
+        finally:
+            signal.signal(signal.SIGTERM, previous)
+    return update_wrapper(new_func, f)
+
+
+def pass_fluke(f):
+    """ like click.pass_obj, but passes the connected Fluke287 """
+    @click.pass_context
+    def new_func(ctx, *args, **kwargs):
+        obj = ctx.obj
+        fluke = obj.get() if isinstance(obj, Connection) else obj
+        return ctx.invoke(f, fluke, *args, **kwargs)
+    return update_wrapper(new_func, f)
+
+
 @click.group()
 @click.option("-v", "--verbose", type=click.BOOL, is_flag=True,
               help="print more output")
+@click.option("-p", "--port", type=click.STRING, default=None,
+              help="serial port, default: find the IR cable")
+@click.option("--capture", type=click.Path(dir_okay=False), default=None,
+              help="record the raw serial traffic to a file")
+@click.option("--replay", type=click.Path(exists=True, dir_okay=False),
+              default=None, help="answer requests from a capture instead "
+                                 "of a meter")
 @click.pass_context
-def main(ctx, verbose):
+def main(ctx, verbose, port, capture, replay):
     """Console script for fluke_28x_multimeter."""
     if ctx.obj is None:
-        # only initialize Fluke if this is the first run
-        # this is needed for click repl
+        # only initialize on the first run, this is needed for click repl.
+        # the device is opened by the first command using it
         if verbose:
             click.echo("Fluke 287")
 
@@ -33,69 +108,292 @@ def main(ctx, verbose):
             from gevent import monkey
             monkey.patch_all()
 
-        fluke = Fluke287()
-        if not fluke.is_connected:
-            from serial.tools.list_ports import comports
-            click.secho(f"Device not found", fg="red")
-            click.echo("Available devices:")
-            for port in comports():
-                click.echo(f"  * {port.device} - SN:{port.serial_number}")
-            sys.exit(1)
+        ctx.obj = Connection(port, capture, replay)
+        ctx.call_on_close(ctx.obj.close)
+
 
-        ctx.obj = fluke
+FORMATS = ["csv", "arrow", "parquet"]
+
+
+def _arrow_writer(output, query, fmt, **kwargs):
+    try:
+        from fluke_28x_multimeter.arrow import ArrowWriter
+    except ImportError as e:
+        click.secho(f"{fmt} output requires pyarrow: {e}", fg="red")
+        sys.exit(1)
+    return ArrowWriter(output or sys.stdout.buffer, query, fmt=fmt, **kwargs)
+
+
+def _write(data, query, fmt, output):
+    if fmt == "csv":
+        if output is None:
+            write_csv(data, head=True)
+        else:
+            with open(output, "w", newline="") as out:
+                write_csv(data, head=True, out=out)
+    else:
+        with _arrow_writer(output, query, fmt) as writer:
+            writer.write(data)
 
 
 @main.command()
-@click.option("-f", "--fmt", type=click.STRING, default="csv",
-              help="output format")
-@click.pass_obj
-def values(fluke, fmt):
+@click.option("-f", "--fmt", type=click.Choice(FORMATS), default="csv",
+              help="output format", show_default=True)
+@click.option("-o", "--output", type=click.Path(dir_okay=False),
+              default=None, help="file to write, default: stdout")
+@pass_fluke
+def values(fluke, fmt, output):
     """
     Displays all values shown on the multimeters screen
     :param fluke:
     :param fmt:
+    :param output:
     :return:
     """
     data = fluke.values
-    if fmt == "csv":
-        write_csv(data, head=True)
+    _write(data, "QDDA", fmt, output)
     return data
 
 
 @main.command()
-@click.option("-f", "--fmt", type=click.STRING, default="csv",
-              help="output format")
-@click.pass_obj
-def value(fluke, fmt):
+@click.option("-f", "--fmt", type=click.Choice(FORMATS), default="csv",
+              help="output format", show_default=True)
+@click.option("-o", "--output", type=click.Path(dir_okay=False),
+              default=None, help="file to write, default: stdout")
+@pass_fluke
+def value(fluke, fmt, output):
     """
     Displays primary measurement from Multimeter
     :param fluke:
     :param fmt:
+    :param output:
     :return:
     """
     data = fluke.value
-    if fmt == "csv":
-        write_csv(data, head=True)
+    _write(data, "QM", fmt, output)
     return data
 
 
 @main.command()
-@click.option("-f", "--fmt", type=click.STRING, default="csv",
-              help="output format")
-@click.pass_obj
-def id(fluke, fmt):
+@click.option("-f", "--fmt", type=click.Choice(FORMATS), default="csv",
+              help="output format", show_default=True)
+@click.option("-o", "--output", type=click.Path(dir_okay=False),
+              default=None, help="file to write, default: stdout")
+@pass_fluke
+def id(fluke, fmt, output):
     """
     Displays information about connected Device
     :param fluke:
     :param fmt:
+    :param output:
     :return:
     """
     data = fluke.id
-    if fmt == "csv":
-        write_csv(data, head=True)
+    _write(data, "ID", fmt, output)
     return data
 
 
+@main.command()
+@click.option("-q", "--query", type=click.STRING, default="QDDA",
+              help="query to poll", show_default=True)
+@click.option("-i", "--interval", type=click.FLOAT, default=1.0,
+              help="seconds between polls, 0 polls as fast as possible",
+              show_default=True)
+@click.option("-n", "--count", type=click.INT, default=None,
+              help="number of samples, default: endless")
+@click.option("-p", "--policy", type=click.Choice(["skip", "catch-up"]),
+              default="skip", help="what to do on overruns",
+              show_default=True)
+@click.option("-t", "--timing", type=click.BOOL, is_flag=True,
+              help="add target time, jitter and duration columns")
+@click.option("-f", "--fmt", type=click.Choice(["csv"]), default="csv",
+              help="output format", show_default=True)
+@pass_fluke
+@exit_on_sigterm
+def stream(fluke, query, interval, count, policy, timing, fmt):
+    """
+    Polls a query at a fixed rate
+    :param fluke:
+    :param query:
+    :param interval:
+    :param count:
+    :param policy:
+    :param timing:
+    :param fmt:
+    :return:
+    """
+    from fluke_28x_multimeter.acquisition import acquire
+
+    keys = None
+    for sample in acquire(fluke, query, interval, count=count,
+                          policy=policy):
+        rows = sample.data if isinstance(sample.data, list) else \
+            [sample.data]
+        if timing:
+            rows = [dict(row, target=sample.target, jitter=sample.jitter,
+                         duration=sample.duration, skipped=sample.skipped)
+                    for row in rows]
+        head = keys is None
+        if head:
+            keys = list(rows[0].keys())
+        write_csv(rows, head=head, keys=keys)
+
+
+def _print_metrics(snapshot):
+    """ prints a metrics.Metrics snapshot as table """
+    click.echo(f"{'query':8s}{'stage':>9s}{'count':>8s}{'mean ms':>10s}"
+               f"{'p50 ms':>10s}{'p99 ms':>10s}")
+    for name, query in snapshot["queries"].items():
+        for stage, histogram in query["stages"].items():
+            if not histogram["count"]:
+                continue
+            mean, p50, p99 = (histogram[k] * 1e3 for k in
+                              ("mean", "p50", "p99"))
+            click.echo(f"{name:8s}{stage:>9s}{histogram['count']:8d}"
+                       f"{mean:10.3f}{p50:10.3f}{p99:10.3f}")
+        errors = ", ".join(f"{code}={count}"
+                           for code, count in query["errors"].items())
+        click.echo(f"{'':8s} sent {query['bytesSent']} B, received "
+                   f"{query['bytesReceived']} B, {query['timeouts']} "
+                   f"timeouts, {query['parseErrors']} parse errors"
+                   + (f", errors: {errors}" if errors else ""))
+    click.echo(f"reconnects: {snapshot['reconnects']}")
+
+
+@main.command()
+@click.argument("queries", nargs=-1)
+@click.option("-n", "--count", type=click.INT, default=100,
+              help="requests per query", show_default=True)
+@click.option("-e", "--endpoint", type=click.STRING, default=None,
+              help="show the metrics of a running server instead")
+@click.pass_obj
+def stats(obj, queries, count, endpoint):
+    """
+    Times the stages of requests, by default QM, QDDA and ID
+    :param obj:
+    :param queries:
+    :param count:
+    :param endpoint:
+    :return:
+    """
+    if endpoint is not None:
+        import zerorpc
+        client = zerorpc.Client(endpoint)
+        try:
+            snapshot = client.metrics()
+        finally:
+            client.close()
+        if snapshot is None:
+            click.secho("Metrics are disabled on the server", fg="red")
+            sys.exit(1)
+    else:
+        from fluke_28x_multimeter.query import FlukeError
+
+        fluke = obj.get() if isinstance(obj, Connection) else obj
+        metrics = fluke.enable_metrics()
+        for query in queries or ("QM", "QDDA", "ID"):
+            for _ in range(count):
+                try:
+                    fluke.execute(query)
+                except (TimeoutError, OSError, FlukeError) as e:
+                    logger.warning(f"{query} failed: {e}")
+        snapshot = metrics.snapshot()
+    _print_metrics(snapshot)
+
+
+@main.command()
+@click.option("-q", "--query", type=click.Choice(["QM", "QDDA", "QDDB"]),
+              default="QM", help="query to poll", show_default=True)
+@click.option("-i", "--interval", type=click.FLOAT, default=1.0,
+              help="seconds between polls", show_default=True)
+@click.option("-n", "--count", type=click.INT, default=None,
+              help="number of samples, default: endless")
+@click.option("-o", "--output", type=click.Path(dir_okay=False),
+              default=None, help="file to write, default: stdout")
+@click.option("-f", "--fmt", type=click.Choice(["csv", "ndjson", "arrow",
+                                                "parquet"]),
+              default="csv", help="output format", show_default=True)
+@click.option("--flush-interval", type=click.FLOAT, default=1.0,
+              help="seconds between writes to disk", show_default=True)
+@click.option("--rotate-size", type=click.FLOAT, default=None,
+              help="start a new file after MB")
+@click.option("--rotate-interval", type=click.FLOAT, default=None,
+              help="start a new file after seconds")
+@pass_fluke
+@exit_on_sigterm
+def log(fluke, query, interval, count, output, fmt, flush_interval,
+        rotate_size, rotate_interval):
+    """
+    Logs a query at a fixed rate with buffered writes
+    :param fluke:
+    :param query:
+    :param interval:
+    :param count:
+    :param output:
+    :param fmt:
+    :param flush_interval:
+    :param rotate_size:
+    :param rotate_interval:
+    :return:
+    """
+    import time
+    from fluke_28x_multimeter.acquisition import acquire
+    from fluke_28x_multimeter.out import StreamWriter, fields, TIME_KEY
+
+    kwargs = dict(maps=fluke.enum_maps) if query == "QDDB" else {}
+    if fmt in ("arrow", "parquet"):
+        # a record batch / row group per flush interval, files are not
+        # rotated
+        writer = _arrow_writer(output, query, fmt, timestamp=True,
+                               flush_interval=flush_interval)
+    else:
+        writer = StreamWriter(
+            output or sys.stdout, [TIME_KEY] + fields(query), fmt=fmt,
+            flush_interval=flush_interval,
+            rotate_size=rotate_size and int(rotate_size * 1e6),
+            rotate_interval=rotate_interval)
+    try:
+        for sample in acquire(fluke, query, interval, count=count, **kwargs):
+            now = time.time()
+            rows = sample.data if isinstance(sample.data, list) else \
+                [sample.data]
+            writer.write([dict(row, **{TIME_KEY: now}) for row in rows])
+    except KeyboardInterrupt:
+        pass
+    finally:
+        writer.close()
+
+
+@main.command("export-memory")
+@click.option("-o", "--output", type=click.File("w"), default="-",
+              help="json lines file, default: stdout")
+@click.option("-k", "--kind", type=click.Choice(
+    ["records", "minMax", "peak", "measurements"]), multiple=True,
+              help="kinds of items to export, default: all")
+@click.option("-b", "--batch", type=click.INT, default=8,
+              help="requests written at once", show_default=True)
+@pass_fluke
+def export_memory(fluke, output, kind, batch):
+    """
+    Downloads recordings, sessions and measurements stored in the meter
+    :param fluke:
+    :param output:
+    :param kind:
+    :param batch:
+    :return:
+    """
+    from fluke_28x_multimeter.memory import export_memory
+
+    def progress(status):
+        click.echo(f"\r{status.done}/{status.total} items, "
+                   f"{status.rate:.1f} items/s", nl=False, err=True)
+
+    status = export_memory(fluke, output, kinds=kind or None, batch=batch,
+                           progress=progress)
+    click.echo(f"\rexported {status.done} items ({status.errors} errors) in "
+               f"{status.elapsed:.1f} s, {status.rate:.1f} items/s", err=True)
+
+
 @main.command()
 @click.option("--server",
               "serve_type",
@@ -110,159 +408,71 @@ def id(fluke, fmt):
               default="tcp://192.168.0.100:1235",
               help="endpoint of remote server or local bind",
               show_default=True)
-@click.pass_obj
-def serve(fluke, serve_type, endpoint):
+@click.option("-c", "--cache", type=click.STRING, multiple=True,
+              help="cache a query polled every interval seconds, "
+                   "e.g. QDDA=0.2")
+@click.option("--max-age", type=click.FLOAT, default=None,
+              help="seconds a cached result is fresh, default: the interval")
+@click.option("--heartbeat", type=click.BOOL, is_flag=True,
+              help="check an idle meter with a short query")
+@click.option("--metrics", type=click.BOOL, is_flag=True,
+              help="instrument the queries, see 'fluke stats -e'")
+@click.option("--metrics-port", type=click.INT, default=None,
+              help="serve the metrics as text on http://:PORT/metrics")
+@click.option("--adaptive-timeouts", type=click.BOOL, is_flag=True,
+              help="wait for each query as long as its latency suggests")
+@pass_fluke
+@exit_on_sigterm
+def serve(fluke, serve_type, endpoint, cache, max_age, heartbeat, metrics,
+          metrics_port, adaptive_timeouts):
     """
     Starts a server to expose Multimeter on network
     :param fluke
     :param serve_type:
     :param endpoint:
+    :param cache:
+    :param max_age:
+    :param heartbeat:
+    :param metrics:
+    :param metrics_port:
+    :param adaptive_timeouts:
     :return:
     """
 
     try:
         # monkey patching is done in main() if serve command is executed to
         # ensure that pySerial gets patched to
-        import gevent
-        import zerorpc
-        import time
-        from serial import SerialException
+        from fluke_28x_multimeter.server import FlukeServer
     except Exception as e:
         click.secho(f"Library not found not found, cant serve.\n {e}",
                     color="red")
         sys.exit(1)
 
-    loops = {k: -1 for k in fluke.queries.keys()}
-    connection_error = {k: False for k in fluke.queries.keys()}
+    if cache or max_age is not None:
+        intervals = {}
+        for item in cache:
+            query, _, interval = item.partition("=")
+            intervals[query] = float(interval or 1.0)
+        fluke.enable_cache(intervals, max_age)
 
-    @zerorpc.stream
-    def start_loop(query, intervalS):
-        try:
-            timer = timeit.default_timer
-            try:
-                loops[query] = float(intervalS)
-            except ValueError as e:
-                loops[query] = int(intervalS)
-
-            while loops[query] > 0.0:
-                start_time = timer()
-                while not fluke.is_connected:
-                    logger.error(f"Device is not connected {e}")
-                    fluke.connect()
-                try:
-                    yield fluke.execute(query)
-                except (TimeoutError, SerialException) as e:
-                    logger.exception(
-                        f"{query} failed. Check if cable is plugged "
-                        "in correctly",
-                        exc_info=e)
-                    connection_error[query] = True
-                    raise e
-                while timer() - start_time < loops[query]:
-                    time.sleep(0.1)
-        except Exception as e:
-            print(e)
-            loops[query] = -1
-            raise e
-
-    def stop_loop(query):
-        loops[query] = -1
-
-    def control_loop():
-        timer = timeit.default_timer
-        start_time = timer()
-        successful_reconnects = 0
-        retries = 0
-        while True:
-            if fluke.is_connected is False or \
-                    any(connection_error.values()) is True:
-                try:
-                    retries = retries + 1
-                    logger.error(f"Device is not connected. retry {retries}")
-                    fluke.connect()
-                    if not fluke.is_connected:
-                        # check if serial port is found and connected
-                        logger.error("Reconnect failed. Is cable plugged in?")
-                    else:
-                        try:
-                            # get status to ensure fluke is connected again
-                            status = fluke.status
-                            logger.info(
-                                f"Reconnected to device. Status: {status}")
-
-                            # reset error dict
-                            for k in connection_error.keys():
-                                connection_error[k] = False
-
-                            # reset counters
-                            retries = 0
-                            successful_reconnects = successful_reconnects + 1
-                        except TimeoutError as e:
-                            logger.error(
-                                "Found device, but got no answer. Check "
-                                "if cable is plugged into device")
-                except SerialException as e:
-                    # change log level if 10 retries failed
-                    if retries < 10:
-                        level = logging.ERROR
-                    else:
-                        level = logging.CRITICAL
-                    logger.log(level,
-                               "Serial port not found, is cable plugged into Computer?",
-                               exc_info=e)
-            else:
-                if all([v < 0.0 for v in loops.values()]):
-                    # no loops running, print meditation msg
-                    uptime = time.strftime('%Hh %Mm %Ss',
-                                           time.gmtime(timer() - start_time))
-                    logger.info(f"guru meditation. . ."
-                                f", up since {uptime}"
-                                f", reconnected {successful_reconnects} times")
-
-            # Doesnt matter whats going on, take some rest for some seconds
-            # in each case
-            wait_start = timer()
-            while timer() - wait_start < 3.0:
-                time.sleep(1.0)
-
-    ctx = zerorpc.Context()
-    ctx.register_middleware({
-        # 'resolve_endpoint':           [],
-        # 'load_task_context':          [],
-        'get_task_context': lambda: dict(device_name=fluke.__class__.__name__),
-        # 'server_before_exec':         [],
-        # 'server_after_exec':          [],
-        # 'server_inspect_exception':   [],
-        # 'client_handle_remote_error': [],
-        # 'client_before_request':      [],
-        # 'client_after_request':       [],
-        # 'client_patterns_list':       [],
-    })
-
-    worker = zerorpc.Server(
-        context=ctx,
-        methods={
-            "__name__":    fluke.__class__.__name__,
-            "holdOff":     fluke.hold_off,
-            "minMax":      fluke.min_max,
-            "status":      lambda: fluke.status,
-            "isConnected": lambda: fluke.is_connected,
-            "execute":     fluke.execute,
-            "startLoop":   start_loop,
-            "stopLoop":    stop_loop
-        })
+    if metrics:
+        fluke.enable_metrics()
+    if adaptive_timeouts:
+        fluke.enable_adaptive_timeouts()
+
+    server = FlukeServer(fluke, heartbeat=heartbeat)
+    if metrics_port is not None:
+        server.serve_metrics(("", metrics_port))
 
     if serve_type == "bind":
-        worker.bind(endpoint=endpoint)
+        server.bind(endpoint)
         click.echo(f"Bound to {endpoint}", color="green")
 
     if serve_type == "connect":
-        worker.connect(endpoint)
+        server.connect(endpoint)
         click.echo(f"Connected to {endpoint}", color="green")
 
-    greenlets = [gevent.spawn(worker.run),
-                 gevent.spawn_later(5, control_loop)]
-    gevent.joinall(greenlets)
+    server.run()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+
+"""
+Cached discovery of the serial ports of IR cables.
+
+``comports()`` walks sysfs for every serial device of the host, which is
+slow with many USB adapters and was repeated on every reconnect attempt.
+The PortCache keeps the ports of the last scan and maps cables to their
+``/dev/serial/by-id`` links where udev provides them; these names contain
+the serial number and stay the same when a cable is plugged in again, so a
+reconnect only lists that directory. Missing cables cause at most one
+rescan per rescan_interval.
+With pyudev installed, watch() drops the cache on tty hot-plug events.
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import namedtuple
+
+__all__ = ["PortCache", "Port", "ports", "BY_ID"]
+
+logger = logging.getLogger(__name__)
+
+BY_ID = "/dev/serial/by-id"
+# minimum seconds between two scans of all serial ports
+RESCAN_INTERVAL = 2.0
+
+Port = namedtuple("Port", ["device", "serial_number", "vid"])
+Port.__doc__ = """
+Serial port of a USB device, device is the by-id link if there is one.
+"""
+
+
+def _comports():
+    from serial.tools.list_ports import comports
+    return comports()
+
+
+class PortCache(object):
+    """
+    Ports of the last scan of all serial devices, rescanned if a requested
+    cable is missing or its port disappeared.
+    """
+
+    def __init__(self, rescan_interval=RESCAN_INTERVAL, by_id=BY_ID,
+                 scan=_comports, clock=time.monotonic):
+        """
+        :param rescan_interval: minimum seconds between scans
+        :param by_id: directory of the stable links of serial devices
+        :param scan: callable returning pyserial ListPortInfo like objects
+        :param clock: time source
+        """
+        self.rescan_interval = rescan_interval
+        self.by_id = by_id
+        self.scan = scan
+        self.clock = clock
+        self.ports = []
+        self.scans = 0
+        self._scanned = None
+        self._lock = threading.Lock()
+        self._observer = None
+
+    def _links(self):
+        """ :return: dict of device and its by-id link """
+        try:
+            names = os.listdir(self.by_id)
+        except OSError:
+            return {}
+        links = {}
+        for name in sorted(names):
+            path = os.path.join(self.by_id, name)
+            links.setdefault(os.path.realpath(path), path)
+        return links
+
+    def _link(self, serial_number):
+        """ :return: by-id link named after the serial number or None """
+        try:
+            names = os.listdir(self.by_id)
+        except OSError:
+            return None
+        for name in sorted(names):
+            # usb-FTDI_FT230X_Basic_UART_AL03L2UV-if00-port0
+            if f"_{serial_number}-" in name:
+                return os.path.join(self.by_id, name)
+        return None
+
+    def _rescan(self, force=False):
+        """ scan all serial ports unless the last scan is too recent """
+        now = self.clock()
+        if not force and self._scanned is not None and \
+                now - self._scanned < self.rescan_interval:
+            return False
+        links = self._links()
+        self.ports = [Port(links.get(os.path.realpath(p.device), p.device),
+                           p.serial_number, p.vid) for p in self.scan()]
+        self._scanned = now
+        self.scans += 1
+        logger.debug(f"Found serial ports {self.ports}")
+        return True
+
+    def invalidate(self):
+        """ forget the ports, the next lookup scans again """
+        with self._lock:
+            self.ports = []
+            self._scanned = None
+
+    def find(self, serial_number):
+        """
+        :param serial_number: USB serial number of the cable
+        :return: device of the cable or None
+        """
+        with self._lock:
+            for attempt in range(2):
+                for port in self.ports:
+                    if port.serial_number != serial_number:
+                        continue
+                    if os.path.exists(port.device):
+                        return port.device
+                    # unplugged since the last scan
+                    self.ports.remove(port)
+                    break
+                # plugged in again or first use, udev names the link after
+                # the serial number
+                link = self._link(serial_number)
+                if link is not None:
+                    return link
+                if not self._rescan():
+                    return None
+            return None
+
+    def find_all(self, serial_numbers=None, vid=None, rescan=True):
+        """
+        :param serial_numbers: USB serial numbers, default: every port with
+        the vendor id vid
+        :param vid: USB vendor id
+        :param rescan: scan unless the last scan is too recent
+        :return: list of devices ordered by serial number
+        """
+        with self._lock:
+            if rescan or self._scanned is None:
+                self._rescan()
+            ports = [port for port in self.ports
+                     if (port.serial_number in serial_numbers
+                         if serial_numbers is not None else port.vid == vid)]
+        return [port.device for port in
+                sorted(ports, key=lambda p: (p.serial_number or "", p.device))]
+
+    def watch(self):
+        """
+        invalidate the cache on tty hot-plug events, requires pyudev
+        :return: True if watching else False
+        """
+        if self._observer is not None:
+            return True
+        try:
+            import pyudev
+        except ImportError:
+            logger.info("pyudev not installed, rescanning on demand")
+            return False
+
+        def event(device):
+            logger.debug(f"{device.action} {device.device_node}")
+            if device.action in ("add", "remove", "change"):
+                self.invalidate()
+
+        monitor = pyudev.Monitor.from_netlink(pyudev.Context())
+        monitor.filter_by("tty")
+        self._observer = pyudev.MonitorObserver(monitor, callback=event,
+                                                name="PortCache-udev")
+        self._observer.daemon = True
+        self._observer.start()
+        return True
+
+    def unwatch(self):
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer = None
+
+
+# shared by find and find_all
+ports = PortCache()
@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+
+"""Concurrent polling of many meters."""
+
+import time
+import queue
+import logging
+import threading
+from collections import namedtuple, deque
+
+from . import Fluke287
+from .query import find_all, FlukeError
+from .acquisition import poll, SKIP
+
+__all__ = ["FlukeGroup", "Tick", "DeviceStats"]
+
+logger = logging.getLogger(__name__)
+
+# poll durations kept per device for latency statistics
+LATENCY_HISTORY = 1024
+
+Tick = namedtuple("Tick", ["deadline", "target", "samples"])
+Tick.__doc__ = """
+Samples of all meters for one deadline of the common schedule: ``deadline``
+is the number of the deadline, ``target`` its monotonic time and
+``samples`` a dict of tag and acquisition.Sample. Meters which failed or
+skipped the deadline are missing.
+"""
+
+DeviceStats = namedtuple("DeviceStats", ["samples", "errors", "rate", "mean",
+                                         "p50", "p99", "max"])
+DeviceStats.__doc__ = """
+Samples, errors and samples per second of one meter and its poll latency
+in seconds.
+"""
+
+
+def _percentile(values, q):
+    """ :return: q-th percentile of sorted values """
+    if not values:
+        return float("nan")
+    return values[min(len(values) - 1, int(q / 100.0 * len(values)))]
+
+
+class _Device(object):
+
+    def __init__(self, tag, fluke):
+        self.tag = tag
+        self.fluke = fluke
+        self.samples = 0
+        self.errors = 0
+        self.latency = deque(maxlen=LATENCY_HISTORY)
+
+
+class FlukeGroup(object):
+    """
+    Group of meters polled concurrently, one thread per serial port. All
+    threads share the deadlines of one schedule, so the merged stream is
+    aligned in time and every sample is tagged with its meter.
+    """
+
+    def __init__(self, flukes):
+        """
+        :param flukes: dict of tag and Fluke287 or list of Fluke287 tagged
+        with their port
+        """
+        if not hasattr(flukes, "items"):
+            flukes = {getattr(getattr(f, "_io", None), "port", None) or
+                      str(i): f for i, f in enumerate(flukes)}
+        self.devices = {tag: _Device(tag, f) for tag, f in flukes.items()}
+        self.started = None
+        self.stopped = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return len(self.devices)
+
+    @property
+    def flukes(self):
+        return {tag: d.fluke for tag, d in self.devices.items()}
+
+    @classmethod
+    def discover(cls, serial_numbers=None, probe=True):
+        """
+        connects to every IR cable found by find_all
+        :param serial_numbers: USB serial numbers, default: all cables
+        :param probe: tag meters by the serial number of their ID and skip
+        cables without responding meter, otherwise tag by port
+        :return: FlukeGroup
+        """
+        flukes = {}
+        for port in find_all(serial_numbers):
+            fluke = None
+            try:
+                fluke = Fluke287(port=port)
+                tag = fluke.id["serialNumber"] if probe else port
+            except (TimeoutError, FlukeError, OSError) as e:
+                logger.warning(f"No meter found on {port}: {e}")
+                if fluke is not None:
+                    fluke.disconnect()
+                continue
+            flukes[tag] = fluke
+        return cls(flukes)
+
+    def close(self):
+        for device in self.devices.values():
+            device.fluke.disconnect()
+
+    def _run(self, device, samples, query, interval, args, kwargs, count,
+             policy, running, start, sleep):
+        def execute():
+            begin = time.perf_counter()
+            try:
+                data = device.fluke.execute(query, *args, **kwargs)
+            except (TimeoutError, FlukeError, OSError) as e:
+                device.errors += 1
+                logger.error(f"{query} failed on {device.tag}: {e}")
+                return None
+            device.latency.append(time.perf_counter() - begin)
+            device.samples += 1
+            return data
+
+        try:
+            for sample in poll(execute, interval, count=count, policy=policy,
+                               running=running, start=start, sleep=sleep):
+                samples.put((device.tag, sample))
+        except Exception as e:
+            logger.exception(f"Polling {device.tag} failed", exc_info=e)
+        finally:
+            samples.put((device.tag, None))
+
+    def poll(self, query, interval, *args, count=None, policy=SKIP,
+             running=None, **kwargs):
+        """
+        Executes a query on every meter every interval seconds
+        :param query: query name or class
+        :param interval: seconds between polls
+        :param count: number of samples per meter, default: endless
+        :param policy: overrun policy of every meter, see acquisition.poll
+        :param running: callable, polling stops if it returns False
+        :return: generator of Ticks ordered by deadline
+        """
+        stop = threading.Event()
+        samples = queue.Queue()
+        start = time.monotonic()
+
+        def is_running():
+            return not stop.is_set() and (running is None or running())
+
+        threads = [threading.Thread(
+            target=self._run, daemon=True,
+            name=f"{self.__class__.__name__}-{tag}",
+            args=(device, samples, query, interval, args, kwargs, count,
+                  policy, is_running, start, stop.wait))
+            for tag, device in self.devices.items()]
+
+        for device in self.devices.values():
+            device.samples = device.errors = 0
+            device.latency.clear()
+        self.started = time.monotonic()
+        self.stopped = None
+        for thread in threads:
+            thread.start()
+
+        active = set(self.devices)
+        reached = {}
+        pending = {}
+        try:
+            while active:
+                tag, sample = samples.get()
+                if sample is None:
+                    active.discard(tag)
+                else:
+                    deadline = round((sample.target - start) / interval) \
+                        if interval > 0 else sample.index
+                    reached[tag] = deadline
+                    if sample.data is not None:
+                        pending.setdefault(deadline, {})[tag] = sample
+                # a deadline is complete when every meter has passed it
+                complete = min((reached.get(t, -1) for t in active),
+                               default=None)
+                for deadline in sorted(pending):
+                    if complete is not None and deadline > complete:
+                        break
+                    yield Tick(deadline, start + deadline * interval,
+                               pending.pop(deadline))
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+            self.stopped = time.monotonic()
+
+    def stats(self):
+        """
+        :return: dict of aggregate samples, elapsed seconds and rate and the
+        DeviceStats of every meter
+        """
+        if self.started is None:
+            elapsed = 0.0
+        else:
+            elapsed = (self.stopped or time.monotonic()) - self.started
+        devices = {}
+        for tag, device in self.devices.items():
+            latency = sorted(device.latency)
+            devices[tag] = DeviceStats(
+                device.samples, device.errors,
+                device.samples / elapsed if elapsed else 0.0,
+                sum(latency) / len(latency) if latency else float("nan"),
+                _percentile(latency, 50), _percentile(latency, 99),
+                latency[-1] if latency else float("nan"))
+        samples = sum(d.samples for d in devices.values())
+        return dict(samples=samples, elapsed=elapsed,
+                    rate=samples / elapsed if elapsed else 0.0,
+                    devices=devices)
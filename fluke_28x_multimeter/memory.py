@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+
+"""Bulk export of the items stored in the memory of the meter."""
+
+import json
+import time
+import logging
+from collections import namedtuple
+
+from .query import QSLS, QRSI, QMMSI, QPSI, QSMR, FlukeError
+
+__all__ = ["MEMORY_QUERIES", "Progress", "export_memory"]
+
+logger = logging.getLogger(__name__)
+
+# QSLS count -> query downloading one item
+MEMORY_QUERIES = {
+    "records": QRSI,
+    "minMax": QMMSI,
+    "peak": QPSI,
+    "measurements": QSMR,
+}
+
+# requests written at once
+BATCH = 8
+
+Progress = namedtuple("Progress", ["done", "total", "errors", "elapsed",
+                                   "rate"])
+Progress.__doc__ = """
+Exported items of all items, items failed with a FlukeError, seconds since
+the start and items per second.
+"""
+
+
+def export_memory(fluke, out, kinds=None, batch=BATCH, progress=None):
+    """
+    Downloads every stored item counted by QSLS, the requests are pipelined
+    in batches. Every item is written as one json line as soon as its batch
+    is received:
+
+        {"kind": "records", "query": "QRSI", "index": 0, "fields": [...]}
+
+    Items the meter refuses are written with an "error" instead of fields.
+    :param fluke: Fluke287
+    :param out: text file
+    :param kinds: keys of MEMORY_QUERIES, default: all
+    :param batch: requests per pipelined write
+    :param progress: callable receiving a Progress after every batch
+    :return: final Progress
+    """
+    counts = fluke.execute(QSLS)
+    items = [(kind, MEMORY_QUERIES[kind], index)
+             for kind in (kinds or MEMORY_QUERIES)
+             for index in range(counts[kind])]
+    logger.info(f"Exporting {len(items)} items: {counts}")
+
+    start = time.monotonic()
+    errors = 0
+    status = Progress(0, len(items), 0, 0.0, 0.0)
+    for first in range(0, len(items), batch):
+        chunk = items[first:first + batch]
+        requests = fluke.execute_many([(q, (index,))
+                                       for _, q, index in chunk])
+        for (kind, q, index), request in zip(chunk, requests):
+            line = dict(kind=kind, query=q.__name__, index=index)
+            data = request.response.data
+            if isinstance(data, FlukeError):
+                errors += 1
+                line["error"] = data.name
+            else:
+                line["fields"] = data
+            out.write(json.dumps(line) + "\n")
+        out.flush()
+        done = first + len(chunk)
+        elapsed = time.monotonic() - start
+        status = Progress(done, len(items), errors, elapsed,
+                          done / elapsed if elapsed else 0.0)
+        if progress is not None:
+            progress(status)
+    return status
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+
+"""
+Per query instrumentation of the serial protocol.
+
+Enabled with ``Fluke287.enable_metrics()``, Query.execute and
+Query.read_response then time the send, ACK, payload and parse stages of
+every request and count bytes, FlukeErrors by response code and timeouts.
+Disabled, the only cost is one attribute lookup per request.
+"""
+
+import time
+from bisect import bisect_left
+
+from .query import TERMINATOR, RESPONSE_CODE, FlukeError
+
+__all__ = ["Metrics", "QueryMetrics", "Histogram", "STAGES"]
+
+STAGES = ("send", "ack", "payload", "parse")
+# upper bounds of the histogram buckets in seconds
+BUCKETS = tuple(m * 10.0 ** e for e in range(-5, 1) for m in (1, 2, 5)) + \
+    (10.0,)
+
+
+class Histogram(object):
+    """ counts of durations in fixed buckets """
+
+    def __init__(self, bounds=BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def percentile(self, p):
+        """
+        estimate interpolated linearly within the bucket containing the
+        percentile, like histogram_quantile of Prometheus
+        :return: seconds, the highest bound for values above it
+        """
+        if not self.count:
+            return None
+        rank = p / 100 * self.count
+        total = 0
+        lower = 0.0
+        for bound, count in zip(self.bounds, self.counts):
+            if count and total + count >= rank:
+                return lower + (bound - lower) * (rank - total) / count
+            total += count
+            lower = bound
+        return self.bounds[-1]
+
+    def to_dict(self):
+        return dict(count=self.count, sum=self.sum,
+                    mean=self.sum / self.count if self.count else None,
+                    p50=self.percentile(50), p99=self.percentile(99),
+                    buckets=self.counts)
+
+
+class QueryMetrics(object):
+    """ stage durations and counters of one query class """
+
+    def __init__(self, name):
+        self.name = name
+        self.stages = {stage: Histogram() for stage in STAGES}
+        self.requests = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.errors = {}
+        self.parse_errors = 0
+        self.timeouts = 0
+
+    def to_dict(self):
+        return dict(requests=self.requests,
+                    bytesSent=self.bytes_sent,
+                    bytesReceived=self.bytes_received,
+                    errors=dict(self.errors),
+                    parseErrors=self.parse_errors,
+                    timeouts=self.timeouts,
+                    stages={stage: histogram.to_dict()
+                            for stage, histogram in self.stages.items()})
+
+
+class Metrics(object):
+    """ QueryMetrics of all queries of a Fluke287 and its reconnects """
+
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.queries = {}
+        self.reconnects = 0
+        self.started = time.time()
+
+    def query(self, name):
+        """ :return: QueryMetrics of a query name, created on first use """
+        metrics = self.queries.get(name)
+        if metrics is None:
+            metrics = self.queries[name] = QueryMetrics(name)
+        return metrics
+
+    def send(self, query, io, payload):
+        """ Query.execute: send a request """
+        start = self.clock()
+        io.send(payload)
+        self.query(query.__name__).stages["send"].observe(
+            self.clock() - start)
+
+    def read_response(self, query, io, request, *args, **kwargs):
+        """ Query.read_response with timing of every stage """
+        clock = self.clock
+        metrics = self.query(query.__name__)
+        stages = metrics.stages
+        metrics.requests += 1
+        metrics.bytes_sent += len(request.payload)
+        try:
+            start = clock()
+            ack_response = io.recv()
+            stages["ack"].observe(clock() - start)
+            metrics.bytes_received += len(ack_response) + len(TERMINATOR)
+            ack = query.check_ack(request, ack_response, *args, **kwargs)
+            payload = None
+            if len(query.properties) != 0:
+                start = clock()
+                payload = query.read_payload(io, request, *args, **kwargs)
+                stages["payload"].observe(clock() - start)
+                metrics.bytes_received += len(payload) + len(TERMINATOR)
+        except TimeoutError:
+            metrics.timeouts += 1
+            raise
+        except FlukeError as e:
+            name = RESPONSE_CODE(e.code).name
+            metrics.errors[name] = metrics.errors.get(name, 0) + 1
+            raise
+        start = clock()
+        request = query.build_response(request, ack, payload, *args,
+                                       **kwargs)
+        stages["parse"].observe(clock() - start)
+        if isinstance(request.response.data, Exception):
+            metrics.parse_errors += 1
+        return request
+
+    def reset(self):
+        self.queries = {}
+        self.reconnects = 0
+        self.started = time.time()
+
+    def snapshot(self):
+        """ :return: json serializable dict of all metrics """
+        return dict(started=self.started,
+                    reconnects=self.reconnects,
+                    queries={name: metrics.to_dict()
+                             for name, metrics in self.queries.items()})
+
+    def exposition(self, prefix="fluke"):
+        """ :return: metrics in the Prometheus text format """
+        lines = [f"# TYPE {prefix}_query_duration_seconds histogram"]
+        for name, metrics in self.queries.items():
+            for stage, histogram in metrics.stages.items():
+                labels = f'query="{name}",stage="{stage}"'
+                total = 0
+                for bound, count in zip(histogram.bounds, histogram.counts):
+                    total += count
+                    lines.append(f"{prefix}_query_duration_seconds_bucket"
+                                 f'{{{labels},le="{bound:g}"}} {total}')
+                lines.append(f"{prefix}_query_duration_seconds_bucket"
+                             f'{{{labels},le="+Inf"}} {histogram.count}')
+                lines.append(f"{prefix}_query_duration_seconds_sum"
+                             f"{{{labels}}} {histogram.sum!r}")
+                lines.append(f"{prefix}_query_duration_seconds_count"
+                             f"{{{labels}}} {histogram.count}")
+        counters = [
+            ("requests", lambda m: [("", m.requests)]),
+            ("bytes", lambda m: [(',direction="sent"', m.bytes_sent),
+                                 (',direction="received"',
+                                  m.bytes_received)]),
+            ("errors", lambda m: [(f',code="{code}"', count)
+                                  for code, count in m.errors.items()]),
+            ("parse_errors", lambda m: [("", m.parse_errors)]),
+            ("timeouts", lambda m: [("", m.timeouts)]),
+        ]
+        for counter, values in counters:
+            lines.append(f"# TYPE {prefix}_query_{counter}_total counter")
+            for name, metrics in self.queries.items():
+                for labels, value in values(metrics):
+                    lines.append(f'{prefix}_query_{counter}_total'
+                                 f'{{query="{name}"{labels}}} {value}')
+        lines.append(f"# TYPE {prefix}_reconnects_total counter")
+        lines.append(f"{prefix}_reconnects_total {self.reconnects}")
+        return "\n".join(lines) + "\n"
@@ -1,25 +1,229 @@
+import io
+import os
 import csv
 import sys
-import collections
+import json
+import time
+import queue
+import threading
+
+from .query import ID, QM, QDDA, QSLS
+
+# seconds between flushes of buffered rows
+FLUSH_INTERVAL = 1.0
+# buffered characters forcing a flush
+BUFFER_SIZE = 1 << 16
+TIME_KEY = "time"
+
+
+def _rows(data):
+    """ :return: list of dicts of a query result or model object """
+    if hasattr(data, "to_dicts"):
+        data = data.to_dicts()
+    elif hasattr(data, "items") or hasattr(data, "to_dict"):
+        data = [data]
+    return [d.to_dict() if hasattr(d, "to_dict") else d for d in data]
+
 
 def write_csv(data, head=False, out=None, keys=None):
     """
     writes data as csv
-    :param data: dict or list of dicts
+    :param data: dict, list of dicts or model objects
     :param head: write csv header or not
     :param out: output to write to, default: sys.stdout
-    :param keys: explicit keys to print
-    :return: 
+    :param keys: explicit keys to print, default: keys in order of
+    appearance
+    :return:
     """
-    if hasattr(data, "items"):
-        data = [data]
+    data = _rows(data)
 
     if keys is None:
-        keys = set()
-        for d in data:
-            [keys.add(k) for k in d.keys()]
+        keys = list(dict.fromkeys(k for d in data for k in d.keys()))
 
     writer = csv.DictWriter(out or sys.stdout, keys)
     if head is True:
         writer.writeheader()
     writer.writerows(data)
+
+
+def properties(query):
+    """
+    :param query: query name or class
+    :return: list of (key, converter) of the rows of a query result
+    """
+    name = getattr(query, "__name__", query)
+    if name in ("QDDA", "QDDB"):
+        return QDDA.settings_properties + QDDA.values_properties
+    queries = {q.__name__: q for q in (ID, QM, QSLS)}
+    return queries[name].properties
+
+
+def fields(query):
+    """
+    :param query: query name or class
+    :return: list of keys of the rows of a query result
+    """
+    return [field for field, _ in properties(query)]
+
+
+class StreamWriter(object):
+    """
+    Writes rows with a fixed schema as csv or ndjson (one json object per
+    line). Rows are formatted into a buffer which is handed to a writer
+    thread when it exceeds buffer_size characters or every flush_interval
+    seconds, so the acquisition neither waits for the disk nor for the
+    rotation of files.
+
+    Writing to a path, the file is rotated after rotate_size bytes or
+    rotate_interval seconds, checked per flushed buffer: ``log.csv``
+    becomes ``log-0000.csv``, ``log-0001.csv``, ... and every csv file
+    starts with a header.
+    """
+
+    def __init__(self, out, keys, fmt="csv", buffer_size=BUFFER_SIZE,
+                 flush_interval=FLUSH_INTERVAL, rotate_size=None,
+                 rotate_interval=None, clock=time.monotonic):
+        """
+        :param out: path or text file, e.g. sys.stdout
+        :param keys: columns, other keys of the rows are ignored
+        :param fmt: csv or ndjson
+        :param buffer_size: characters
+        :param flush_interval: seconds
+        :param rotate_size: bytes per file, only for paths
+        :param rotate_interval: seconds per file, only for paths
+        """
+        if fmt not in ("csv", "ndjson"):
+            raise ValueError(f"Unknown format {fmt}")
+        self.keys = list(keys)
+        self.fmt = fmt
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.rotate_size = rotate_size
+        self.rotate_interval = rotate_interval
+        self.clock = clock
+        self.rows = 0
+        self.files = []
+        if isinstance(out, (str, os.PathLike)):
+            self.path = os.fspath(out)
+            self._file = None
+        else:
+            self.path = None
+            self._file = out
+        self._rotate = self.path is not None and \
+            (rotate_size is not None or rotate_interval is not None)
+        self._buffer = io.StringIO()
+        self._writer = csv.DictWriter(self._buffer, self.keys,
+                                      extrasaction="ignore")
+        if fmt == "csv":
+            self._writer.writeheader()
+            self._header = self._buffer.getvalue()
+            self._buffer.seek(0)
+            self._buffer.truncate()
+        else:
+            self._header = ""
+        # bytes written to the current file
+        self._size = 0
+        self._opened = self._flushed = clock()
+        self._head = True
+        self._error = None
+        if self._file is None:
+            self._open()
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True,
+                                        name="StreamWriter")
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _open(self):
+        path = self.path
+        if self._rotate:
+            stem, ext = os.path.splitext(path)
+            path = f"{stem}-{len(self.files):04d}{ext}"
+        self._file = open(path, "wb")
+        self.files.append(path)
+        self._size = 0
+        self._opened = self.clock()
+        self._head = True
+
+    def write(self, data):
+        """
+        :param data: dict, list of dicts or model objects
+        """
+        if self._error is not None:
+            raise self._error
+        buffer = self._buffer
+        for row in _rows(data):
+            if self.fmt == "csv":
+                self._writer.writerow(row)
+            else:
+                buffer.write(json.dumps({k: row.get(k) for k in self.keys}))
+                buffer.write("\n")
+            self.rows += 1
+        if buffer.tell() >= self.buffer_size or \
+                self.clock() - self._flushed >= self.flush_interval:
+            self.flush()
+
+    def _due(self):
+        """ True if the file has to be rotated """
+        return (self.rotate_size is not None and
+                self._size >= self.rotate_size) or \
+            (self.rotate_interval is not None and
+             self.clock() - self._opened >= self.rotate_interval)
+
+    def _run(self):
+        """ writer thread, writes the handed over buffers to the file """
+        while True:
+            data = self._queue.get()
+            try:
+                if data is None:
+                    return
+                if self._error is None:
+                    self._write(data)
+            except Exception as e:
+                self._error = e
+            finally:
+                self._queue.task_done()
+
+    def _write(self, data):
+        if self._rotate and self._due():
+            # the next file is only created if there are rows for it
+            self._file.close()
+            self._open()
+        if self._head:
+            data = self._header + data
+            self._head = False
+        if self.path is not None:
+            # rotate_size is in bytes
+            data = data.encode()
+        self._file.write(data)
+        self._size += len(data)
+        self._file.flush()
+
+    def flush(self):
+        """ hand the buffered rows to the writer thread """
+        data = self._buffer.getvalue()
+        if data:
+            self._queue.put(data)
+            self._buffer.seek(0)
+            self._buffer.truncate()
+        self._flushed = self.clock()
+
+    def wait(self):
+        """ block until the handed over rows are written """
+        self._queue.join()
+        if self._error is not None:
+            raise self._error
+
+    def close(self):
+        self.flush()
+        self._queue.put(None)
+        self._thread.join()
+        if self.path is not None:
+            self._file.close()
+        if self._error is not None:
+            raise self._error
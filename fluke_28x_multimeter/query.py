@@ -5,20 +5,30 @@ import time
 from enum import IntEnum
 import logging
 import abc
+import struct
 from collections import namedtuple
 
+from .model import QMReading, DisplaySnapshot
+
 USB_SERIAL_NUMBER = 'AL03L2UV'
+# FTDI chip of the IR cable
+USB_VENDOR_ID = 0x0403
 TIMEOUT = 1.0
+# serial read timeout, bounds how long a read blocks past a deadline
+READ_TIMEOUT = 0.01
 ENCODING = 'utf-8'
 BAUDRATE = 115200
 TERMINATOR = b"\r"
 
-commands = ['find', 'connect', 'disconnect', 'settings', 'receive', 'send']
-queries = ['ID', "QDDA", "QM", "PMM", "PF1", "HOLD"]
-constants = ["USB_SERIAL_NUMBER", "TIMEOUT", "ENCODING", "BAUDRATE",
-             "TERMINATOR", "RESPONSE_CODE"]
+commands = ['find', 'find_all', 'connect', 'disconnect', 'settings',
+            'receive', 'send']
+queries = ['ID', "QDDA", "QDDB", "QEMAP", "QM", "QSLS", "QRSI", "QMMSI",
+           "QPSI", "QSMR", "PMM", "PF1", "HOLD"]
+constants = ["USB_SERIAL_NUMBER", "USB_VENDOR_ID", "TIMEOUT", "READ_TIMEOUT",
+             "ENCODING", "BAUDRATE", "TERMINATOR", "RESPONSE_CODE"]
+readers = ["FrameReader"]
 
-__all__ = queries + commands + constants
+__all__ = queries + commands + constants + readers
 
 logger = logging.getLogger(__name__)
 Response = namedtuple("Response", ["status", "data", "payload"])
@@ -58,17 +68,33 @@ class FlukeError(Exception):
         self.hint = f"{response_code.name}: Check if device is turned on and cable is connected"
 
 
+class DeadlineExceeded(TimeoutError):
+    """
+    the deadline of a request expired, e.g. waiting for other requests,
+    which does not mean that the connection is lost
+    """
+
+
 def find(serial_number=USB_SERIAL_NUMBER):
     """
-    check connected devices to find multimeter and return device
-    :return: /dev/tty.AL03L2UV or None
+    check connected devices to find multimeter and return device, the ports
+    are cached by discovery.ports
+    :return: /dev/tty.AL03L2UV, its /dev/serial/by-id link on linux, or None
     """
-    from serial.tools.list_ports import comports
+    from .discovery import ports
+    return ports.find(serial_number)
+
 
-    for port in comports():
-        if port.serial_number == serial_number:
-            return port.device
-    return None
+def find_all(serial_numbers=None, vid=USB_VENDOR_ID):
+    """
+    enumerate the ports of all connected IR cables
+    :param serial_numbers: USB serial numbers of the cables, default: every
+    cable with the vendor id vid
+    :param vid: USB vendor id
+    :return: list of devices ordered by serial number
+    """
+    from .discovery import ports
+    return ports.find_all(serial_numbers, vid)
 
 
 def connect(port=None):
@@ -79,7 +105,7 @@ def connect(port=None):
     """
     from serial import Serial
     return Serial(port=port or find(USB_SERIAL_NUMBER), baudrate=BAUDRATE,
-                  timeout=TIMEOUT)
+                  timeout=READ_TIMEOUT)
 
 
 def settings(io):
@@ -91,7 +117,7 @@ def disconnect(io):
 
 
 def send(io, request):
-    logger.debug(f"-->{request}")
+    logger.debug("-->%r", request)
     io.write(request)
 
 
@@ -106,20 +132,138 @@ def receive(io, terminator=TERMINATOR, size=None, timeout=TIMEOUT):
             buffer += c
             if buffer[-lenterm:] == terminator:
                 ret = bytes(buffer[:-lenterm])
-                logger.debug(f"<--{ret}")
+                logger.debug("<--%r", ret)
                 return ret
             if size is not None and len(buffer) >= size:
                 ret = bytes(buffer)
-                logger.debug(f"<--warning:{ret}")
+                logger.debug("<--warning:%r", ret)
                 return ret
-        if time.monotonic() - start > TIMEOUT:
+        if time.monotonic() - start > timeout:
             raise TimeoutError(
                 f"Timeout exceeded ({timeout}), recieved: {buffer}")
 
 
+class FrameReader(object):
+    """
+    Buffered reader which splits the incoming byte stream into frames.
+
+    Instead of reading byte by byte, every read pulls everything the port
+    already holds (``in_waiting``) and falls back to a blocking single byte
+    read if nothing is pending. Bytes following a terminator are kept for
+    the next frame, so an ACK and its payload arriving in one chunk are
+    returned by two consecutive calls.
+    """
+
+    def __init__(self, io, terminator=TERMINATOR):
+        self._io = io
+        self.terminator = terminator
+        self._buffer = bytearray()
+
+    @property
+    def pending(self):
+        """ number of buffered bytes not yet returned """
+        return len(self._buffer)
+
+    def reset(self):
+        """ drop buffered bytes, e.g. after a reconnect """
+        self._buffer.clear()
+
+    def _read_chunk(self):
+        waiting = getattr(self._io, "in_waiting", 0)
+        return self._io.read(waiting or 1)
+
+    def read_frame(self, size=None, timeout=TIMEOUT):
+        """
+        Read until a termination sequence is found, the size is exceeded or
+        until timeout occurs.
+        :param size: maximum frame size without terminator
+        :param timeout: seconds to wait for a complete frame
+        :return: frame without terminator
+        """
+        buffer = self._buffer
+        terminator = self.terminator
+        lenterm = len(terminator)
+        start = time.monotonic()
+        searched = 0
+        while True:
+            index = buffer.find(terminator, searched)
+            if index >= 0 and (size is None or index <= size):
+                ret = bytes(buffer[:index])
+                del buffer[:index + lenterm]
+                logger.debug("<--%r", ret)
+                return ret
+            if size is not None and len(buffer) >= size:
+                ret = bytes(buffer[:size])
+                del buffer[:size]
+                logger.debug("<--warning:%r", ret)
+                return ret
+            # the terminator may be split across two chunks
+            searched = max(0, len(buffer) - lenterm + 1)
+            if time.monotonic() - start > timeout:
+                raise TimeoutError(
+                    f"Timeout exceeded ({timeout}), recieved: {buffer}")
+            chunk = self._read_chunk()
+            if chunk:
+                buffer += chunk
+
+    def read_exact(self, size, timeout=TIMEOUT):
+        """
+        Read exactly size bytes regardless of terminators, e.g. binary
+        payloads.
+        :param size: number of bytes
+        :param timeout: seconds to wait for all bytes
+        :return: bytes
+        """
+        buffer = self._buffer
+        start = time.monotonic()
+        while len(buffer) < size:
+            if time.monotonic() - start > timeout:
+                raise TimeoutError(
+                    f"Timeout exceeded ({timeout}), recieved {len(buffer)} "
+                    f"of {size} bytes")
+            chunk = self._io.read(min(size - len(buffer),
+                                      getattr(self._io, "in_waiting", 0))
+                                  or 1)
+            if chunk:
+                buffer += chunk
+        ret = bytes(buffer[:size])
+        del buffer[:size]
+        logger.debug("<--binary:%d bytes", len(ret))
+        return ret
+
+
+def _compile_converter(properties, row):
+    """
+    Generates a converter for a property table, str converters are skipped.
+    :param properties: list of (name, converter) tuples
+    :param row: True: convert every width fields from start to stop into a
+    list of tuples, False: convert the leading fields into a dict
+    :return: function(fields) or function(fields, start, stop)
+    """
+    namespace = {}
+    items = []
+    for i, (name, convert) in enumerate(properties):
+        field = f"fields[i + {i}]" if row else f"fields[{i}]"
+        if convert is not str:
+            namespace[f"_{i}"] = convert
+            field = f"_{i}({field})"
+        items.append(field if row else f"{name!r}: {field}")
+    if row:
+        source = (f"def convert(fields, start, stop):\n"
+                  f"    return [({', '.join(items)},)\n"
+                  f"            for i in range(start, stop, {len(items)})]")
+    else:
+        source = (f"def convert(fields):\n"
+                  f"    return {{{', '.join(items)}}}")
+    exec(source, namespace)
+    return namespace["convert"]
+
+
 class Query(abc.ABC):
     request_format = None
     properties = []
+    # the payload is not a terminated text frame, see read_payload
+    binary = False
 
     def __init__(self, io):
         self._io = io
@@ -156,20 +300,69 @@ class Query(abc.ABC):
         :return: request object
         """
         request = cls.build_request(cls.request_format, *args, **kwargs)
-        io.send(request.payload)
-        ack_response = io.recv()
+        metrics = getattr(io, "metrics", None)
+        if metrics is None:
+            io.send(request.payload)
+        else:
+            metrics.send(cls, io, request.payload)
+        return cls.read_response(io, request, *args, **kwargs)
+
+    @classmethod
+    def read_response(cls, io, request, *args, **kwargs):
+        """
+        Receives ack and data of an already sent request
+
+        A payload is only expected if the ack is ok and the query has
+        properties.
+
+        :param io: a class with a recv method
+        :param request: request object returned by build_request
+        :param args: arguments passed to the query
+        :param kwargs: kwargs passed to the query
+        :return: request object with response
+        """
+        metrics = getattr(io, "metrics", None)
+        if metrics is not None:
+            return metrics.read_response(cls, io, request, *args, **kwargs)
+        ack = cls.check_ack(request, io.recv(), *args, **kwargs)
+        response_payload = cls.read_payload(io, request, *args, **kwargs) \
+            if len(cls.properties) != 0 else None
+        return cls.build_response(request, ack, response_payload, *args,
+                                  **kwargs)
+
+    @classmethod
+    def read_payload(cls, io, request, *args, **kwargs):
+        """
+        Receives the payload following an ok ack, a text frame by default
+
+        :param io: a class with a recv method
+        :return: payload
+        """
+        return io.recv()
+
+    @classmethod
+    def check_ack(cls, request, ack_response, *args, **kwargs):
+        """
+        :return: parsed ack, raises FlukeError if it is not ok
+        """
         ack = cls.parse_ack(ack_response, *args, **kwargs)
         if ack != RESPONSE_CODE.RESPONSE_OK:
             raise FlukeError(
                 ack,
                 f"Request {request} failed with {ack}, received {ack_response}",
                 request)
+        return ack
 
-        response_payload = io.recv() if len(cls.properties) != 0 else None
+    @classmethod
+    def build_response(cls, request, ack, response_payload, *args,
+                       **kwargs):
+        """
+        :return: request object with the parsed response
+        """
         try:
             response_data = cls.parse_response(response_payload, *args,
                                                **kwargs)
-        except (ValueError, KeyError) as e:
+        except (ValueError, KeyError, IndexError) as e:
             response_data = e
 
         return request._replace(
@@ -206,8 +399,15 @@ class QM(Query):
 
     @classmethod
     def parse_response(cls, response, *args, **kwargs):
+        """
+        :param response: QM payload
+        :param kwargs: encoding, model: return a model.QMReading
+        :return: dict
+        """
         line_splitted = response.decode(
             kwargs.get("encoding", ENCODING)).split(',')
+        if kwargs.get("model", False):
+            return QMReading.from_fields(*line_splitted)
         return {name: clazz(value) for (value, (name, clazz)) in
                 zip(line_splitted, cls.properties)}
 
@@ -243,40 +443,281 @@ class QDDA(Query):
         ('timeStamp', float)
     ]
 
+    # converters for parse_frame generated from the tables above: fixed
+    # settings up to numberOfModes and one tuple per reading,
+    # measurementMode and numberOfReadings are handled separately
+    _settings_head = [p for p in settings_properties
+                      if p[0] not in ('measurementMode', 'numberOfReadings')]
+    _parse_settings = staticmethod(
+        _compile_converter(_settings_head, row=False))
+    _parse_readings = staticmethod(
+        _compile_converter(values_properties, row=True))
+    _values_names = [name for name, _ in values_properties]
+
+    @classmethod
+    def parse_response(cls, response, *args, **kwargs):
+        """
+        :param response: QDDA payload
+        :param kwargs: encoding, compact: return DisplayData, model: return
+        a model.DisplaySnapshot instead of a list of dicts
+        :return: one dict per reading containing the settings too
+        """
+        data = cls.parse_frame(response, kwargs.get("encoding", ENCODING))
+        if kwargs.get("model", False):
+            return DisplaySnapshot.from_data(data)
+        if kwargs.get("compact", False):
+            return data
+        return data.to_dicts()
+
+    @classmethod
+    def parse_frame(cls, response, encoding=ENCODING):
+        """
+        Parses a QDDA payload in a single pass over the split fields.
+
+        :param response: QDDA payload
+        :param encoding: payload encoding
+        :return: DisplayData, the settings dict is shared by all readings
+        """
+        fields = response.decode(encoding).split(',')
+        settings = cls._parse_settings(fields)
+
+        # see remote_spec_28X.doc:
+        # if numberOfModes is 0, then measurementMode is not present
+        # this happens on standard operation
+        offset = len(cls._settings_head)
+        modes = settings['numberOfModes']
+        settings['measurementMode'] = fields[offset:offset + modes]
+        offset += modes
+        count = int(fields[offset])
+        settings['numberOfReadings'] = count
+        offset += 1
+
+        stop = offset + count * len(cls.values_properties)
+        if stop > len(fields):
+            raise ValueError(f"Expected {count} readings, received {fields}")
+        readings = cls._parse_readings(fields, offset, stop)
+        return DisplayData(settings, readings)
+
+
+class DisplayData(namedtuple("DisplayData", ["settings", "readings"])):
+    """
+    Compact QDDA result: one settings dict shared by all readings, readings
+    are tuples ordered like QDDA.values_properties.
+    """
+    __slots__ = ()
+
+    def to_dicts(self):
+        """ :return: list of dicts as returned by QDDA.parse_response """
+        names = QDDA._values_names
+        dicts = []
+        for reading in self.readings:
+            d = self.settings.copy()
+            d.update(zip(names, reading))
+            dicts.append(d)
+        return dicts
+
+
+class QDDB(Query):
+    """
+    Display dump: the current display as binary payload, the same snapshot
+    as QDDA, one per request. It does not download recorded sessions. The
+    payload is not terminated, its length follows from the reading count in
+    the header::
+
+        b"#0" + 34 byte header + 30 bytes per reading + terminator
+
+    Integers are little endian, doubles are sent as two little endian 32 bit
+    words in swapped order. Functions, units, states etc. are enum codes,
+    their labels are queried with QEMAP. The layout is taken from the
+    published reverse engineering of the 287/289 protocol and is not
+    verified against a meter, the trailing terminator is assumed.
+    """
+    request_format = b"QDDB"
+    properties = QDDA.properties
+    binary = True
+    prefix = b"#0"
+    # primaryFunction, secondaryFunction, autoRangeState, baseUnit,
+    # rangeNumber, unitMultiplier, lightningBolt, minMaxStartTime, modes,
+    # unused, numberOfReadings
+    header = struct.Struct("<HHHH8shH8sHHH")
+    # readingID, readingValue, baseUnitReading, unitMultiplierRecording,
+    # decimalPlaces, displayDigits, readingState, readingAttribute,
+    # timeStamp
+    reading = struct.Struct("<H8sHhhhHH8s")
+    _double = struct.Struct("<d")
+
+    @classmethod
+    def read_payload(cls, io, request, *args, **kwargs):
+        head = io.recv_exact(len(cls.prefix) + cls.header.size)
+        if not head.startswith(cls.prefix):
+            raise ValueError(f"Expected binary payload, received {head}")
+        count, = struct.unpack_from("<H", head, len(head) - 2)
+        body = io.recv_exact(count * cls.reading.size + len(TERMINATOR))
+        if not body.endswith(TERMINATOR):
+            raise ValueError(f"Binary payload of {request} not terminated")
+        return head + body[:-len(TERMINATOR)]
+
+    @classmethod
+    def double(cls, data):
+        """ decode a word swapped double """
+        return cls._double.unpack(data[4:] + data[:4])[0]
+
+    @classmethod
+    def parse_response(cls, response, *args, **kwargs):
+        """
+        :param response: QDDB payload
+        :param kwargs: maps: enum maps as returned by QEMAP, unmapped codes
+        are returned as str; compact and model like QDDA
+        :return: one dict per reading containing the settings too
+        """
+        data = cls.parse_frame(response, kwargs.get("maps"))
+        if kwargs.get("model", False):
+            return DisplaySnapshot.from_data(data)
+        if kwargs.get("compact", False):
+            return data
+        return data.to_dicts()
+
+    @classmethod
+    def parse_frame(cls, response, maps=None):
+        """
+        :param response: QDDB payload
+        :param maps: dict of enum name and {code: label}
+        :return: DisplayData like QDDA.parse_frame
+        """
+        maps = maps or {}
+
+        def label(name, code):
+            return maps.get(name, {}).get(code, str(code))
+
+        if not response.startswith(cls.prefix):
+            raise ValueError(f"Expected binary payload, received {response}")
+        (primary, secondary, auto_range, unit, range_number, multiplier,
+         bolt, start_time, modes, _, count) = cls.header.unpack_from(
+            response, len(cls.prefix))
+        modes = [label("mode", 1 << bit) for bit in range(16)
+                 if modes & (1 << bit)]
+        settings = {
+            'primaryFunction': label("primfunction", primary),
+            'secondaryFunction': label("secfunction", secondary),
+            'autoRangeState': label("autorange", auto_range),
+            'baseUnit': label("unit", unit),
+            'rangeNumber': f"{cls.double(range_number):g}",
+            'unitMultiplier': str(multiplier),
+            'lightningBolt': label("bolt", bolt),
+            'minMaxStartTime': cls.double(start_time),
+            'numberOfModes': len(modes),
+            'measurementMode': modes,
+            'numberOfReadings': count
+        }
+        readings = list(cls.iter_readings(response, maps))
+        if len(readings) != count:
+            raise ValueError(f"Expected {count} readings, received "
+                             f"{len(readings)}")
+        return DisplayData(settings, readings)
+
+    @classmethod
+    def iter_readings(cls, response, maps=None):
+        """
+        Decodes the readings of a QDDB payload one by one
+        :return: generator of tuples ordered like QDDA.values_properties
+        """
+        maps = maps or {}
+        reading_ids = maps.get("readingid", {})
+        units = maps.get("unit", {})
+        states = maps.get("state", {})
+        attributes = maps.get("attribute", {})
+        double = cls.double
+        offset = len(cls.prefix) + cls.header.size
+        end = offset + (len(response) - offset) // cls.reading.size * \
+            cls.reading.size
+        for (reading_id, value, unit, multiplier, decimals, digits, state,
+             attribute, timestamp) in cls.reading.iter_unpack(
+                memoryview(response)[offset:end]):
+            yield (reading_ids.get(reading_id, str(reading_id)).lower(),
+                   double(value), units.get(unit, str(unit)), multiplier,
+                   decimals, digits, states.get(state, str(state)),
+                   attributes.get(attribute, str(attribute)),
+                   double(timestamp))
+
+
+class QEMAP(Query):
+    """
+    Enum map of the meter, e.g. QEMAP unit: ``N,code,label,code,label...``
+    """
+    request_format = b"QEMAP %s"
+    properties = [("map", None)]
+    # enums used by QDDB
+    maps = ["primfunction", "secfunction", "autorange", "unit", "bolt",
+            "mode", "readingid", "state", "attribute"]
+
+    @classmethod
+    def build_request(cls, request, *args, **kwargs):
+        args = tuple(a.encode() if isinstance(a, str) else a for a in args)
+        return super(QEMAP, cls).build_request(request, *args, **kwargs)
+
     @classmethod
     def parse_response(cls, response, *args, **kwargs):
-        def parse_settings(ivalues, iconverters):
-            for (name, formatter), item in zip(iconverters, ivalues):
-                yield (name, formatter(item))
-
-                # see remote_spec_28X.doc:
-                # if numberOfModes is 0, then measurementMode is not present
-                # this happens on standard operation
-                if name == 'numberOfModes':
-                    n, c = next(iconverters)
-                    if item == "0":
-                        yield ('measurementMode', [])
-                    elif item == "2":
-                        yield ('measurementMode',
-                               [c(next(ivalues)), c((next(ivalues)))])
-                    else:
-                        yield ('measurementMode', [c(next(ivalues))])
-
-        def parse_values(ivalues, iconverters):
-            for (name, formatter), item in zip(iconverters, ivalues):
-                yield (name, formatter(item))
+        """ :return: dict of code and label """
+        fields = response.decode(kwargs.get("encoding", ENCODING)).split(',')
+        count = int(fields[0])
+        if len(fields) < 1 + 2 * count:
+            raise ValueError(f"Expected {count} entries, received {fields}")
+        return {int(fields[i]): fields[i + 1]
+                for i in range(1, 1 + 2 * count, 2)}
+
+
+class QSLS(Query):
+    """ number of stored recordings, min max and peak sessions and saved
+    measurements """
+    request_format = b"QSLS"
+    properties = [
+        ('records', int),
+        ('minMax', int),
+        ('peak', int),
+        ('measurements', int)
+    ]
 
+    @classmethod
+    def parse_response(cls, response, *args, **kwargs):
         line_splitted = response.decode(
             kwargs.get("encoding", ENCODING)).split(',')
+        if len(line_splitted) != len(cls.properties):
+            raise ValueError(f"Expected {len(cls.properties)} counts, "
+                             f"received {line_splitted}")
+        return {name: clazz(value) for (value, (name, clazz)) in
+                zip(line_splitted, cls.properties)}
+
+
+class MemoryItem(Query):
+    """
+    Stored item by index, starting at 0. The layouts of the items are not
+    documented, the payload is returned as list of fields.
+    """
+    properties = [("fields", None)]
+
+    @classmethod
+    def parse_response(cls, response, *args, **kwargs):
+        return response.decode(kwargs.get("encoding", ENCODING)).split(',')
+
+
+class QRSI(MemoryItem):
+    """ recording session info """
+    request_format = b"QRSI %d"
+
+
+class QMMSI(MemoryItem):
+    """ min max session info """
+    request_format = b"QMMSI %d"
+
+
+class QPSI(MemoryItem):
+    """ peak session info """
+    request_format = b"QPSI %d"
 
-        ivalues = iter(line_splitted)
-        settings = [(name, value) for name, value in
-                    parse_settings(ivalues, iter(cls.settings_properties))]
-        values = [[(name, value) for name, value in
-                   parse_values(ivalues, iter(cls.values_properties))]
-                  for _ in range(settings[-1][1])]
 
-        return [dict(settings + value) for value in values]
+class QSMR(MemoryItem):
+    """ saved measurement """
+    request_format = b"QSMR %d"
 
 
 class PMM(Query):
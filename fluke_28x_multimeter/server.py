@@ -0,0 +1,302 @@
+# -*- coding: utf-8 -*-
+
+"""zerorpc server exposing a Fluke287 on the network."""
+
+import logging
+
+import gevent
+import gevent.event
+import gevent.queue
+import zerorpc
+
+from .acquisition import poll
+from .store import SampleRing
+from .supervisor import Supervisor
+
+# samples kept per query for history requests
+HISTORY = 36000
+# samples queued per subscriber, the oldest are dropped for slow clients
+SUBSCRIBER_QUEUE = 100
+# marks the end of a stream in subscriber queues
+_END = object()
+# seconds between heartbeats of an idle meter if enabled
+HEARTBEAT = 3.0
+
+logger = logging.getLogger(__name__)
+
+
+class _Producer(object):
+    """
+    Acquisition loop of one query and interval, every sample is put into
+    the queues of all subscribers.
+    """
+
+    def __init__(self, server, query, interval, maxsize=SUBSCRIBER_QUEUE):
+        self.server = server
+        self.query = query
+        self.interval = interval
+        self.maxsize = maxsize
+        self.subscribers = set()
+        self.samples = 0
+        self.dropped = 0
+        self.paused = 0
+        self.running = True
+        self.greenlet = None
+        self._stopped = gevent.event.Event()
+
+    def subscribe(self):
+        """ :return: queue receiving the samples """
+        subscriber = gevent.queue.Queue(self.maxsize)
+        self.subscribers.add(subscriber)
+        if self.greenlet is None:
+            self.greenlet = gevent.spawn(self.run)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        self.subscribers.discard(subscriber)
+        if not self.subscribers:
+            self.stop()
+
+    def stop(self):
+        if self.running:
+            self.running = False
+            self._stopped.set()
+            if self.server.producers.get(
+                    (self.query, self.interval)) is self:
+                del self.server.producers[(self.query, self.interval)]
+            self.broadcast(_END)
+
+    def broadcast(self, item):
+        for subscriber in list(self.subscribers):
+            if subscriber.full():
+                subscriber.get_nowait()
+                self.dropped += 1
+            subscriber.put_nowait(item)
+
+    def _execute(self):
+        supervisor = self.server.supervisor
+        if not supervisor.up.is_set():
+            # wait for the reconnect or stop()
+            gevent.wait([supervisor.up, self._stopped], count=1)
+        if not self.running:
+            return None
+        try:
+            return self.server.acquire(self.query)
+        except (TimeoutError, OSError) as e:
+            # the supervisor was notified, the next poll waits for it
+            logger.warning(f"{self.query} loop paused: {e}")
+            self.paused += 1
+            return None
+
+    def run(self):
+        try:
+            for sample in poll(self._execute, self.interval,
+                               running=lambda: self.running,
+                               sleep=self._stopped.wait):
+                if not self.running:
+                    break
+                if sample.data is None:
+                    continue
+                self.samples += 1
+                self.broadcast(sample.data)
+                # let subscribers send even if the serial io does not yield
+                gevent.sleep(0)
+        except Exception as e:
+            logger.exception(f"{self.query} loop failed", exc_info=e)
+            self.broadcast(e)
+        finally:
+            self.stop()
+
+
+class FlukeServer(object):
+    """
+    Serves the methods of a Fluke287 with zerorpc and keeps the connection
+    alive with a supervisor.Supervisor.
+    """
+
+    def __init__(self, fluke, context=None, history=HISTORY, heartbeat=False,
+                 **supervisor):
+        """
+        :param fluke: Fluke287
+        :param context: zerorpc context
+        :param history: samples kept per query
+        :param heartbeat: query the identity of an idle meter every HEARTBEAT
+        seconds to detect a pulled cable
+        :param supervisor: backoff settings of the Supervisor
+        """
+        self.fluke = fluke
+        self.history = {k: SampleRing(history) for k in ("QM", "QDDA")}
+        self.producers = {}
+        self.supervisor = Supervisor(
+            fluke, heartbeat=HEARTBEAT if heartbeat else None,
+            event=gevent.event.Event, **supervisor)
+        if context is None:
+            context = zerorpc.Context()
+            context.register_middleware({
+                # 'resolve_endpoint':           [],
+                # 'load_task_context':          [],
+                'get_task_context': lambda: dict(
+                    device_name=fluke.__class__.__name__),
+                # 'server_before_exec':         [],
+                # 'server_after_exec':          [],
+                # 'server_inspect_exception':   [],
+                # 'client_handle_remote_error': [],
+                # 'client_before_request':      [],
+                # 'client_after_request':       [],
+                # 'client_patterns_list':       [],
+            })
+        self.worker = zerorpc.Server(context=context, methods=self.methods())
+
+    def methods(self):
+        fluke = self.fluke
+        return {
+            "__name__": fluke.__class__.__name__,
+            "holdOff": fluke.hold_off,
+            "minMax": fluke.min_max,
+            "status": lambda: fluke.status,
+            "isConnected": lambda: fluke.is_connected,
+            "execute": self.execute,
+            "executeMaxAge": self.execute_max_age,
+            "startLoop": self.start_loop,
+            "stopLoop": self.stop_loop,
+            "subscriptions": self.subscriptions,
+            "cacheStats": self.cache_stats,
+            "connectionStats": self.supervisor.stats,
+            "metrics": self.metrics,
+            "timeouts": self.timeouts,
+            "history": self.get_history
+        }
+
+    def bind(self, endpoint):
+        self.worker.bind(endpoint)
+
+    def connect(self, endpoint):
+        self.worker.connect(endpoint)
+
+    def run(self):
+        """ serve until the worker is stopped """
+        supervisor = gevent.spawn(self.supervisor.run)
+        try:
+            self.worker.run()
+        finally:
+            self.supervisor.stop()
+            supervisor.join()
+
+    def close(self):
+        self.supervisor.stop()
+        self.worker.stop()
+        self.worker.close()
+
+    @zerorpc.stream
+    def start_loop(self, query, intervalS):
+        """
+        stream the data of a query every intervalS seconds, subscribers of
+        the same query and interval share one acquisition loop
+        """
+        try:
+            interval = float(intervalS)
+        except ValueError as e:
+            interval = int(intervalS)
+        key = (query, interval)
+        producer = self.producers.get(key)
+        if producer is None:
+            producer = self.producers[key] = _Producer(self, query, interval)
+        subscriber = producer.subscribe()
+        try:
+            while True:
+                item = subscriber.get()
+                if item is _END:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            # runs on end of stream and when the client disconnects
+            producer.unsubscribe(subscriber)
+
+    def execute(self, query, *args, max_age=None):
+        """
+        executes a query, served from the cache if enabled
+        :param max_age: seconds a cached result is fresh enough, default:
+        the max age of the cache
+        """
+        if self.fluke.cache is not None:
+            return self.fluke.cache.execute(query, *args, max_age=max_age)
+        return self.fluke.execute(query, *args)
+
+    def execute_max_age(self, query, maxAge, *args):
+        """ execute() for zerorpc clients, which only pass positional args """
+        return self.execute(query, *args, max_age=maxAge)
+
+    def cache_stats(self):
+        """ :return: counters of the cache or None if disabled """
+        cache = self.fluke.cache
+        return None if cache is None else cache.stats()
+
+    def metrics(self):
+        """ :return: instrumentation of the queries or None if disabled """
+        metrics = self.fluke.metrics
+        return None if metrics is None else metrics.snapshot()
+
+    def timeouts(self):
+        """ :return: adaptive timeouts per query stage or None if disabled """
+        timeouts = self.fluke.timeouts
+        return None if timeouts is None else timeouts.stats()
+
+    def serve_metrics(self, address):
+        """
+        serve the metrics in the Prometheus text format over http
+        :param address: (host, port)
+        :return: started gevent.pywsgi.WSGIServer
+        """
+        from gevent.pywsgi import WSGIServer
+        metrics = self.fluke.enable_metrics()
+
+        def application(environ, start_response):
+            if environ["PATH_INFO"] != "/metrics":
+                start_response("404 Not Found", [])
+                return [b""]
+            start_response("200 OK", [
+                ("Content-Type", "text/plain; version=0.0.4")])
+            return [metrics.exposition().encode()]
+
+        server = WSGIServer(address, application, log=None)
+        server.start()
+        logger.info(f"Serving metrics on http://{address[0]}:"
+                    f"{server.server_port}/metrics")
+        return server
+
+    def stop_loop(self, query):
+        """ stop all loops of a query and end their streams """
+        for producer in list(self.producers.values()):
+            if producer.query == query:
+                producer.stop()
+
+    def subscriptions(self):
+        """ :return: list of running loops and their subscribers """
+        return [dict(query=p.query, interval=p.interval,
+                     subscribers=len(p.subscribers), samples=p.samples,
+                     dropped=p.dropped, paused=p.paused)
+                for p in self.producers.values()]
+
+    def acquire(self, query):
+        """ executes a query of a loop and records history """
+        data = self.fluke.execute(query)
+        if query in self.history:
+            self.history[query].append_data(data)
+        return data
+
+    def get_history(self, query, seconds=None):
+        """
+        samples recorded by running loops
+        :param query: QM or QDDA
+        :param seconds: only the last seconds, default: all kept samples
+        :return: dict of timestamp, value, unit and state lists
+        """
+        ring = self.history[query]
+        window = ring.last() if seconds is None else ring.since(seconds)
+        units, states = ring.labels(window)
+        return dict(timestamp=window.timestamp.tolist(),
+                    value=window.value.tolist(),
+                    unit=units,
+                    state=states)
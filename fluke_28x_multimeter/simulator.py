@@ -0,0 +1,445 @@
+# -*- coding: utf-8 -*-
+
+"""Simulated Fluke 287 for hardware free tests and benchmarks."""
+
+import os
+import time
+import struct
+import random
+import select
+import logging
+import threading
+from collections import deque
+
+from .query import TIMEOUT, BAUDRATE, TERMINATOR, QDDA, QDDB
+
+__all__ = ["SimulatedFluke287", "PtyBridge", "ID_RESPONSE", "QM_RESPONSES",
+           "QDDA_RESPONSES", "QDDA_MIN_MAX_RESPONSES", "ENUM_MAPS", "MEMORY",
+           "encode_qddb"]
+
+logger = logging.getLogger(__name__)
+
+# sample frames, see README.rst
+ID_RESPONSE = b"FLUKE 287,V1.00,95830370"
+
+QM_RESPONSES = [
+    b"0.0780E0,VAC,NORMAL,NONE",
+    b"+9.99999999E+37,VAC,OL,NONE",
+    b"0.0007E0,VDC,NORMAL,NONE",
+    b"0.327E-3,VDC,NORMAL,NONE",
+    b"+9.99999999E+37,OHM,OL,NONE",
+    b"+9.99999999E+37,VDC,OL,NONE",
+    b"0.000E-3,ADC,NORMAL,NONE",
+    b"0.01E-6,ADC,NORMAL,NONE",
+]
+
+QDDA_RESPONSES = [
+    (b"V_AC,NONE,AUTO,VAC,5,0,OFF,0.000,0,2,LIVE,0.0769,VAC,0,4,5,NORMAL,"
+     b"NONE,1507815682.743,PRIMARY,0.0769,VAC,0,4,5,NORMAL,NONE,"
+     b"1507815682.743"),
+    (b"MV_AC,NONE,AUTO,VAC,500,-3,ON,0.000,0,2,LIVE,1e+38,VAC,-3,3,5,OL,"
+     b"NONE,1507815684.831,PRIMARY,1e+38,VAC,-3,3,5,OL,NONE,1507815684.831"),
+    (b"V_DC,NONE,AUTO,VDC,5,0,OFF,0.000,0,2,LIVE,0.0007,VDC,0,4,5,NORMAL,"
+     b"NONE,1507815686.917,PRIMARY,0.0007,VDC,0,4,5,NORMAL,NONE,"
+     b"1507815686.917"),
+    (b"MV_DC,NONE,AUTO,VDC,50,-3,OFF,0.000,0,2,LIVE,0.002471,VDC,-3,3,5,"
+     b"NORMAL,NONE,1507815689.005,PRIMARY,0.002471,VDC,-3,3,5,NORMAL,NONE,"
+     b"1507815689.005"),
+    (b"OHMS,NONE,AUTO,OHM,500,6,OFF,0.000,0,2,LIVE,1e+38,OHM,6,1,4,OL,NONE,"
+     b"1507815690.989,PRIMARY,1e+38,OHM,6,1,4,OL,NONE,1507815690.989"),
+    (b"DIODE_TEST,NONE,MANUAL,VDC,5,0,OFF,0.000,0,2,LIVE,1e+38,VDC,0,4,5,OL,"
+     b"NONE,1507815693.016,PRIMARY,1e+38,VDC,0,4,5,OL,NONE,1507815693.016"),
+    (b"MA_DC,NONE,AUTO,ADC,50,-3,OFF,0.000,0,2,LIVE,1e-06,ADC,-3,3,5,NORMAL,"
+     b"NONE,1507815695.114,PRIMARY,1e-06,ADC,-3,3,5,NORMAL,NONE,"
+     b"1507815695.114"),
+    (b"UA_DC,NONE,AUTO,ADC,500,-6,OFF,0.000,0,2,LIVE,2e-08,ADC,-6,2,5,"
+     b"NORMAL,NONE,1507822644.513,PRIMARY,2e-08,ADC,-6,2,5,NORMAL,NONE,"
+     b"1507822644.513"),
+]
+
+QDDA_MIN_MAX_RESPONSES = [
+    (b"V_AC,NONE,AUTO,VAC,5,0,OFF,1507815846.491,1,MIN_MAX_AVG,5,LIVE,"
+     b"0.0789,VAC,0,4,5,NORMAL,NONE,1507815852.225,PRIMARY,0.0789,VAC,0,4,5,"
+     b"NORMAL,NONE,1507815852.225,MINIMUM,0.0784,VAC,0,4,5,NORMAL,NONE,"
+     b"1507815850.213,MAXIMUM,0.0832,VAC,0,4,5,NORMAL,NONE,1507815848.201,"
+     b"AVERAGE,0.0802,VAC,0,4,5,NORMAL,NONE,1507815852.225"),
+    (b"MV_AC,NONE,AUTO,VAC,50,-3,OFF,1507822661.921,1,MIN_MAX_AVG,5,LIVE,"
+     b"0.01304,VAC,-3,3,5,NORMAL,NONE,1507822668.459,PRIMARY,0.01304,VAC,-3,"
+     b"3,5,NORMAL,NONE,1507822668.459,MINIMUM,0.012975,VAC,-3,3,5,NORMAL,"
+     b"NONE,1507822661.921,MAXIMUM,0.013086,VAC,-3,3,5,NORMAL,NONE,"
+     b"1507822667.056,AVERAGE,0.01305,VAC,-3,3,5,NORMAL,NONE,1507822668.459"),
+    (b"V_DC,NONE,AUTO,VDC,5,0,OFF,1507822673.907,1,MIN_MAX_AVG,5,LIVE,"
+     b"0.0002,VDC,0,4,5,NORMAL,NONE,1507822676.623,PRIMARY,0.0002,VDC,0,4,5,"
+     b"NORMAL,NONE,1507822676.623,MINIMUM,-0.0054,VDC,0,4,5,NORMAL,NONE,"
+     b"1507822674.209,MAXIMUM,0.0032,VDC,0,4,5,NORMAL,NONE,1507822674.611,"
+     b"AVERAGE,0.0002,VDC,0,4,5,NORMAL,NONE,1507822676.623"),
+    (b"MV_DC,NONE,AUTO,VDC,50,-3,OFF,0.000,1,MIN_MAX_AVG,5,LIVE,1e+38,VDC,"
+     b"-3,3,5,INVALID,NONE,1507822680.232,PRIMARY,1e+38,VDC,-3,3,5,INVALID,"
+     b"NONE,1507822680.232,MINIMUM,1e+38,NONE,0,0,5,INVALID,NONE,0.000,"
+     b"MAXIMUM,1e+38,NONE,0,0,5,INVALID,NONE,0.000,AVERAGE,1e+38,NONE,0,0,5,"
+     b"INVALID,NONE,0.000"),
+    (b"OHMS,NONE,AUTO,OHM,500,6,OFF,1507822752.018,1,MIN_MAX_AVG,5,LIVE,"
+     b"1e+38,OHM,6,1,4,OL,NONE,1507822760.769,PRIMARY,1e+38,OHM,6,1,4,OL,"
+     b"NONE,1507822760.769,MINIMUM,1e+38,OHM,6,1,4,OL,NONE,1507822752.018,"
+     b"MAXIMUM,1e+38,OHM,6,1,4,OL,NONE,1507822752.018,AVERAGE,1e+38,NONE,0,"
+     b"0,5,INVALID,NONE,1507822760.769"),
+]
+
+# stored items answered to QRSI, QMMSI, QPSI and QSMR by index, the
+# contents are made up for the simulation
+MEMORY = {
+    b"QRSI": [b"RECORD 1,V_DC,1507815682.743,1507815782.743,100",
+              b"RECORD 2,V_AC,1507815882.743,1507815892.743,10"],
+    b"QMMSI": [b"MIN_MAX 1,V_AC,1507815846.491,0.0784,0.0832,0.0802"],
+    b"QPSI": [],
+    b"QSMR": [b"MEASUREMENT 1,V_DC,0.0007,VDC,1507815686.917",
+              b"MEASUREMENT 2,V_AC,0.0769,VAC,1507815682.743",
+              b"MEASUREMENT 3,OHMS,1e+38,OHM,1507815690.989"],
+}
+
+# enum maps answered to QEMAP, the codes are made up for the simulation
+ENUM_MAPS = {
+    name: dict(enumerate(labels)) for name, labels in [
+        ("primfunction", ["V_AC", "MV_AC", "V_DC", "MV_DC", "OHMS",
+                          "DIODE_TEST", "MA_DC", "UA_DC"]),
+        ("secfunction", ["NONE"]),
+        ("autorange", ["AUTO", "MANUAL"]),
+        ("unit", ["NONE", "VAC", "VDC", "OHM", "ADC"]),
+        ("bolt", ["OFF", "ON"]),
+        ("readingid", ["LIVE", "PRIMARY", "MINIMUM", "MAXIMUM", "AVERAGE"]),
+        ("state", ["INVALID", "NORMAL", "OL"]),
+        ("attribute", ["NONE"])]}
+# modes are bit flags
+ENUM_MAPS["mode"] = {1: "HOLD", 2: "MIN_MAX_AVG"}
+
+
+def _swapped(value):
+    data = struct.pack("<d", value)
+    return data[4:] + data[:4]
+
+
+def encode_qddb(frame, maps=ENUM_MAPS):
+    """
+    :param frame: QDDA payload
+    :param maps: enum maps
+    :return: the QDDB payload of the same display
+    """
+    codes = {name: {label: code for code, label in m.items()}
+             for name, m in maps.items()}
+    settings, readings = QDDA.parse_frame(frame)
+    modes = 0
+    for mode in settings["measurementMode"]:
+        modes |= codes["mode"][mode]
+    data = QDDB.prefix + QDDB.header.pack(
+        codes["primfunction"][settings["primaryFunction"]],
+        codes["secfunction"][settings["secondaryFunction"]],
+        codes["autorange"][settings["autoRangeState"]],
+        codes["unit"][settings["baseUnit"]],
+        _swapped(float(settings["rangeNumber"])),
+        int(settings["unitMultiplier"]),
+        codes["bolt"][settings["lightningBolt"]],
+        _swapped(settings["minMaxStartTime"]),
+        modes, 0, len(readings))
+    for (reading_id, value, unit, multiplier, decimals, digits, state,
+         attribute, timestamp) in readings:
+        data += QDDB.reading.pack(
+            codes["readingid"][reading_id.upper()], _swapped(value),
+            codes["unit"][unit], multiplier, decimals, digits,
+            codes["state"][state], codes["attribute"][attribute],
+            _swapped(timestamp))
+    return data
+
+
+ACK_OK = b"0"
+ACK_ERROR_SYNTAX = b"1"
+
+
+class SimulatedFluke287(object):
+    """
+    Emulates a Fluke 287 connected through the IR cable.
+
+    The object implements the part of the pyserial interface used by this
+    package (``write``, ``read``, ``in_waiting``, ``is_open``, ...) and can
+    be passed as ``Fluke287(io=...)``. Requests are answered with the sample
+    frames from the README. Each response becomes readable after
+    ``command_latency`` (plus a random ``jitter``) and then byte by byte
+    every ``byte_latency`` seconds. ``drop_terminator`` and ``timeout_rate``
+    are probabilities to lose the last terminator of a response or to not
+    answer at all.
+    """
+
+    def __init__(self, byte_latency=0.0, command_latency=0.0, jitter=0.0,
+                 drop_terminator=0.0, timeout_rate=0.0, seed=None,
+                 timeout=TIMEOUT, qm_responses=None, qdda_responses=None,
+                 min_max_responses=None, identity=ID_RESPONSE):
+        self.byte_latency = byte_latency
+        self.command_latency = command_latency
+        self.jitter = jitter
+        self.drop_terminator = drop_terminator
+        self.timeout_rate = timeout_rate
+        self.timeout = timeout
+        self.identity = identity
+        self.enum_maps = ENUM_MAPS
+        self.memory = MEMORY
+        self.port = "simulated"
+        self.is_open = True
+        self.min_max = False
+        self.hold = False
+        self.requests = 0
+
+        self._random = random.Random(seed)
+        self._qm = self._cycle(qm_responses or QM_RESPONSES)
+        self._qdda = self._cycle(qdda_responses or QDDA_RESPONSES)
+        self._min_max = self._cycle(min_max_responses or
+                                    QDDA_MIN_MAX_RESPONSES)
+        self._request = bytearray()
+        # scheduled responses: [available_at, data, already read]
+        self._segments = deque()
+        self._condition = threading.Condition()
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(port={self.port!r})"
+
+    @staticmethod
+    def _cycle(responses):
+        while True:
+            for response in responses:
+                yield response
+
+    # pyserial interface
+
+    def open(self):
+        self.is_open = True
+
+    def close(self):
+        self.is_open = False
+
+    def get_settings(self):
+        return dict(baudrate=BAUDRATE, bytesize=8, parity='N', stopbits=1,
+                    xonxoff=False, dsrdtr=False, rtscts=False,
+                    timeout=self.timeout, write_timeout=None,
+                    inter_byte_timeout=None)
+
+    def reset_input_buffer(self):
+        with self._condition:
+            self._segments.clear()
+
+    def write(self, data):
+        if not self.is_open:
+            raise OSError("Port is closed")
+        with self._condition:
+            self._request += data
+            while True:
+                index = self._request.find(TERMINATOR)
+                if index < 0:
+                    break
+                command = bytes(self._request[:index])
+                del self._request[:index + len(TERMINATOR)]
+                self._schedule(self.respond(command))
+            self._condition.notify_all()
+        return len(data)
+
+    @property
+    def in_waiting(self):
+        with self._condition:
+            return self._available(time.monotonic())
+
+    def read(self, size=1):
+        if not self.is_open:
+            raise OSError("Port is closed")
+        deadline = None if self.timeout is None else \
+            time.monotonic() + self.timeout
+        buffer = bytearray()
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                buffer += self._take(now, size - len(buffer))
+                if len(buffer) >= size:
+                    break
+                if deadline is not None and now >= deadline:
+                    break
+                ready = self._next_byte_at()
+                wait = None if ready is None else max(0.0, ready - now)
+                if deadline is not None:
+                    wait = deadline - now if wait is None else \
+                        min(wait, deadline - now)
+                self._condition.wait(wait)
+        return bytes(buffer)
+
+    # simulation
+
+    def next_byte_in(self):
+        """ seconds until the next byte becomes readable or None """
+        with self._condition:
+            ready = self._next_byte_at()
+        return None if ready is None else max(0.0, ready - time.monotonic())
+
+    def respond(self, command):
+        """
+        build the response to a single command
+        :param command: request without terminator
+        :return: response bytes including terminators
+        """
+        self.requests += 1
+        name, _, argument = command.strip().partition(b" ")
+        name = name.upper()
+        if name == b"ID":
+            payload = self.identity
+        elif name == b"QM":
+            payload = next(self._qm)
+        elif name == b"QDDA":
+            payload = self.display()
+        elif name == b"QDDB":
+            payload = encode_qddb(self.display(), self.enum_maps)
+        elif name == b"QSLS":
+            payload = b",".join(str(len(self.memory[q])).encode() for q in
+                                (b"QRSI", b"QMMSI", b"QPSI", b"QSMR"))
+        elif name in self.memory:
+            items = self.memory[name]
+            try:
+                payload = items[int(argument)]
+            except (ValueError, IndexError):
+                return ACK_ERROR_SYNTAX + TERMINATOR
+        elif name == b"QEMAP":
+            enum = self.enum_maps.get(argument.strip().lower().decode())
+            if enum is None:
+                return ACK_ERROR_SYNTAX + TERMINATOR
+            payload = b",".join([str(len(enum)).encode()] + [
+                f"{code},{label}".encode() for code, label in enum.items()])
+        elif name == b"PRESS":
+            return self.press(argument.strip().upper()) + TERMINATOR
+        else:
+            return ACK_ERROR_SYNTAX + TERMINATOR
+        return ACK_OK + TERMINATOR + payload + TERMINATOR
+
+    def press(self, button):
+        if button == b"HOLD":
+            self.hold = not self.hold
+        elif button == b"MINMAX":
+            self.min_max = not self.min_max
+        elif button not in (b"F1", b"F2", b"F3", b"F4"):
+            return ACK_ERROR_SYNTAX
+        return ACK_OK
+
+    def display(self):
+        """ next QDDA frame reflecting the hold and min max state """
+        frame = next(self._min_max) if self.min_max else next(self._qdda)
+        if not self.hold:
+            return frame
+        fields = frame.split(b",")
+        modes = int(fields[8])
+        return b",".join(fields[:8] +
+                         [str(modes + 1).encode(), b"HOLD"] +
+                         fields[9:])
+
+    def _schedule(self, response):
+        rnd = self._random
+        if self.timeout_rate and rnd.random() < self.timeout_rate:
+            logger.debug(f"simulating timeout, dropping {response}")
+            return
+        if self.drop_terminator and rnd.random() < self.drop_terminator:
+            response = response[:-len(TERMINATOR)]
+        start = time.monotonic()
+        if self._segments:
+            last = self._segments[-1]
+            start = max(start, last[0] + len(last[1]) * self.byte_latency)
+        delay = self.command_latency
+        if self.jitter:
+            delay = max(0.0, delay + rnd.uniform(-self.jitter, self.jitter))
+        self._segments.append([start + delay, response, 0])
+
+    def _ready(self, segment, now):
+        """ number of bytes of a segment readable at now """
+        start, data, _ = segment
+        if now < start:
+            return 0
+        if not self.byte_latency:
+            return len(data)
+        return min(len(data), int((now - start) / self.byte_latency) + 1)
+
+    def _available(self, now):
+        available = 0
+        for segment in self._segments:
+            ready = self._ready(segment, now)
+            available += ready - segment[2]
+            if ready < len(segment[1]):
+                break
+        return available
+
+    def _take(self, now, size):
+        buffer = bytearray()
+        while self._segments and len(buffer) < size:
+            segment = self._segments[0]
+            ready = self._ready(segment, now)
+            end = min(ready, segment[2] + size - len(buffer))
+            buffer += segment[1][segment[2]:end]
+            segment[2] = end
+            if end < len(segment[1]):
+                break
+            self._segments.popleft()
+        return buffer
+
+    def _next_byte_at(self):
+        if not self._segments:
+            return None
+        start, _, read = self._segments[0]
+        return start + read * self.byte_latency
+
+
+class PtyBridge(object):
+    """
+    Serves a simulated device on a pseudo terminal, so that the whole stack
+    including pyserial can be used with ``connect(bridge.port)``.
+    """
+
+    def __init__(self, device=None):
+        self.device = device or SimulatedFluke287()
+        self.port = None
+        self._master = None
+        self._slave = None
+        self._thread = None
+        self._running = False
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def start(self):
+        import tty
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._master)
+        tty.setraw(self._slave)
+        self.port = os.ttyname(self._slave)
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        logger.info(f"Serving {self.device} on {self.port}")
+        return self.port
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        for fd in (self._master, self._slave):
+            if fd is not None:
+                os.close(fd)
+        self._master = self._slave = None
+
+    def _run(self):
+        device = self.device
+        while self._running:
+            wait = device.next_byte_in()
+            wait = 0.05 if wait is None else min(wait, 0.05)
+            readable, _, _ = select.select([self._master], [], [], wait)
+            if readable:
+                try:
+                    device.write(os.read(self._master, 4096))
+                except OSError:
+                    break
+            waiting = device.in_waiting
+            if waiting:
+                os.write(self._master, device.read(waiting))
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+
+"""Bounded in-memory sample store."""
+
+import time
+from array import array
+from bisect import bisect_left
+from collections import namedtuple
+
+__all__ = ["SampleRing", "Window"]
+
+Window = namedtuple("Window", ["timestamp", "value", "unit", "state"])
+Window.__doc__ = """
+Zero copy view on a range of samples, every field is a memoryview of the
+underlying typed array ordered from oldest to newest.
+"""
+
+
+class SampleRing(object):
+    """
+    Fixed capacity ring buffer of samples stored in preallocated typed
+    arrays: timestamp and value as doubles, unit and state as codes.
+
+    Every sample is written twice, at its slot and ``capacity`` slots
+    behind it, so that the last ``n <= capacity`` samples are always
+    contiguous and can be returned as memoryviews without copying. Appending
+    is O(1) and the memory footprint is fixed by the capacity.
+    """
+
+    def __init__(self, capacity):
+        if capacity < 1:
+            raise ValueError("capacity must be positive")
+        self.capacity = capacity
+        self._timestamp = array("d", bytes(16 * capacity))
+        self._value = array("d", bytes(16 * capacity))
+        self._unit = array("H", bytes(4 * capacity))
+        self._state = array("H", bytes(4 * capacity))
+        self._views = Window(*[memoryview(a) for a in
+                               (self._timestamp, self._value, self._unit,
+                                self._state)])
+        self.units = []
+        self.states = []
+        self._unit_codes = {}
+        self._state_codes = {}
+        self._next = 0
+        self.count = 0
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    @property
+    def nbytes(self):
+        """ memory used by the sample arrays """
+        return sum(view.nbytes for view in self._views)
+
+    @staticmethod
+    def _code(label, codes, labels):
+        """ code of a label, new labels are added """
+        code = codes.get(label)
+        if code is None:
+            code = codes[label] = len(labels)
+            labels.append(label)
+        return code
+
+    def append(self, timestamp, value, unit, state):
+        """
+        :param timestamp: seconds, must not decrease
+        :param value: reading value
+        :param unit: unit label e.g. VDC
+        :param state: state label e.g. NORMAL
+        """
+        i = self._next
+        j = i + self.capacity
+        unit = self._code(unit, self._unit_codes, self.units)
+        state = self._code(state, self._state_codes, self.states)
+        self._timestamp[i] = self._timestamp[j] = timestamp
+        self._value[i] = self._value[j] = value
+        self._unit[i] = self._unit[j] = unit
+        self._state[i] = self._state[j] = state
+        self._next = (i + 1) % self.capacity
+        self.count += 1
+
+    def append_data(self, data, timestamp=None, reading_id="primary"):
+        """
+        Appends the result of a QM or QDDA query.
+        :param data: QM dict, QDDA list of dicts or model objects
+        :param timestamp: default: current time of the host, the clock of
+        the meter may differ
+        :param reading_id: QDDA reading to store
+        """
+        if hasattr(data, "to_dicts"):
+            data = data.to_dicts()
+        elif hasattr(data, "to_dict"):
+            data = data.to_dict()
+        timestamp = time.time() if timestamp is None else timestamp
+        if isinstance(data, list):
+            reading = next((d for d in data if d["readingID"] == reading_id),
+                           data[0])
+            self.append(timestamp, reading["readingValue"],
+                        reading["baseUnitReading"], reading["readingState"])
+        else:
+            self.append(timestamp, data["value"], data["unit"], data["state"])
+
+    def last(self, n=None):
+        """
+        :param n: number of samples, default: all
+        :return: Window of the newest n samples
+        """
+        size = len(self)
+        n = size if n is None else min(n, size)
+        end = self._next + self.capacity if self.count >= self.capacity \
+            else self._next
+        return Window(*[view[end - n:end] for view in self._views])
+
+    def window(self, start, stop=None):
+        """
+        :param start: first timestamp included
+        :param stop: timestamps before stop are included, default: all
+        :return: Window of the samples between start and stop
+        """
+        samples = self.last()
+        first = bisect_left(samples.timestamp, start)
+        end = len(samples.timestamp) if stop is None else \
+            bisect_left(samples.timestamp, stop)
+        return Window(*[view[first:max(first, end)] for view in samples])
+
+    def since(self, seconds, now=None):
+        """ :return: Window of the samples of the last seconds """
+        return self.window((time.time() if now is None else now) - seconds)
+
+    def labels(self, window):
+        """ :return: lists of unit and state labels of a window """
+        return ([self.units[c] for c in window.unit],
+                [self.states[c] for c in window.state])
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+
+"""Reconnects a Fluke287 once its requests fail."""
+
+import time
+import random
+import logging
+import threading
+from collections import deque
+
+__all__ = ["Supervisor"]
+
+logger = logging.getLogger(__name__)
+
+# seconds before the first reconnect attempt, doubled per failed attempt
+BACKOFF = 0.1
+MAX_BACKOFF = 30.0
+# fraction of the delay drawn at random, spreads reconnects of several
+# servers sharing a hub
+JITTER = 0.5
+# recovery times kept for the stats
+RECOVERIES = 100
+# consecutive timeouts marking the connection as down
+THRESHOLD = 3
+
+
+class Supervisor(object):
+    """
+    Keeps the connection of a Fluke287 up. Failing requests notify the
+    supervisor through ``Fluke287.on_failure``. A serial error marks the
+    connection as down, a timeout only after threshold consecutive ones or
+    if the heartbeat probe sent after it fails too. The supervisor then
+    reconnects with jittered exponential backoff. Acquisition loops call
+    wait() before a request, so they pause while the meter is away and
+    resume once it answers again.
+    """
+
+    def __init__(self, fluke, backoff=BACKOFF, max_backoff=MAX_BACKOFF,
+                 jitter=JITTER, heartbeat=None, threshold=THRESHOLD,
+                 event=threading.Event, sleep=None, clock=time.monotonic,
+                 random=random.random):
+        """
+        :param fluke: Fluke287
+        :param backoff: seconds before the first reconnect attempt
+        :param max_backoff: maximum seconds between attempts
+        :param jitter: fraction of the delay drawn at random
+        :param heartbeat: seconds between heartbeats of an idle meter,
+        default: only requests detect failures
+        :param threshold: consecutive timeouts marking the connection as
+        down
+        :param event: event class, e.g. gevent.event.Event
+        :param sleep: sleep function, default: interruptible by stop()
+        :param clock: monotonic clock
+        :param random: callable returning a float in [0, 1)
+        """
+        self.fluke = fluke
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.heartbeat = heartbeat
+        self.threshold = threshold
+        self.clock = clock
+        self.random = random
+        self.up = event()
+        self.running = False
+        self.failures = 0
+        # consecutive timeouts of the connection which is still up
+        self.timeouts = 0
+        self.reconnects = 0
+        self.attempts = 0
+        self.last_error = None
+        self.failed_at = None
+        self.recoveries = deque(maxlen=RECOVERIES)
+        self._wake = event()
+        self._probe = False
+        self._sleep = sleep or self._wake.wait
+        if fluke.is_connected:
+            self.up.set()
+        else:
+            self.failed_at = clock()
+        fluke.on_failure.append(self.failed)
+
+    def failed(self, error):
+        """
+        mark the connection as down, called by the Fluke287, timeouts below
+        the threshold only request a heartbeat probe
+        """
+        self.last_error = repr(error)
+        if not self.up.is_set():
+            return
+        if isinstance(error, TimeoutError):
+            self.timeouts += 1
+            if self.timeouts < self.threshold:
+                logger.warning(f"Request timed out, probing: {error}")
+                self._probe = True
+                self._wake.set()
+                return
+        self._down(error)
+
+    def _down(self, error):
+        logger.error(f"Connection lost: {error}")
+        self.timeouts = 0
+        self._probe = False
+        self.failures += 1
+        self.failed_at = self.clock()
+        self.up.clear()
+        self._wake.set()
+
+    def wait(self, timeout=None):
+        """
+        :param timeout: seconds
+        :return: True if the connection is up
+        """
+        return self.up.wait(timeout)
+
+    def delay(self, attempt):
+        """ :return: seconds to wait before a reconnect attempt """
+        delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+        return delay * (1 - self.jitter * self.random())
+
+    def reconnect(self):
+        """
+        reopen the port and check that the meter answers, requests of other
+        threads wait until the port is reopened
+        :return: True if reconnected
+        """
+        fluke = self.fluke
+        with fluke._lock:
+            try:
+                fluke.disconnect()
+            except OSError:
+                pass
+            try:
+                fluke.connect()
+            except OSError as e:
+                logger.warning(f"Reconnect failed, is the cable plugged into "
+                               f"the computer? {e}")
+                return False
+            if not fluke.is_connected or not fluke.heartbeat():
+                logger.warning("Reconnect failed, is the cable plugged into "
+                               "the meter?")
+                return False
+        recovery = self.clock() - self.failed_at
+        self.recoveries.append(recovery)
+        self.reconnects += 1
+        logger.info(f"Reconnected after {recovery:.3f}s and "
+                    f"{self.attempts + 1} attempts")
+        self.attempts = 0
+        self.failed_at = None
+        self.up.set()
+        return True
+
+    def run(self):
+        """ supervise until stop() is called """
+        self.running = True
+        while self.running:
+            if self.up.is_set():
+                self._wake.wait(self.heartbeat)
+                self._wake.clear()
+                if not self.running or not self.up.is_set():
+                    continue
+                if self._probe:
+                    self.probe()
+                elif self.heartbeat is not None:
+                    # a failing heartbeat reports itself through failed()
+                    self.fluke.heartbeat(self.heartbeat)
+            elif not self.reconnect():
+                delay = self.delay(self.attempts)
+                self.attempts += 1
+                self._wake.clear()
+                if self.running:
+                    self._sleep(delay)
+
+    def probe(self):
+        """
+        query the meter after a timeout, marks the connection as down if
+        it does not answer
+        :return: True if the meter answered
+        """
+        self._probe = False
+        if self.fluke.heartbeat(0):
+            self.timeouts = 0
+            return True
+        if self.up.is_set():
+            self._down(self.last_error)
+        return False
+
+    def stop(self):
+        self.running = False
+        self._wake.set()
+
+    def stats(self):
+        """ :return: dict of connection state, counters and recovery times """
+        recoveries = list(self.recoveries)
+        failed_at = self.failed_at
+        return dict(
+            up=self.up.is_set(),
+            failures=self.failures,
+            timeouts=self.timeouts,
+            reconnects=self.reconnects,
+            attempts=self.attempts,
+            lastError=self.last_error,
+            downtime=0.0 if failed_at is None else self.clock() - failed_at,
+            lastRecovery=recoveries[-1] if recoveries else None,
+            meanRecovery=sum(recoveries) / len(recoveries)
+            if recoveries else None,
+            maxRecovery=max(recoveries) if recoveries else None)
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+
+"""
+Per query timeouts learned from the observed latency.
+
+A fixed timeout has to cover the slowest query, so a dead link is only
+noticed after a second. AdaptiveTimeouts keeps the latest latencies of the
+ACK and the payload of every query and allows a multiple of their
+percentile instead. Until enough latencies are known the maximum is used,
+an exceeded timeout is doubled until the next update.
+"""
+
+from collections import deque
+
+from .query import TIMEOUT
+
+__all__ = ["AdaptiveTimeouts"]
+
+# timeout = percentile of the latencies * MULTIPLIER
+MULTIPLIER = 4.0
+PERCENTILE = 99
+MIN_TIMEOUT = 0.02
+# latencies kept per query and stage
+WINDOW = 200
+# latencies needed before the timeout is lowered
+WARMUP = 20
+# latencies between two updates of the timeout
+UPDATE = 10
+
+
+class AdaptiveTimeouts(object):
+    """
+    Timeouts per (query name, stage), the stages are "ack" and "payload".
+    """
+
+    def __init__(self, multiplier=MULTIPLIER, percentile=PERCENTILE,
+                 minimum=MIN_TIMEOUT, maximum=TIMEOUT, window=WINDOW,
+                 warmup=WARMUP):
+        """
+        :param multiplier: factor applied to the latency percentile
+        :param percentile: percentile of the latencies
+        :param minimum: lowest timeout in seconds
+        :param maximum: timeout in seconds until enough latencies are known
+        :param window: latencies kept per query and stage
+        :param warmup: latencies needed before the timeout is lowered
+        """
+        self.multiplier = multiplier
+        self.percentile = percentile
+        self.minimum = minimum
+        self.maximum = maximum
+        self.window = window
+        self.warmup = max(1, warmup)
+        self.timeouts = {}
+        self._latencies = {}
+        self._pending = {}
+
+    def timeout(self, query, stage):
+        """ :return: seconds to wait for the stage of a query """
+        return self.timeouts.get((query, stage), self.maximum)
+
+    def observe(self, query, stage, seconds):
+        """ record the latency of a stage which did not time out """
+        key = (query, stage)
+        latencies = self._latencies.get(key)
+        if latencies is None:
+            latencies = self._latencies[key] = deque(maxlen=self.window)
+        latencies.append(seconds)
+        pending = self._pending.get(key, 0) + 1
+        if len(latencies) >= self.warmup and \
+                (pending >= UPDATE or key not in self.timeouts):
+            self._update(key, latencies)
+            pending = 0
+        self._pending[key] = pending
+
+    def _update(self, key, latencies):
+        ordered = sorted(latencies)
+        index = min(len(ordered) - 1,
+                    int(self.percentile / 100 * len(ordered)))
+        self.timeouts[key] = min(self.maximum, max(
+            self.minimum, ordered[index] * self.multiplier))
+
+    def timed_out(self, query, stage):
+        """ double the timeout of a stage after it was exceeded """
+        key = (query, stage)
+        if key in self.timeouts:
+            self.timeouts[key] = min(self.maximum, self.timeouts[key] * 2)
+            self._pending[key] = 0
+
+    def stats(self):
+        """ :return: dict of "query.stage" and timeout, latencies """
+        return {f"{query}.{stage}": dict(
+                    timeout=self.timeout(query, stage),
+                    latencies=len(latencies))
+                for (query, stage), latencies in self._latencies.items()}
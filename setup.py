@@ -43,6 +43,11 @@ setup(
     },
     include_package_data=True,
     install_requires=requirements,
+    extras_require={
+        'numpy': ['numpy'],
+        'arrow': ['pyarrow'],
+        'udev': ['pyudev'],
+    },
     license="GNU General Public License v3",
     zip_safe=False,
     keywords='fluke_28x_multimeter',
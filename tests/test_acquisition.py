@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `fluke_28x_multimeter.acquisition`."""
+
+from unittest import TestCase
+
+from fluke_28x_multimeter import Fluke287
+from fluke_28x_multimeter.acquisition import poll, acquire, SKIP, CATCH_UP
+from fluke_28x_multimeter.simulator import SimulatedFluke287
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TestPoll(TestCase):
+
+    def run_poll(self, durations, policy):
+        clock = FakeClock()
+
+        def func():
+            clock.now += durations.pop(0)
+            return clock.now
+
+        return list(poll(func, 1.0, count=4, policy=policy, clock=clock,
+                         sleep=clock.sleep))
+
+    def test_no_drift(self):
+        samples = self.run_poll([0.3, 0.3, 0.3, 0.3], SKIP)
+        assert [s.target - 100.0 for s in samples] == [0.0, 1.0, 2.0, 3.0]
+        assert all(s.jitter == 0.0 for s in samples)
+
+    def test_skip(self):
+        samples = self.run_poll([0.1, 2.5, 0.1, 0.1], SKIP)
+        assert [s.target - 100.0 for s in samples] == [0.0, 1.0, 4.0, 5.0]
+        assert samples[2].skipped == 2
+
+    def test_catch_up(self):
+        samples = self.run_poll([0.1, 2.5, 0.1, 0.1], CATCH_UP)
+        assert [s.target - 100.0 for s in samples] == [0.0, 1.0, 2.0, 3.0]
+        self.assertAlmostEqual(samples[2].jitter, 1.5)
+        self.assertAlmostEqual(samples[3].jitter, 0.6)
+
+    def test_running(self):
+        samples = list(poll(lambda: None, 0, running=lambda: False))
+        assert samples == []
+
+
+class TestAcquire(TestCase):
+
+    def test_acquire(self):
+        fluke = Fluke287(io=SimulatedFluke287())
+        samples = list(acquire(fluke, "QM", 0.005, count=3))
+        assert [s.index for s in samples] == [0, 1, 2]
+        assert all(s.data["unit"] for s in samples)
+        assert samples[2].time - samples[0].time >= 0.01
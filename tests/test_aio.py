@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `fluke_28x_multimeter.aio`."""
+
+import asyncio
+from unittest import TestCase
+
+from fluke_28x_multimeter.aio import AsyncFluke287, FrameProtocol
+from fluke_28x_multimeter.query import FlukeError, Query
+from fluke_28x_multimeter.simulator import SimulatedFluke287, PtyBridge
+
+
+class Unknown(Query):
+    request_format = b"UNKNOWN"
+    properties = []
+
+
+class UnknownFluke(AsyncFluke287):
+    queries = dict(AsyncFluke287.queries, UNKNOWN=Unknown)
+
+
+class TestFrameProtocol(TestCase):
+
+    def test_split(self):
+        async def run():
+            protocol = FrameProtocol()
+            for chunk in (b"0\rQM,1.2", b"3E+0,VDC", b",NORMAL\r0\r"):
+                protocol.data_received(chunk)
+            return [protocol.frames.get_nowait() for _ in range(3)]
+
+        assert asyncio.run(run()) == [b"0", b"QM,1.23E+0,VDC,NORMAL", b"0"]
+
+
+class TestAsyncFluke287(TestCase):
+
+    def run_device(self, coroutine, device=None, cls=AsyncFluke287):
+        with PtyBridge(device or SimulatedFluke287(byte_latency=1e-5)) \
+                as bridge:
+            async def run():
+                async with cls(bridge.port, timeout=0.5) as fluke:
+                    return await coroutine(fluke)
+            return asyncio.run(run())
+
+    def test_execute(self):
+        async def run(fluke):
+            return await fluke.id(), await fluke.value(), await fluke.values()
+
+        identity, value, values = self.run_device(run)
+        assert identity["deviceName"] == "FLUKE 287"
+        assert value["unit"] == "VAC"
+        assert len(values) == 2
+
+    def test_concurrent(self):
+        async def run(fluke):
+            return await asyncio.gather(*[fluke.value() for _ in range(5)])
+
+        assert len(self.run_device(run)) == 5
+
+    def test_error(self):
+        async def run(fluke):
+            with self.assertRaises(FlukeError):
+                await fluke.execute(Unknown)
+            return await fluke.id()
+
+        identity = self.run_device(run, cls=UnknownFluke)
+        assert identity["serialNumber"] == "95830370"
+
+    def test_poll(self):
+        async def run(fluke):
+            return [data async for data in fluke.poll("QM", 0.01, count=3)]
+
+        assert len(self.run_device(run)) == 3
+
+    def test_timeout(self):
+        async def run(fluke):
+            with self.assertRaises(TimeoutError):
+                await fluke.execute("ID", timeout=0.05)
+
+        self.run_device(run, SimulatedFluke287(command_latency=0.3))
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `fluke_28x_multimeter.archive`."""
+
+import io
+import os
+import shutil
+import tempfile
+from unittest import TestCase, mock
+
+from fluke_28x_multimeter import Fluke287
+from fluke_28x_multimeter.acquisition import acquire
+from fluke_28x_multimeter.archive import (ArchiveWriter, ArchiveReader,
+                                          from_csv)
+from fluke_28x_multimeter.out import write_csv
+from fluke_28x_multimeter.simulator import (SimulatedFluke287, QDDA_RESPONSES,
+                                            QDDA_MIN_MAX_RESPONSES)
+from fluke_28x_multimeter.query import QDDA
+
+
+class TestArchive(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "qdda.fla")
+        self.rows = [d for f in QDDA_RESPONSES + QDDA_MIN_MAX_RESPONSES
+                     for d in QDDA.parse_response(f)]
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_roundtrip(self):
+        with ArchiveWriter(self.path, QDDA) as writer:
+            for i, row in enumerate(self.rows):
+                writer.append(row, timestamp=float(i))
+        with ArchiveReader(self.path) as reader:
+            assert len(reader) == len(self.rows)
+            assert list(reader) == self.rows
+            assert reader.record(3, include_time=True)["time"] == 3.0
+
+    def test_time_range(self):
+        with ArchiveWriter(self.path, "QM", index_interval=8) as writer:
+            for i in range(100):
+                writer.append(dict(value=i * 0.1, unit="VDC", state="NORMAL",
+                                   attribute="NONE"), timestamp=i * 2.0)
+        with ArchiveReader(self.path) as reader:
+            assert reader.find(10.0, 20.0) == range(5, 10)
+            assert reader.find(9.0, 11.0) == range(5, 6)
+            assert reader.find(500.0) == range(100, 100)
+            assert [r["value"] for r in reader.rows(stop=4.0)] == [0.0, 0.1]
+
+    def test_append_to_existing(self):
+        fluke = Fluke287(io=SimulatedFluke287())
+        with ArchiveWriter(self.path, "QDDA") as writer:
+            list(acquire(fluke, "QDDA", 0, count=3, store=writer))
+        with ArchiveWriter(self.path) as writer:
+            list(acquire(fluke, "QDDA", 0, count=2, store=writer))
+        with ArchiveReader(self.path) as reader:
+            assert len(reader) == 10
+
+    def test_csv_lossless(self):
+        csv_path = os.path.join(self.directory, "qdda.csv")
+        keys = [name for name, _ in
+                QDDA.settings_properties + QDDA.values_properties]
+        with open(csv_path, "w", newline="") as f:
+            write_csv(self.rows, head=True, out=f, keys=keys)
+        assert from_csv(csv_path, self.path, QDDA) == len(self.rows)
+        out = io.StringIO(newline="")
+        with ArchiveReader(self.path) as reader:
+            reader.to_csv(out)
+        with open(csv_path, newline="") as f:
+            assert out.getvalue() == f.read()
+
+    def qm(self, unit):
+        return dict(value=1.0, unit=unit, state="NORMAL", attribute="NONE")
+
+    def test_large_dictionary(self):
+        # the labels exceed the size of the header
+        units = [f"UNIT{i:05d}" * 4 for i in range(1000)]
+        with ArchiveWriter(self.path, "QM") as writer:
+            for i, unit in enumerate(units[:500]):
+                writer.append(self.qm(unit), timestamp=float(i))
+        with ArchiveWriter(self.path) as writer:
+            for i, unit in enumerate(units[500:]):
+                writer.append(self.qm(unit), timestamp=500.0 + i)
+        with ArchiveReader(self.path) as reader:
+            assert [r["unit"] for r in reader] == units
+
+    def test_max_labels(self):
+        with mock.patch("fluke_28x_multimeter.archive.MAX_LABELS", 2), \
+                ArchiveWriter(self.path, "QM") as writer:
+            writer.append(self.qm("VDC"))
+            writer.append(self.qm("VAC"))
+            with self.assertRaises(ValueError):
+                writer.append(self.qm("ADC"))
+            writer.append(self.qm("VDC"))
+        with ArchiveReader(self.path) as reader:
+            assert [r["unit"] for r in reader] == ["VDC", "VAC", "VDC"]
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `fluke_28x_multimeter.arrow`."""
+
+import os
+import tempfile
+from unittest import TestCase, skipIf
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+from fluke_28x_multimeter.query import QDDA, QM
+from fluke_28x_multimeter.simulator import (QM_RESPONSES, QDDA_RESPONSES,
+                                            QDDA_MIN_MAX_RESPONSES)
+
+if pyarrow is not None:
+    import pyarrow.parquet
+    from fluke_28x_multimeter.arrow import ArrowWriter
+
+
+@skipIf(pyarrow is None, "pyarrow not installed")
+class TestArrowWriter(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.qdda = [QDDA.parse_response(frame) for frame in
+                     QDDA_RESPONSES + QDDA_MIN_MAX_RESPONSES]
+        self.rows = [row for data in self.qdda for row in data]
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, fmt, query, data, **kwargs):
+        path = os.path.join(self.directory.name, f"out.{fmt}")
+        with ArrowWriter(path, query, fmt=fmt, **kwargs) as writer:
+            for item in data:
+                writer.write(item)
+        return path, writer
+
+    def test_ipc(self):
+        path, writer = self.write("arrow", "QDDA", self.qdda, batch_size=7)
+        assert writer.rows == len(self.rows)
+        assert writer.batches == -(-len(self.rows) // 7)
+        table = pyarrow.ipc.open_file(path).read_all()
+        assert table.to_pylist() == self.rows
+        field = table.schema.field("readingID")
+        assert pyarrow.types.is_dictionary(field.type)
+
+    def test_parquet(self):
+        path, writer = self.write("parquet", "QDDA", self.qdda, batch_size=10)
+        metadata = pyarrow.parquet.ParquetFile(path).metadata
+        assert metadata.num_row_groups == writer.batches
+        assert metadata.row_group(0).num_rows == 10
+        table = pyarrow.parquet.read_table(path)
+        assert table.column("readingState").to_pylist() == \
+            [row["readingState"] for row in self.rows]
+
+    def test_timestamp(self):
+        data = [dict(QM.parse_response(frame), time=float(i))
+                for i, frame in enumerate(QM_RESPONSES)]
+        path, _ = self.write("arrow", QM, data, timestamp=True)
+        table = pyarrow.ipc.open_file(path).read_all()
+        assert table.column_names == ["time", "value", "unit", "state",
+                                      "attribute"]
+        assert table.to_pylist() == data
+
+    def test_flush_interval(self):
+        now = [0.0]
+        path = os.path.join(self.directory.name, "out.parquet")
+        rows = 0
+        with ArrowWriter(path, "QDDA", fmt="parquet", flush_interval=1.0,
+                         clock=lambda: now[0]) as writer:
+            for data in self.qdda:
+                writer.write(data)
+                rows += len(data)
+                now[0] += 0.6
+            # written before close
+            assert writer.batches == len(self.qdda) // 2
+        assert pyarrow.parquet.read_table(path).num_rows == rows
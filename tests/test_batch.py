@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `fluke_28x_multimeter.batch`."""
+
+import io
+import math
+from unittest import TestCase
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from fluke_28x_multimeter.query import QDDA, QM
+from fluke_28x_multimeter.simulator import (QM_RESPONSES, QDDA_RESPONSES,
+                                            QDDA_MIN_MAX_RESPONSES)
+
+if numpy is not None:
+    from fluke_28x_multimeter.batch import decode_qdda, decode_qm
+
+
+class TestBatch(TestCase):
+
+    def setUp(self):
+        if numpy is None:
+            self.skipTest("numpy not installed")
+
+    def test_qdda(self):
+        frames = QDDA_RESPONSES + QDDA_MIN_MAX_RESPONSES
+        batch = decode_qdda(frames)
+        expected = [d for f in frames for d in QDDA.parse_response(f)]
+        assert len(batch.data) == len(expected)
+        for row, label, d in zip(batch.data, batch.labels("readingID"),
+                                 expected):
+            assert label == d["readingID"]
+            assert row["timeStamp"] == d["timeStamp"]
+            assert row["displayDigits"] == d["displayDigits"]
+            if d["readingValue"] >= 1e38:
+                assert math.isnan(row["readingValue"])
+            else:
+                assert row["readingValue"] == d["readingValue"]
+        assert list(batch.labels("baseUnitReading")) == \
+            [d["baseUnitReading"] for d in expected]
+        assert batch.data["frame"][-1] == len(frames) - 1
+
+    def test_qm_file(self):
+        batch = decode_qm(io.BytesIO(b"\r\n".join(QM_RESPONSES) + b"\r\n"))
+        assert len(batch.data) == len(QM_RESPONSES)
+        assert batch.data["value"][0] == QM.parse_response(
+            QM_RESPONSES[0])["value"]
+        assert math.isnan(batch.data["value"][1])
+        assert list(batch.labels("state")[:2]) == ["NORMAL", "OL"]
+
+    def test_malformed(self):
+        with self.assertRaises(ValueError):
+            decode_qdda([QDDA_RESPONSES[0][:-20]])
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `fluke_28x_multimeter.cache`."""
+
+import time
+import threading
+from unittest import TestCase
+
+from fluke_28x_multimeter import Fluke287
+from fluke_28x_multimeter.cache import QueryCache
+from fluke_28x_multimeter.simulator import SimulatedFluke287
+
+
+class TestQueryCache(TestCase):
+
+    def setUp(self):
+        self.device = SimulatedFluke287(seed=0, command_latency=0.02)
+        self.fluke = Fluke287(io=self.device)
+
+    def test_max_age(self):
+        cache = QueryCache(self.fluke)
+        first = cache.execute("QM", max_age=10)
+        assert cache.execute("QM", max_age=10) is first
+        assert cache.execute("QM", max_age=0) is not first
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 2
+        assert self.device.requests == 2
+
+    def test_coalesce(self):
+        cache = QueryCache(self.fluke)
+        results = []
+        threads = [threading.Thread(
+            target=lambda: results.append(cache.execute("QDDA")))
+            for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stats = cache.stats()
+        assert len(results) == 8
+        assert stats["misses"] + stats["coalesced"] == 8
+        assert stats["coalesced"] > 0
+        assert self.device.requests == stats["misses"]
+
+    def test_error(self):
+        cache = QueryCache(self.fluke)
+        with self.assertRaises(ValueError):
+            cache.execute("UNKNOWN")
+        assert cache.get("UNKNOWN") is None
+
+    def test_poller(self):
+        cache = self.fluke.enable_cache({"QM": 0.05})
+        try:
+            while cache.get("QM") is None:
+                time.sleep(0.01)
+            requests = self.device.requests
+            for _ in range(10):
+                self.fluke.value
+            assert cache.stats()["hits"] >= 9
+            assert self.device.requests <= requests + 1
+        finally:
+            self.fluke.disable_cache()
+        assert self.fluke.cache is None
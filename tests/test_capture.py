@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `fluke_28x_multimeter.capture`."""
+
+import io
+import os
+import time
+import tempfile
+from unittest import TestCase, mock
+
+from fluke_28x_multimeter import Fluke287
+from fluke_28x_multimeter.capture import (ReplayIO, read_capture, TX, RX,
+                                          MAGIC)
+from fluke_28x_multimeter.simulator import SimulatedFluke287
+
+
+class TestCapture(TestCase):
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".cap")
+        os.close(fd)
+        self.addCleanup(os.remove, self.path)
+        self.fluke = Fluke287(io=SimulatedFluke287(seed=0,
+                                                   command_latency=0.02))
+        self.fluke.start_capture(self.path)
+        self.data = [self.fluke.values, self.fluke.value]
+        self.fluke.execute_many(["QM", "ID"])
+        self.fluke.stop_capture()
+
+    def test_records(self):
+        records = list(read_capture(self.path))
+        assert [r.data for r in records if r.direction == TX] == \
+            [b"QDDA\r", b"QM\r", b"QM\rID\r"]
+        received = b"".join(r.data for r in records if r.direction == RX)
+        assert received.startswith(b"0\rV_AC,")
+        times = [r.time for r in records]
+        assert times == sorted(times)
+
+    def test_stop_capture(self):
+        assert isinstance(self.fluke._io, SimulatedFluke287)
+        assert self.fluke.value
+
+    def test_replay(self):
+        fluke = Fluke287(io=ReplayIO(self.path, speed=None))
+        assert [fluke.values, fluke.value] == self.data
+        requests = fluke.execute_many(["QM", "ID"])
+        assert requests[1].response.data["deviceName"] == "FLUKE 287"
+        assert fluke._io.done
+
+    def test_replay_speed(self):
+        fluke = Fluke287(io=ReplayIO(self.path, speed=1.0))
+        start = time.monotonic()
+        fluke.values
+        assert time.monotonic() - start >= 0.015
+
+    def test_mismatch(self):
+        fluke = Fluke287(io=ReplayIO(self.path, speed=None))
+        with self.assertRaises(ValueError):
+            fluke.execute("ID")
+
+    def test_not_a_capture(self):
+        with open(self.path, "wb") as f:
+            f.write(b"QM\r")
+        with self.assertRaises(ValueError):
+            list(read_capture(self.path))
+
+    def test_file_object(self):
+        out = io.BytesIO()
+        self.fluke.start_capture(out)
+        self.fluke.value
+        self.fluke.stop_capture()
+        assert out.getvalue().startswith(MAGIC)
+
+    def test_reconnect(self):
+        device = self.fluke._io
+        self.fluke.start_capture(self.path)
+        self.fluke.value
+        self.fluke.disconnect()
+        device.open()
+        with mock.patch("fluke_28x_multimeter.connect", return_value=device):
+            self.fluke.connect()
+        self.fluke.value
+        # flushed after every request
+        requests = [r.data for r in read_capture(self.path)
+                    if r.direction == TX]
+        assert requests == [b"QM\r", b"QM\r"]
+        self.fluke.stop_capture()
+        assert self.fluke._io is device
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `fluke_28x_multimeter.discovery`."""
+
+import os
+import tempfile
+from types import SimpleNamespace
+from unittest import TestCase
+
+from fluke_28x_multimeter.discovery import PortCache
+
+
+class TestPortCache(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.dev = os.path.join(self.tmp.name, "dev")
+        self.by_id = os.path.join(self.tmp.name, "by-id")
+        os.mkdir(self.dev)
+        os.mkdir(self.by_id)
+        self.now = 0.0
+        self.devices = {}
+        self.cache = PortCache(rescan_interval=2.0, by_id=self.by_id,
+                               scan=self.scan, clock=lambda: self.now)
+
+    def scan(self):
+        return [SimpleNamespace(device=device, serial_number=serial,
+                                vid=0x0403)
+                for serial, device in self.devices.items()]
+
+    def plug(self, serial, name):
+        device = os.path.join(self.dev, name)
+        open(device, "w").close()
+        link = os.path.join(self.by_id, f"usb-FTDI_{serial}-if00-port0")
+        if os.path.lexists(link):
+            os.remove(link)
+        os.symlink(device, link)
+        self.devices[serial] = device
+        return link
+
+    def unplug(self, serial):
+        os.remove(self.devices.pop(serial))
+
+    def test_by_id_link(self):
+        link = self.plug("A", "ttyUSB0")
+        assert self.cache.find("A") == link
+        assert self.cache.find("A") == link
+        # found by the serial number in the link name
+        assert self.cache.scans == 0
+
+    def test_replug_keeps_link(self):
+        link = self.plug("A", "ttyUSB0")
+        assert self.cache.find("A") == link
+        self.unplug("A")
+        os.remove(link)
+        self.now += 3
+        assert self.cache.find("A") is None
+        assert self.cache.scans == 1
+        # new device name, the link is found without a scan
+        assert self.plug("A", "ttyUSB1") == link
+        assert self.cache.find("A") == link
+        assert self.cache.scans == 1
+
+    def test_rescan_rate_limited(self):
+        assert self.cache.find("A") is None
+        assert self.cache.find("A") is None
+        assert self.cache.scans == 1
+        self.plug("A", "ttyUSB0")
+        self.cache.by_id = os.path.join(self.tmp.name, "missing")
+        assert self.cache.find("A") is None
+        self.now += 2.0
+        assert self.cache.find("A") == self.devices["A"]
+        assert self.cache.scans == 2
+
+    def test_invalidate(self):
+        self.cache.by_id = os.path.join(self.tmp.name, "missing")
+        assert self.cache.find("A") is None
+        self.plug("A", "ttyUSB0")
+        self.cache.invalidate()
+        assert self.cache.find("A") == self.devices["A"]
+
+    def test_without_by_id(self):
+        self.cache.by_id = os.path.join(self.tmp.name, "missing")
+        self.plug("A", "ttyUSB0")
+        assert self.cache.find("A") == self.devices["A"]
+
+    def test_find_all(self):
+        self.plug("B", "ttyUSB0")
+        self.plug("A", "ttyUSB1")
+        assert [os.path.basename(d) for d in self.cache.find_all(vid=0x0403)] \
+            == ["usb-FTDI_A-if00-port0", "usb-FTDI_B-if00-port0"]
+        assert len(self.cache.find_all(["B"])) == 1
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `fluke_28x_multimeter.fleet`."""
+
+import time
+from types import SimpleNamespace
+from unittest import TestCase, mock
+
+from fluke_28x_multimeter import Fluke287
+from fluke_28x_multimeter.query import find_all
+from fluke_28x_multimeter.discovery import ports as port_cache
+from fluke_28x_multimeter.fleet import FlukeGroup
+from fluke_28x_multimeter.simulator import SimulatedFluke287
+
+
+class TestFindAll(TestCase):
+
+    ports = [SimpleNamespace(device="/dev/ttyUSB1", serial_number="B",
+                             vid=0x0403),
+             SimpleNamespace(device="/dev/ttyUSB0", serial_number="A",
+                             vid=0x0403),
+             SimpleNamespace(device="/dev/ttyS0", serial_number=None,
+                             vid=None)]
+
+    def test_find_all(self):
+        port_cache.invalidate()
+        with mock.patch("serial.tools.list_ports.comports",
+                        return_value=self.ports):
+            assert find_all() == ["/dev/ttyUSB0", "/dev/ttyUSB1"]
+            assert find_all(["B"]) == ["/dev/ttyUSB1"]
+
+
+class TestFlukeGroup(TestCase):
+
+    def setUp(self):
+        self.group = FlukeGroup({
+            f"meter{i}": Fluke287(io=SimulatedFluke287(
+                seed=i, command_latency=0.002, timeout_rate=0.2 * (i == 2)))
+            for i in range(3)})
+
+    def test_poll(self):
+        ticks = list(self.group.poll("QM", 0.01, count=10))
+        deadlines = [tick.deadline for tick in ticks]
+        assert deadlines == sorted(deadlines)
+        assert len(deadlines) == len(set(deadlines))
+        for tick in ticks:
+            for tag, sample in tick.samples.items():
+                assert sample.target == tick.target
+                assert "unit" in sample.data
+        samples = sum(len(tick.samples) for tick in ticks)
+
+        stats = self.group.stats()
+        assert stats["samples"] == samples
+        assert stats["rate"] > 0
+        assert stats["devices"]["meter0"].samples == 10
+        assert stats["devices"]["meter0"].p50 >= 0.002
+        assert stats["devices"]["meter2"].samples + \
+            stats["devices"]["meter2"].errors == 10
+
+    def test_stop(self):
+        ticks = self.group.poll("QM", 0)
+        for _ in range(5):
+            next(ticks)
+        ticks.close()
+        assert self.group.stopped is not None
+
+    def test_stop_interrupts_sleep(self):
+        ticks = self.group.poll("QM", 10)
+        next(ticks)
+        start = time.monotonic()
+        ticks.close()
+        # the threads wake up instead of sleeping out the interval
+        assert time.monotonic() - start < 1
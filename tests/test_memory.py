@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `fluke_28x_multimeter.memory`."""
+
+import io
+import json
+from unittest import TestCase
+
+from fluke_28x_multimeter import Fluke287
+from fluke_28x_multimeter.memory import export_memory
+from fluke_28x_multimeter.simulator import SimulatedFluke287, MEMORY
+
+
+class TestExportMemory(TestCase):
+
+    def setUp(self):
+        self.device = SimulatedFluke287(seed=0)
+        self.fluke = Fluke287(io=self.device)
+
+    def test_counts(self):
+        assert self.fluke.memory_counts == dict(records=2, minMax=1, peak=0,
+                                                measurements=3)
+
+    def test_export(self):
+        out = io.StringIO()
+        progress = []
+        status = export_memory(self.fluke, out, batch=4,
+                               progress=progress.append)
+        lines = [json.loads(line) for line in out.getvalue().splitlines()]
+        assert len(lines) == status.done == status.total == 6
+        assert [p.done for p in progress] == [4, 6]
+        assert status.errors == 0 and status.rate > 0
+        assert lines[0] == dict(kind="records", query="QRSI", index=0,
+                                fields=MEMORY[b"QRSI"][0].decode().split(","))
+        assert lines[-1]["query"] == "QSMR" and lines[-1]["index"] == 2
+        # QSLS plus two pipelined batches
+        assert self.device.requests == 7
+
+    def test_error(self):
+        device = self.device
+
+        class Device(SimulatedFluke287):
+            # counts one record more than stored
+            def respond(self, command):
+                if command.strip() == b"QSLS":
+                    device.requests += 1
+                    return b"0\r3,1,0,3\r"
+                return device.respond(command)
+
+        out = io.StringIO()
+        status = export_memory(Fluke287(io=Device()), out, kinds=["records"])
+        lines = [json.loads(line) for line in out.getvalue().splitlines()]
+        assert status.done == 3 and status.errors == 1
+        assert lines[2] == dict(kind="records", query="QRSI", index=2,
+                                error="ERROR_SYNTAX")
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `fluke_28x_multimeter.metrics`."""
+
+from unittest import TestCase
+
+from fluke_28x_multimeter import Fluke287
+from fluke_28x_multimeter.metrics import Histogram, STAGES
+from fluke_28x_multimeter.query import FlukeError
+from fluke_28x_multimeter.simulator import SimulatedFluke287
+
+
+class TestHistogram(TestCase):
+
+    def test_percentile(self):
+        histogram = Histogram(bounds=(1.0, 2.0, 5.0))
+        assert histogram.percentile(50) is None
+        for value in (0.5, 0.7, 1.5, 4.0, 7.0):
+            histogram.observe(value)
+        assert histogram.counts == [2, 1, 1, 1]
+        # interpolated within the buckets (0, 1] and (1, 2]
+        assert histogram.percentile(20) == 0.5
+        assert histogram.percentile(50) == 1.5
+        # above the highest bound
+        assert histogram.percentile(99) == 5.0
+        assert histogram.to_dict()["mean"] == 13.7 / 5
+
+
+class TestMetrics(TestCase):
+
+    def setUp(self):
+        self.device = SimulatedFluke287(seed=0)
+        self.fluke = Fluke287(io=self.device)
+
+    def test_disabled(self):
+        assert self.fluke.metrics is None
+        self.fluke.execute("QM")
+
+    def test_stages(self):
+        metrics = self.fluke.enable_metrics()
+        for _ in range(3):
+            self.fluke.execute("QDDA")
+        self.fluke.execute_many(["QM", "ID"])
+        qdda = metrics.snapshot()["queries"]["QDDA"]
+        assert qdda["requests"] == 3
+        assert qdda["bytesSent"] == 3 * len(b"QDDA\r")
+        assert qdda["bytesReceived"] > 300
+        assert {s: qdda["stages"][s]["count"] for s in STAGES} == \
+            dict(send=3, ack=3, payload=3, parse=3)
+        # pipelined requests are not timed while sending
+        assert metrics.queries["QM"].stages["send"].count == 0
+        assert metrics.queries["ID"].stages["parse"].count == 1
+
+    def test_errors(self):
+        metrics = self.fluke.enable_metrics()
+        with self.assertRaises(FlukeError):
+            self.fluke.execute("QRSI", 99)
+        assert metrics.queries["QRSI"].errors == {"ERROR_SYNTAX": 1}
+
+        self.device.timeout = 0.01
+        self.device.timeout_rate = 1.0
+        with self.assertRaises(TimeoutError):
+            self.fluke.execute("QM")
+        assert metrics.queries["QM"].timeouts == 1
+
+    def test_exposition(self):
+        metrics = self.fluke.enable_metrics()
+        self.fluke.execute("QM")
+        text = metrics.exposition()
+        assert 'fluke_query_duration_seconds_count{query="QM",stage="ack"} 1' \
+            in text
+        assert 'fluke_query_duration_seconds_bucket{query="QM",' \
+               'stage="ack",le="+Inf"} 1' in text
+        assert 'fluke_query_bytes_total{query="QM",direction="sent"} 3' \
+            in text
+        assert "fluke_reconnects_total 0" in text
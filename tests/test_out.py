@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `fluke_28x_multimeter.out`."""
+
+import io
+import os
+import csv
+import json
+import tempfile
+from unittest import TestCase
+
+from fluke_28x_multimeter.out import write_csv, StreamWriter, fields
+from fluke_28x_multimeter.query import QDDA, QM
+from fluke_28x_multimeter.simulator import QDDA_RESPONSES, QM_RESPONSES
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestWriteCsv(TestCase):
+
+    def test_key_order(self):
+        out = io.StringIO()
+        write_csv([dict(b=1, a=2), dict(c=3, a=4)], head=True, out=out)
+        assert out.getvalue().splitlines()[0] == "b,a,c"
+
+
+class TestStreamWriter(TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.qm = [QM.parse_response(frame) for frame in QM_RESPONSES]
+
+    def test_fields(self):
+        assert fields("QM") == ["value", "unit", "state", "attribute"]
+        assert list(QDDA.parse_response(QDDA_RESPONSES[0])[0]) == \
+            fields(QDDA)
+
+    def test_buffered(self):
+        out = io.StringIO()
+        writer = StreamWriter(out, fields(QM), clock=self.clock)
+        writer.write(self.qm[0])
+        writer.wait()
+        assert out.getvalue() == ""
+        self.clock.now = 1.0
+        writer.write(self.qm[1])
+        writer.wait()
+        lines = out.getvalue().splitlines()
+        assert lines[0] == "value,unit,state,attribute"
+        assert len(lines) == 3
+        writer.write(self.qm[2])
+        writer.close()
+        assert len(out.getvalue().splitlines()) == 4
+        assert writer.rows == 3
+
+    def test_ndjson(self):
+        out = io.StringIO()
+        with StreamWriter(out, ["unit", "value"], fmt="ndjson") as writer:
+            writer.write(self.qm)
+        lines = out.getvalue().splitlines()
+        assert json.loads(lines[0]) == dict(unit="VAC", value=0.078)
+        assert len(lines) == len(self.qm)
+
+    def test_rotate(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "log.csv")
+            with StreamWriter(path, fields(QM), buffer_size=0,
+                              rotate_size=100) as writer:
+                for _ in range(4):
+                    writer.write(self.qm)
+            assert [os.path.basename(f) for f in writer.files] == \
+                [f"log-{i:04d}.csv" for i in range(4)]
+            for f in writer.files:
+                with open(f, newline="") as csv_file:
+                    rows = list(csv.DictReader(csv_file))
+                assert len(rows) == len(self.qm)
+                assert rows[0]["unit"] == "VAC"
+
+    def test_rotate_bytes(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "log.csv")
+            row = dict(value=1.0, unit="\u00b0C", state="NORMAL",
+                       attribute="NONE")
+            with StreamWriter(path, fields(QM), buffer_size=0,
+                              rotate_size=49) as writer:
+                writer.write(row)
+                writer.write(row)
+            # header and row are 48 characters, but 49 bytes
+            assert len(writer.files) == 2
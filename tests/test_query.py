@@ -0,0 +1,217 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Hardware independent tests for `fluke_28x_multimeter.query`."""
+
+import io
+from unittest import TestCase
+
+from fluke_28x_multimeter import Fluke287
+from fluke_28x_multimeter.query import (FrameReader, FlukeError,
+                                        RESPONSE_CODE, QDDA, QDDB, QEMAP, QM)
+from fluke_28x_multimeter.simulator import ENUM_MAPS, encode_qddb
+
+
+class ChunkedIO(object):
+    """ returns the given chunks one per read, empty bytes afterwards """
+
+    def __init__(self, *chunks):
+        self.chunks = list(chunks)
+
+    @property
+    def in_waiting(self):
+        return len(self.chunks[0]) if self.chunks else 0
+
+    def read(self, size=1):
+        if not self.chunks:
+            return b""
+        chunk = self.chunks.pop(0)
+        if len(chunk) > size:
+            self.chunks.insert(0, chunk[size:])
+        return chunk[:size]
+
+
+class TestFrameReader(TestCase):
+
+    def test_split_frames(self):
+        reader = FrameReader(ChunkedIO(b"0\r0.0780E0,VAC,NORMAL,NONE\r"))
+        assert reader.read_frame() == b"0"
+        assert reader.pending > 0, "payload was not kept for next frame"
+        assert reader.read_frame() == b"0.0780E0,VAC,NORMAL,NONE"
+        assert reader.pending == 0
+
+    def test_frame_across_chunks(self):
+        reader = FrameReader(ChunkedIO(b"0.07", b"80E0,VAC",
+                                       b",NORMAL,NONE\r"))
+        assert reader.read_frame() == b"0.0780E0,VAC,NORMAL,NONE"
+
+    def test_multi_byte_terminator_across_chunks(self):
+        reader = FrameReader(ChunkedIO(b"abc\r", b"\ndef\r\n"),
+                             terminator=b"\r\n")
+        assert reader.read_frame() == b"abc"
+        assert reader.read_frame() == b"def"
+
+    def test_size(self):
+        reader = FrameReader(ChunkedIO(b"abcdef\r"))
+        assert reader.read_frame(size=4) == b"abcd"
+        assert reader.read_frame() == b"ef"
+
+    def test_without_in_waiting(self):
+        reader = FrameReader(io.BytesIO(b"0\r1\r"))
+        assert reader.read_frame() == b"0"
+        assert reader.read_frame() == b"1"
+
+    def test_timeout(self):
+        reader = FrameReader(ChunkedIO(b"0"))
+        with self.assertRaises(TimeoutError):
+            reader.read_frame(timeout=0.01)
+
+    def test_read_exact(self):
+        reader = FrameReader(ChunkedIO(b"0\r#0\r", b"\rab\r"))
+        assert reader.read_frame() == b"0"
+        assert reader.read_exact(5) == b"#0\r\ra"
+        assert reader.read_frame() == b"b"
+        with self.assertRaises(TimeoutError):
+            reader.read_exact(1, timeout=0.01)
+
+
+class ScriptedIO(io.BytesIO):
+    """ answers every write with the preset response bytes """
+
+    def __init__(self, response):
+        super(ScriptedIO, self).__init__(response)
+        self.written = []
+
+    def write(self, data):
+        self.written.append(data)
+        return len(data)
+
+
+class TestExecuteMany(TestCase):
+
+    def test_pipelined(self):
+        fluke = Fluke287(ScriptedIO(
+            b"0\rFLUKE 287,V1.00,95830370\r"
+            b"2\r"
+            b"0\r0.0780E0,VAC,NORMAL,NONE\r"
+            b"0\r"))
+        requests = fluke.execute_many(["ID", "QDDA", "QM", "HOLD"])
+        assert fluke._io.written == [b"ID\rQDDA\rQM\rPRESS HOLD\r"]
+        assert [r.name for r in requests] == ["ID", "QDDA", "QM", "HOLD"]
+        assert requests[0].response.data["serialNumber"] == "95830370"
+        error = requests[1].response.data
+        assert isinstance(error, FlukeError)
+        assert error.code == RESPONSE_CODE.ERROR_EXECUTION
+        assert requests[2].response.data["value"] == 0.078
+        assert requests[3].response.status == RESPONSE_CODE.RESPONSE_OK
+        assert requests[3].response.data is None
+
+
+class TestQDDAParser(TestCase):
+    frame = (b"V_AC,NONE,AUTO,VAC,5,0,OFF,1507815846.491,1,MIN_MAX_AVG,5,"
+             b"LIVE,0.0789,VAC,0,4,5,NORMAL,NONE,1507815852.225,"
+             b"PRIMARY,0.0789,VAC,0,4,5,NORMAL,NONE,1507815852.225,"
+             b"MINIMUM,0.0784,VAC,0,4,5,NORMAL,NONE,1507815850.213,"
+             b"MAXIMUM,0.0832,VAC,0,4,5,NORMAL,NONE,1507815848.201,"
+             b"AVERAGE,0.0802,VAC,0,4,5,NORMAL,NONE,1507815852.225")
+
+    def test_dicts(self):
+        data = QDDA.parse_response(self.frame)
+        assert len(data) == 5
+        assert list(data[2].items()) == [
+            ('primaryFunction', 'V_AC'), ('secondaryFunction', 'NONE'),
+            ('autoRangeState', 'AUTO'), ('baseUnit', 'VAC'),
+            ('rangeNumber', '5'), ('unitMultiplier', '0'),
+            ('lightningBolt', 'OFF'), ('minMaxStartTime', 1507815846.491),
+            ('numberOfModes', 1), ('measurementMode', ['MIN_MAX_AVG']),
+            ('numberOfReadings', 5), ('readingID', 'minimum'),
+            ('readingValue', 0.0784), ('baseUnitReading', 'VAC'),
+            ('unitMultiplierRecording', 0), ('decimalPlaces', 4),
+            ('displayDigits', 5), ('readingState', 'NORMAL'),
+            ('readingAttribute', 'NONE'), ('timeStamp', 1507815850.213)]
+
+    def test_without_modes(self):
+        data = QDDA.parse_response(
+            b"UA_DC,NONE,AUTO,ADC,500,-6,OFF,0.000,0,2,LIVE,2e-08,ADC,-6,2,5,"
+            b"NORMAL,NONE,1507822644.513,PRIMARY,2e-08,ADC,-6,2,5,NORMAL,"
+            b"NONE,1507822644.513")
+        assert [d['readingID'] for d in data] == ['live', 'primary']
+        assert data[0]['measurementMode'] == []
+        assert data[1]['readingValue'] == 2e-08
+
+    def test_compact(self):
+        data = QDDA.parse_response(self.frame, compact=True)
+        assert data.settings['numberOfReadings'] == len(data.readings)
+        assert data.readings[4][0] == 'average'
+        assert data.to_dicts() == QDDA.parse_response(self.frame)
+
+    def test_truncated(self):
+        with self.assertRaises(ValueError):
+            QDDA.parse_response(self.frame[:-40])
+
+
+class TestQDDB(TestCase):
+    frame = TestQDDAParser.frame
+
+    def test_decode(self):
+        payload = encode_qddb(self.frame)
+        assert len(payload) == 2 + 34 + 5 * 30
+        assert QDDB.parse_response(payload, maps=ENUM_MAPS) == \
+            QDDA.parse_response(self.frame)
+        assert QDDB.parse_response(payload, maps=ENUM_MAPS, model=True) == \
+            QDDA.parse_response(self.frame, model=True)
+
+    def test_unmapped(self):
+        data = QDDB.parse_response(encode_qddb(self.frame), compact=True)
+        assert data.settings["measurementMode"] == ["2"]
+        assert data.readings[0][:3] == ("0", 0.0789, "1")
+
+    def test_execute(self):
+        # a code of 13 puts the terminator into the binary payload
+        maps = dict(ENUM_MAPS, unit={13: "VAC"})
+        payload = encode_qddb(self.frame, maps)
+        assert b"\r" in payload
+        fluke = Fluke287(ScriptedIO(
+            b"0\r" + payload + b"\r0\r3,0,A,1,B,4,C\r"))
+        data = fluke.execute("QDDB", maps=maps)
+        assert data == QDDA.parse_response(self.frame)
+        assert fluke.execute(QEMAP, "unit") == {0: "A", 1: "B", 4: "C"}
+        assert fluke._io.written == [b"QDDB\r", b"QEMAP unit\r"]
+
+    def test_truncated(self):
+        with self.assertRaises(ValueError):
+            QDDB.parse_frame(encode_qddb(self.frame)[:-40])
+
+
+class TestModel(TestCase):
+
+    def test_qm(self):
+        reading = QM.parse_response(b"0.327E-3,VDC,NORMAL,NONE", model=True)
+        assert reading.display_value == 0.327
+        assert reading.display_unit == "mVDC"
+        assert reading.to_dict() == QM.parse_response(
+            b"0.327E-3,VDC,NORMAL,NONE")
+
+    def test_qm_overload(self):
+        reading = QM.parse_response(b"+9.99999999E+37,VDC,OL,NONE",
+                                    model=True)
+        assert reading.is_overload
+        assert reading.multiplier is None
+        assert reading.display_value == 9.99999999E+37
+        assert reading.display_unit == "VDC"
+
+    def test_qdda(self):
+        snapshot = QDDA.parse_response(TestQDDAParser.frame, model=True)
+        assert snapshot.measurement_mode == ("MIN_MAX_AVG",)
+        assert snapshot.reading("maximum").value == 0.0832
+        assert snapshot.to_dicts() == QDDA.parse_response(
+            TestQDDAParser.frame)
+
+    def test_overload(self):
+        snapshot = QDDA.parse_response(
+            b"OHMS,NONE,AUTO,OHM,500,6,OFF,0.000,0,2,LIVE,1e+38,OHM,6,1,4,OL,"
+            b"NONE,1507815690.989,PRIMARY,1e+38,OHM,6,1,4,OL,NONE,"
+            b"1507815690.989", model=True)
+        assert snapshot.primary.is_overload
+        assert snapshot.primary.display_value == 1e+38
+        assert snapshot.primary.display_unit == "MOHM"
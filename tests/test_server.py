@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `fluke_28x_multimeter.server`."""
+
+from unittest import TestCase
+
+import gevent
+
+from fluke_28x_multimeter import Fluke287
+from fluke_28x_multimeter.server import FlukeServer
+from fluke_28x_multimeter.simulator import SimulatedFluke287
+
+
+class TestFanOut(TestCase):
+
+    def setUp(self):
+        self.device = SimulatedFluke287(seed=0)
+        self.server = FlukeServer(Fluke287(io=self.device))
+
+    def tearDown(self):
+        self.server.close()
+
+    def take(self, stream, n):
+        return [next(stream) for _ in range(n)]
+
+    def test_shared_loop(self):
+        streams = [self.server.start_loop("QM", 0.001) for _ in range(3)]
+        jobs = [gevent.spawn(self.take, stream, 10) for stream in streams]
+        gevent.joinall(jobs, raise_error=True)
+        assert jobs[0].value == jobs[1].value == jobs[2].value
+        assert len(self.server.producers) == 1
+        subscription, = self.server.subscriptions()
+        assert subscription["subscribers"] == 3
+        # one serial request per sample regardless of the subscribers
+        assert self.device.requests <= subscription["samples"] + 1
+
+        for stream in streams:
+            stream.close()
+        assert self.server.producers == {}
+
+    def test_intervals(self):
+        fast = self.server.start_loop("QM", 0.001)
+        slow = self.server.start_loop("QM", 0.002)
+        next(fast)
+        next(slow)
+        assert len(self.server.producers) == 2
+        self.server.stop_loop("QM")
+        # queued samples are delivered, then the streams end
+        for stream in (fast, slow):
+            list(stream)
+        assert self.server.producers == {}
+
+    def test_error(self):
+        stream = self.server.start_loop("UNKNOWN", 0.001)
+        with self.assertRaises(ValueError):
+            next(stream)
+        assert self.server.producers == {}
+
+    def test_metrics(self):
+        assert self.server.metrics() is None
+        self.server.fluke.enable_metrics()
+        self.server.execute("QM")
+        assert self.server.metrics()["queries"]["QM"]["requests"] == 1
+
+    def test_execute_max_age(self):
+        self.server.fluke.enable_cache(max_age=0)
+        first = self.server.execute("QM", max_age=10)
+        assert self.server.execute_max_age("QM", 10) is first
+        latest = self.server.execute("QM")
+        assert latest is not first
+        assert self.server.fluke.execute("QM", max_age=10) is latest
+        self.server.fluke.disable_cache()
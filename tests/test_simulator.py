@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests against `fluke_28x_multimeter.simulator`, no hardware needed."""
+
+import os
+import time
+from unittest import TestCase, skipUnless
+
+from fluke_28x_multimeter import Fluke287, connect
+from fluke_28x_multimeter.simulator import (SimulatedFluke287, PtyBridge,
+                                            QDDA_MIN_MAX_RESPONSES)
+
+
+class TestSimulatedFluke287(TestCase):
+
+    def setUp(self):
+        self.device = SimulatedFluke287(seed=0)
+        self.fluke = Fluke287(io=self.device)
+
+    def test_id(self):
+        assert self.fluke.id == dict(deviceName="FLUKE 287",
+                                     softwareVersion="V1.00",
+                                     serialNumber="95830370")
+
+    def test_value(self):
+        assert self.fluke.value["unit"] == "VAC"
+
+    def test_values(self):
+        values = self.fluke.values
+        assert len(values) == 2
+        assert values[1]["readingID"] == "primary"
+
+    def test_min_max(self):
+        assert self.fluke.min_max() is True
+        assert self.device.min_max is True
+        assert self.fluke.values[1]["measurementMode"] == ["MIN_MAX_AVG"]
+
+    def test_values_binary(self):
+        device = SimulatedFluke287(
+            min_max_responses=QDDA_MIN_MAX_RESPONSES[:1])
+        fluke = Fluke287(io=device)
+        fluke.execute("PMM")
+        assert fluke.values_binary == fluke.values
+        assert fluke.enum_maps["mode"] == {1: "HOLD", 2: "MIN_MAX_AVG"}
+
+    def test_hold_off(self):
+        self.fluke.execute("HOLD")
+        assert self.fluke.values[1]["measurementMode"] == ["HOLD"]
+        self.fluke.hold_off()
+        assert self.device.hold is False
+
+    def test_command_latency(self):
+        self.device.command_latency = 0.02
+        start = time.monotonic()
+        self.fluke.value
+        assert time.monotonic() - start >= 0.02
+
+    def test_timeout(self):
+        self.device.timeout = 0.01
+        self.device.timeout_rate = 1.0
+        self.fluke.send(b"QM\r")
+        with self.assertRaises(TimeoutError):
+            self.fluke.recv(timeout=0.05)
+
+    def test_identity(self):
+        assert self.fluke.status["device"]["serialNumber"] == "95830370"
+        requests = self.device.requests
+        for _ in range(3):
+            status = self.fluke.status
+        assert self.device.requests == requests
+        assert status["alive"] is True
+
+    def test_liveness(self):
+        assert not self.fluke.is_alive()
+        assert self.fluke.heartbeat()
+        requests = self.device.requests
+        assert self.fluke.heartbeat()
+        assert self.device.requests == requests
+        assert not self.fluke.is_alive(timeout=0)
+
+        self.device.timeout = 0.01
+        self.device.timeout_rate = 1.0
+        self.fluke.last_frame = None
+        assert not self.fluke.heartbeat()
+
+
+@skipUnless(hasattr(os, "openpty"), "pseudo terminals not supported")
+class TestPtyBridge(TestCase):
+
+    def test_connect(self):
+        with PtyBridge(SimulatedFluke287(byte_latency=1e-5)) as bridge:
+            fluke = Fluke287(io=connect(bridge.port))
+            assert fluke.id["deviceName"] == "FLUKE 287"
+            assert len(fluke.values) == 2
+            fluke.disconnect()
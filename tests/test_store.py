@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `fluke_28x_multimeter.store`."""
+
+from unittest import TestCase
+
+from fluke_28x_multimeter import Fluke287
+from fluke_28x_multimeter.acquisition import acquire
+from fluke_28x_multimeter.simulator import SimulatedFluke287
+from fluke_28x_multimeter.store import SampleRing
+
+
+class TestSampleRing(TestCase):
+
+    def setUp(self):
+        self.ring = SampleRing(4)
+
+    def fill(self, n):
+        for i in range(n):
+            self.ring.append(float(i), i * 0.5, "VDC" if i % 2 else "VAC",
+                             "NORMAL")
+
+    def test_partial(self):
+        self.fill(3)
+        window = self.ring.last()
+        assert window.timestamp.tolist() == [0.0, 1.0, 2.0]
+        assert self.ring.labels(window)[0] == ["VAC", "VDC", "VAC"]
+
+    def test_wrap_around(self):
+        nbytes = self.ring.nbytes
+        self.fill(11)
+        assert len(self.ring) == 4
+        assert self.ring.last().timestamp.tolist() == [7.0, 8.0, 9.0, 10.0]
+        assert self.ring.last(2).value.tolist() == [4.5, 5.0]
+        assert self.ring.nbytes == nbytes
+
+    def test_zero_copy(self):
+        self.fill(5)
+        window = self.ring.last(1)
+        assert isinstance(window.value, memoryview)
+        assert window.value.obj is self.ring.last().value.obj
+
+    def test_window(self):
+        self.fill(6)
+        assert self.ring.window(3.0, 5.0).timestamp.tolist() == [3.0, 4.0]
+        assert self.ring.window(4.5).timestamp.tolist() == [5.0]
+        assert self.ring.since(1.5, now=5.0).timestamp.tolist() == [4.0, 5.0]
+        assert self.ring.window(10.0).timestamp.tolist() == []
+
+    def test_acquire(self):
+        fluke = Fluke287(io=SimulatedFluke287())
+        list(acquire(fluke, "QDDA", 0, count=6, store=self.ring))
+        assert len(self.ring) == 4
+        assert self.ring.count == 6
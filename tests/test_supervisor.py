@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `fluke_28x_multimeter.supervisor`."""
+
+import time
+import threading
+from unittest import TestCase
+
+import gevent
+
+from fluke_28x_multimeter import Fluke287
+from fluke_28x_multimeter.server import FlukeServer
+from fluke_28x_multimeter.simulator import SimulatedFluke287
+from fluke_28x_multimeter.supervisor import Supervisor
+
+
+class ReconnectingFluke287(Fluke287):
+    """ reopens the simulated device unless it is unplugged """
+
+    def __init__(self, device):
+        super().__init__(io=device)
+        self.device = device
+        self.unplugged = False
+        self.connects = 0
+        self.locked = []
+
+    def connect(self, port=None):
+        self.connects += 1
+        self.locked.append(self._lock._is_owned())
+        if self.unplugged:
+            raise OSError("No such device")
+        self.device.open()
+        super().__init__(io=self.device)
+
+
+class TestSupervisor(TestCase):
+
+    def setUp(self):
+        self.device = SimulatedFluke287(seed=0)
+        self.fluke = ReconnectingFluke287(self.device)
+        self.supervisor = Supervisor(self.fluke, backoff=0.001, jitter=0.0)
+        self.thread = threading.Thread(target=self.supervisor.run,
+                                       daemon=True)
+        self.thread.start()
+
+    def tearDown(self):
+        self.supervisor.stop()
+        self.thread.join()
+
+    def test_delay(self):
+        supervisor = Supervisor(self.fluke, backoff=1, max_backoff=10,
+                                jitter=0.5, random=lambda: 1.0)
+        assert [supervisor.delay(a) for a in range(5)] == \
+            [0.5, 1.0, 2.0, 4.0, 5.0]
+
+    def test_reconnect(self):
+        self.fluke.unplugged = True
+        self.device.close()
+        with self.assertRaises(OSError):
+            self.fluke.execute("QM")
+        assert not self.supervisor.up.is_set()
+        while self.fluke.connects < 3:
+            time.sleep(0.001)
+        self.fluke.unplugged = False
+        assert self.supervisor.wait(1.0)
+        assert self.fluke.execute("QM")
+
+        stats = self.supervisor.stats()
+        assert stats["failures"] == 1
+        assert stats["reconnects"] == 1
+        assert stats["downtime"] == 0.0
+        assert stats["lastRecovery"] > 0
+        # other requests can not use the port while it is reopened
+        assert all(self.fluke.locked)
+
+    def test_timeout_probe(self):
+        self.supervisor.failed(TimeoutError("Timeout"))
+        while self.supervisor.timeouts:
+            time.sleep(0.001)
+        # the meter answered the probe, the port is kept
+        assert self.supervisor.up.is_set()
+        assert self.supervisor.failures == 0
+        assert self.fluke.connects == 0
+
+    def test_threshold(self):
+        supervisor = Supervisor(self.fluke, threshold=2)
+        supervisor.failed(TimeoutError("Timeout"))
+        assert supervisor.up.is_set()
+        supervisor.failed(TimeoutError("Timeout"))
+        assert not supervisor.up.is_set()
+        assert supervisor.failures == 1
+
+    def test_probe_fails(self):
+        supervisor = Supervisor(self.fluke)
+        supervisor.failed(TimeoutError("Timeout"))
+        self.fluke.unplugged = True
+        self.device.close()
+        assert not supervisor.probe()
+        assert not supervisor.up.is_set()
+        assert supervisor.failures == 1
+
+
+class TestServerRecovery(TestCase):
+
+    def setUp(self):
+        self.device = SimulatedFluke287(seed=0)
+        self.fluke = ReconnectingFluke287(self.device)
+        self.server = FlukeServer(self.fluke, backoff=0.001)
+        self.supervisor = gevent.spawn(self.server.supervisor.run)
+
+    def tearDown(self):
+        self.server.close()
+        self.supervisor.join()
+
+    def test_loop_resumes(self):
+        stream = self.server.start_loop("QM", 0.001)
+        next(stream)
+        # the port fails once, the stream pauses instead of ending
+        self.device.close()
+        samples = [next(stream) for _ in range(5)]
+        assert len(samples) == 5
+        subscription, = self.server.subscriptions()
+        assert subscription["paused"] == 1
+        assert self.server.supervisor.stats()["reconnects"] == 1
+        stream.close()
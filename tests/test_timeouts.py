@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `fluke_28x_multimeter.timeouts`."""
+
+import time
+import threading
+from unittest import TestCase
+
+from fluke_28x_multimeter import (Fluke287, TIMEOUT, READ_TIMEOUT,
+                                  DeadlineExceeded)
+from fluke_28x_multimeter.supervisor import Supervisor
+from fluke_28x_multimeter.simulator import SimulatedFluke287
+from fluke_28x_multimeter.timeouts import AdaptiveTimeouts
+
+
+class TestAdaptiveTimeouts(TestCase):
+
+    def test_learn(self):
+        timeouts = AdaptiveTimeouts(multiplier=2.0, minimum=0.01,
+                                    warmup=5)
+        for _ in range(4):
+            timeouts.observe("QM", "ack", 0.02)
+        assert timeouts.timeout("QM", "ack") == TIMEOUT
+        timeouts.observe("QM", "ack", 0.02)
+        assert timeouts.timeout("QM", "ack") == 0.04
+        assert timeouts.timeout("QM", "payload") == TIMEOUT
+
+    def test_minimum_and_timed_out(self):
+        timeouts = AdaptiveTimeouts(minimum=0.05, warmup=1)
+        timeouts.observe("QM", "ack", 0.0001)
+        assert timeouts.timeout("QM", "ack") == 0.05
+        timeouts.timed_out("QM", "ack")
+        assert timeouts.timeout("QM", "ack") == 0.1
+
+
+class TestFluke287Timeouts(TestCase):
+
+    def setUp(self):
+        # like a serial port opened by connect()
+        self.device = SimulatedFluke287(seed=0, timeout=READ_TIMEOUT)
+        self.fluke = Fluke287(io=self.device)
+
+    def test_stages(self):
+        timeouts = self.fluke.enable_adaptive_timeouts(warmup=5)
+        for _ in range(5):
+            self.fluke.execute("QDDA")
+        self.fluke.execute_many(["QM"] * 5)
+        stats = timeouts.stats()
+        assert set(stats) == {"QDDA.ack", "QDDA.payload", "QM.ack",
+                              "QM.payload"}
+        assert stats["QDDA.ack"]["timeout"] < TIMEOUT
+
+    def test_fast_failure(self):
+        self.fluke.enable_adaptive_timeouts(warmup=5)
+        for _ in range(5):
+            self.fluke.execute("QM")
+        self.device.timeout_rate = 1.0
+        start = time.monotonic()
+        with self.assertRaises(TimeoutError):
+            self.fluke.execute("QM")
+        assert time.monotonic() - start < 0.2
+
+    def test_deadline(self):
+        self.device.command_latency = 0.2
+        start = time.monotonic()
+        with self.assertRaises(TimeoutError):
+            self.fluke.execute("QM", deadline=0.05)
+        assert time.monotonic() - start < 0.15
+
+    def test_late_response_dropped(self):
+        self.device.command_latency = 0.05
+        with self.assertRaises(TimeoutError):
+            self.fluke.execute("ID", deadline=0.01)
+        time.sleep(0.06)
+        self.device.command_latency = 0.0
+        assert "value" in self.fluke.execute("QM")
+
+
+class TestDeadlineSupervisor(TestCase):
+
+    def setUp(self):
+        self.device = SimulatedFluke287(seed=0, timeout=READ_TIMEOUT)
+        self.fluke = Fluke287(io=self.device)
+        self.supervisor = Supervisor(self.fluke)
+
+    def test_lock_wait(self):
+        errors = []
+
+        def execute():
+            try:
+                self.fluke.execute("QM", deadline=0.01)
+            except TimeoutError as e:
+                errors.append(e)
+
+        with self.fluke._lock:
+            thread = threading.Thread(target=execute)
+            thread.start()
+            thread.join()
+        assert isinstance(errors[0], DeadlineExceeded)
+        assert self.supervisor.up.is_set()
+        assert self.supervisor.failures == 0
+
+    def test_slow_payload(self):
+        self.device.command_latency = 0.1
+        with self.assertRaises(DeadlineExceeded):
+            self.fluke.execute("QM", deadline=0.02)
+        assert self.supervisor.up.is_set()
+        assert self.supervisor.failures == 0
+
+    def test_frame_timeout(self):
+        self.device.timeout_rate = 1.0
+        with self.assertRaises(TimeoutError) as context:
+            self.fluke.execute("QM", deadline=5.0)
+        assert not isinstance(context.exception, DeadlineExceeded)
+        assert self.supervisor.timeouts == 1